@@ -1,26 +1,35 @@
 # app.py
+import hashlib
 import os
 import re
 from dotenv import load_dotenv
 import streamlit as st
-from agents.assistant_clients import AssistantClient
-from tools import get_error_message
+from agents.assistant_clients import ModelRouter
+# Polarion, the failure history and the multi-build analysis are imported where they are used,
+# so the first page load and plain chat don't pay for them.
 from tools import (
-    extract_component_from_url,
+    extract_build_from_url,
     load_rules,
     analyze_failed_case,
-    generate_test_script,
-    generate_test_script_with_fixture,
+    generate_test_script_incremental,
     extract_code_path_from_prompt,
     load_code_file,
-    login_to_polarion, 
-    get_test_case_by_id,
-    write_test_files_to_output
+    write_test_files_to_output,
+    generation_metadata,
+    collect_cases,
+    find_source,
+    open_source
 )
+from tools import tracing
+from tools.chat_memory import ChatMemory
+from tools.jobs import JobManager
+from tools.polarion_steps import prepare_steps
 import truststore 
 
 truststore.inject_into_ssl()
 load_dotenv()
+if os.getenv("QE_TRACE", "").lower() in ("1", "true", "yes"):
+    tracing.enable(trace_file=os.getenv("QE_TRACE_FILE"))
 MODEL_API=os.getenv("MODEL_API")
 MODEL_ID=os.getenv("MODEL_ID")
 MODEL_KEY=os.getenv("MODEL_KEY")
@@ -29,8 +38,172 @@ POLARION_USER=os.getenv("POLARION_USER")
 POLARION_PASSWD=os.getenv("POLARION_PASSWORD")
 POLARION_PROJECT=os.getenv("POLARION_PROJECT")
 POLARION_TOKEN=os.getenv("POLARION_TOKEN")
-client = AssistantClient(
-    api_key=MODEL_KEY, base_url=MODEL_API, model=MODEL_ID)
+FAILURE_HISTORY_DIR=os.getenv("FAILURE_HISTORY_DIR", "history")
+RULES_FILE="runbooks/component-keywords.md"
+JOB_POLL_SECONDS=float(os.getenv("JOB_POLL_SECONDS") or 2)
+
+# Shared by all sessions of the process instead of being rebuilt on every rerun
+@st.cache_resource(show_spinner=False)
+def get_client():
+    # Strong model from MODEL_ID; routine tasks go to MODEL_FAST_ID when it is set
+    return ModelRouter.from_env()
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    return JobManager()
+
+@st.cache_resource(show_spinner=False)
+def get_guidelines(path, mtime):
+    # mtime is part of the cache key, so an edited runbook is loaded again
+    return load_rules(path)
+
+def guidelines():
+    return get_guidelines(RULES_FILE, os.path.getmtime(RULES_FILE) if os.path.exists(RULES_FILE) else None)
+
+@st.cache_resource(show_spinner=False)
+def get_polarion_client(endpoint, user, password, token):
+    from tools import login_to_polarion
+    return login_to_polarion(polarion_endpoint=endpoint, polarion_user=user, polarion_password=password, polarion_token=token)
+
+client = get_client()
+
+def record_failure_history(url, component, failed_cases, analysis):
+    build = extract_build_from_url(url)
+    if not build:
+        return
+    try:
+        from tools import FailureHistory, parse_classifications
+        FailureHistory.shared(FAILURE_HISTORY_DIR).record_build(
+            build[0], build[1], component, failed_cases,
+            classifications=parse_classifications(analysis))
+    except Exception as e:
+        print(f"Error recording failure history: {e}")
+
+# Background jobs: they run on the JobManager threads, so they return their results
+# instead of touching st.session_state; deliver_job() applies them in the session.
+def analysis_job(job, url_name, guideline):
+    job.update(0.05, f"Collecting failed cases of {url_name}")
+    failure_source = open_source(url_name)
+    failed_cases = collect_cases(failure_source)
+    component = failure_source.component or (failed_cases[0]["Component"] if failed_cases else None)
+    if not component:
+        return {"reply": "Not find the component name", "failed_cases": failed_cases}
+    if not failed_cases:
+        return {"reply": f"No found failed cases for url `{url_name}`.", "failed_cases": failed_cases}
+    job.check_cancelled()
+    job.update(0.4, f"Analysing {len(failed_cases)} failed cases of {component}")
+    analysis = analyze_failed_case(client, component, failed_cases, guidelines_dict=guideline)
+    record_failure_history(url_name, component, failed_cases, analysis)
+    return {"reply": f"{analysis}\n\n[🔗 Link to Jenkins Job]({url_name})", "failed_cases": failed_cases}
+
+def multiple_builds_job(job, build_urls, guideline):
+    from tools import analyze_builds, build_consolidated_report
+    job.update(0.05, f"Analysing {len(build_urls)} builds and their downstream jobs")
+    results = analyze_builds(client, build_urls, guideline)
+    job.check_cancelled()
+    if not results:
+        return {"reply": "Please provide the correct job URLs. For example: https://jenkins-csb-rhacm-tests.dno.corp.redhat.com/view/Global%20Hub/job/globalhub-e2e/819"}
+    for r in results:
+        if not r["error"]:
+            record_failure_history(r["url"], r["component"], r["failed_cases"], r["analysis"])
+    return {"reply": build_consolidated_report(results),
+            "failed_cases": [case for r in results for case in r["failed_cases"]]}
+
+def generation_job(job, case_key, feature_description, test_case_title, code_file_content, polarion_id, force=False):
+    job.update(0.1, f"Generating the script for {polarion_id or 'the description'}")
+    # Stored per case: unchanged steps are served from the store, changed steps are patched in,
+    # an explicit re-generate (force) always gets a fresh script
+    result = generate_test_script_incremental(client, case_key, feature_description, test_case_title,
+                                              code_file_content=code_file_content, force=force)
+    job.check_cancelled()
+    job.update(0.9, "Writing the files")
+    file_info = write_test_files_to_output(
+        result['test_script'], 
+        result['fixture_content'],
+        test_name=polarion_id or (feature_description[:50] if len(feature_description) > 10 else None),
+        case_key=case_key,
+        metadata=generation_metadata(result)
+    )
+    reused = f"_Reused the previous generation of {polarion_id or 'this description'} ({result['mode']})._\n\n" if result["mode"] != "full" else ""
+    version = f"version {file_info['version']}" + (", unchanged" if file_info["reused"] else "")
+    return {"reply": f"""{reused}**Automation scripts:**
+
+```javascript
+{result['test_script']}
+```
+
+**Fixture File:**
+```json
+{result['fixture_content']}
+```
+
+**Files saved to ({version}):**
+- Test script: `{file_info['test_file_path']}`
+- Fixture file: `{file_info['fixture_file_path']}`"""}
+
+def start_job(kind, fn, *args, description=""):
+    """Submit a background job for this session and return the chat reply announcing it."""
+    job_id = get_job_manager().submit(kind, fn, *args, description=description)
+    st.session_state.jobs.append(job_id)
+    return f"⏳ Started job `{job_id}`: {description}. Progress is shown in the sidebar and the result will appear here."
+
+def deliver_job(job):
+    """Post a finished job's result to the chat of this session."""
+    if job.status == "done":
+        reply = job.result["reply"]
+        if "failed_cases" in job.result:
+            st.session_state['failed_cases'] = job.result["failed_cases"]
+    elif job.status == "failed":
+        reply = f"❌ Job `{job.id}` ({job.description}) failed: {job.error}"
+    else:
+        reply = f"Job `{job.id}` ({job.description}) was cancelled."
+    st.session_state.messages.append({"role": "assistant", "content": reply})
+    st.session_state.delivered_jobs.add(job.id)
+    # The job ran in the trace of the request that started it, so the timing covers both
+    st.session_state.last_trace_id = job.trace_id
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_jobs():
+    """Sidebar list of this session's jobs, refreshed on its own so the chat stays usable."""
+    manager = get_job_manager()
+    jobs = [job for job in map(manager.get, st.session_state.jobs) if job is not None]
+    active = [job for job in jobs if job.id not in st.session_state.delivered_jobs]
+    if not active:
+        return
+    st.subheader("⏳ Background jobs")
+    delivered = False
+    for job in active:
+        if job.done:
+            deliver_job(job)
+            delivered = True
+            continue
+        st.caption(f"`{job.id}` {job.description}: {job.status}")
+        st.progress(job.progress, text=job.message)
+        if st.button("Cancel", key=f"cancel-{job.id}"):
+            manager.cancel(job.id)
+    if delivered:
+        # Show the new chat messages
+        st.rerun()
+
+def show_timing_breakdown(trace_id):
+    """Show where the time of the last request went in the sidebar (only when QE_TRACE is set)."""
+    if not tracing.is_enabled() or not trace_id:
+        return
+    rows = tracing.breakdown(trace_id)
+    with st.sidebar:
+        st.subheader("⏱️ Last request timing")
+        st.table([
+            {
+                "Stage": row["stage"],
+                "Calls": row["calls"],
+                "Seconds": round(row["seconds"], 3),
+                "Bytes": int(row["bytes"]),
+                "Prompt tokens": int(row["prompt_tokens"]),
+                "Completion tokens": int(row["completion_tokens"]),
+                "Cache hits": row["cache_hits"],
+            }
+            for row in rows
+        ])
 
 # Streamlit 
 def run_streamlit_app():
@@ -52,6 +225,7 @@ Generate automation scripts and analyze failed test cases.
 - **With Polarion**: `generate automation scripts OCP-40585 with components/MachinePools/MachinePools.jsx` (requires VPN)
 - **Without Polarion**: `generate automation scripts for user login functionality`
 - **Analyze failures**: Paste Jenkins URLs for AI-powered analysis
+- **Analyze a nightly**: Paste an upstream build URL with `upstream`, or several build URLs at once
 """)  
     # manage chat states 
     if "messages" not in st.session_state:
@@ -62,6 +236,18 @@ Generate automation scripts and analyze failed test cases.
 
     if "last_suite_url" not in st.session_state:
      st.session_state.last_suite_url = None
+
+    if "last_polarion_id" not in st.session_state:
+     st.session_state.last_polarion_id = None
+
+    # Rolling summary of the turns that no longer fit the chat context
+    if "chat_memory" not in st.session_state:
+     st.session_state.chat_memory = ChatMemory(client)
+
+    # Background jobs started by this session, and those already posted to the chat
+    if "jobs" not in st.session_state:
+     st.session_state.jobs = []
+     st.session_state.delivered_jobs = set()
  
     # Initial chat records
     if "messages" not in st.session_state:
@@ -73,6 +259,9 @@ Generate automation scripts and analyze failed test cases.
        with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
+    with st.sidebar:
+       show_jobs()
+
     if prompt := st.chat_input("Ask your question, for example, generate the automation scripts or analyse the failed case"):
       # save user input
       st.session_state.messages.append({"role": "user", "content": prompt})
@@ -84,39 +273,53 @@ Generate automation scripts and analyze failed test cases.
                    intent = "generate_test_script"
       elif "re-generate" in prompt.lower() or "generate again" in prompt.lower():
                    intent = st.session_state.last_intent
-      elif "analyse" in prompt.lower() or "http" in prompt.lower():
+      elif "analyse" in prompt.lower() or "http" in prompt.lower() or find_source(prompt):
                    intent = "analyze_failure_url"
       elif "analyse" in prompt.lower() or "re-analyse" in prompt.lower():
                    intent = st.session_state.last_intent
       else:
             intent = None
+      build_urls = re.findall(r"https?://\S+", prompt)
+      if intent == "analyze_failure_url" and (len(build_urls) > 1 or any(
+              kw in prompt.lower() for kw in ("upstream", "downstream", "nightly"))):
+            intent = "analyze_multiple_builds"
       # answer logic
-      with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            reply = ""    
-            if intent == "generate_test_script":
-                    # the logic for generating automation scripts
-                     feature_description = None  # Initialize to avoid UnboundLocalError
-                     match = re.search(r"RHACM4K|OCP-\d+", prompt, re.IGNORECASE)
-                     #match = re.search(prompt, re.IGNORECASE)
-                     if match:
-                      # Initialize reply for this branch
-                      reply = ""
-                      # Check if Polarion credentials are configured
-                      if not POLARION_API:
-                          reply = "❌ **Error**: POLARION_API environment variable is not set. Please configure Polarion credentials in your .env file."
-                      elif not POLARION_PROJECT:
-                          reply = "❌ **Error**: POLARION_PROJECT environment variable is not set. Please configure Polarion credentials in your .env file."
-                      elif not POLARION_TOKEN and not (POLARION_USER and POLARION_PASSWD):
-                          reply = "❌ **Error**: Polarion authentication not configured. Please set either POLARION_TOKEN or both POLARION_USER and POLARION_PASSWORD in your .env file."
+      with tracing.trace("chat_request", intent=intent or "chat") as request_trace:
+          with st.chat_message("assistant"):
+            with st.spinner("Thinking..."):
+                reply = ""    
+                if intent == "generate_test_script":
+                        # the logic for generating automation scripts
+                         feature_description = None  # Initialize to avoid UnboundLocalError
+                         match = re.search(r"(?:RHACM4K|OCP)-\d+", prompt, re.IGNORECASE)
+                         polarion_id = match.group(0).upper() if match else None
+                         # "re-generate" / "generate again" asks for a fresh script, by default of the last Polarion case
+                         regenerate = re.search(r"re-?generate|generate again", prompt, re.IGNORECASE) is not None
+                         if not polarion_id and regenerate:
+                             polarion_id = st.session_state.last_polarion_id
+                         test_case_title = ""
+                         if polarion_id:
+                          # Initialize reply for this branch
+                          reply = ""
+                          # Check if Polarion credentials are configured
+                          if not POLARION_API:
+                              reply = "❌ **Error**: POLARION_API environment variable is not set. Please configure Polarion credentials in your .env file."
+                          elif not POLARION_PROJECT:
+                              reply = "❌ **Error**: POLARION_PROJECT environment variable is not set. Please configure Polarion credentials in your .env file."
+                          elif not POLARION_TOKEN and not (POLARION_USER and POLARION_PASSWD):
+                              reply = "❌ **Error**: Polarion authentication not configured. Please set either POLARION_TOKEN or both POLARION_USER and POLARION_PASSWORD in your .env file."
                       
-                      else:
-                          try:
-                              with st.spinner("Connecting to Polarion..."):
-                                  polarion_client = login_to_polarion(polarion_endpoint=POLARION_API, polarion_user=POLARION_USER, polarion_password=POLARION_PASSWD, polarion_token=POLARION_TOKEN)  
+                          else:
+                              try:
+                                  from tools import get_test_case_by_id
+                                  with st.spinner("Connecting to Polarion..."):
+                                      polarion_client = get_polarion_client(POLARION_API, POLARION_USER, POLARION_PASSWD, POLARION_TOKEN)
+                                  if not polarion_client:
+                                      # Don't keep a failed login for the next request
+                                      get_polarion_client.clear()
                               
-                              if not polarion_client:
-                                  reply = """❌ **Polarion Connection Failed**
+                                  if not polarion_client:
+                                      reply = """❌ **Polarion Connection Failed**
                                   
 **Possible causes:**
 - Invalid or expired authentication token
@@ -130,14 +333,13 @@ Generate automation scripts and analyze failed test cases.
    - Or describe your test scenario directly
 
 **Note**: The standalone Polarion script works fine, so this appears to be a Streamlit-specific authentication issue."""
-                              else:
-                                  polarion_id = match.group(0)
-                                  project_id = POLARION_PROJECT  
-                                  with st.spinner(f"Retrieving test case {polarion_id}..."):
-                                      case, steps, component = get_test_case_by_id(polarion_client, project_id, polarion_id)
+                                  else:
+                                      project_id = POLARION_PROJECT  
+                                      with st.spinner(f"Retrieving test case {polarion_id}..."):
+                                          case, steps, component = get_test_case_by_id(polarion_client, project_id, polarion_id)
                                   
-                                  if not steps:
-                                      reply = f"""❌ **Test Case Not Found**: {polarion_id}
+                                      if not steps:
+                                          reply = f"""❌ **Test Case Not Found**: {polarion_id}
                                       
 **Possible reasons:**
 - Case ID doesn't exist in project {project_id}
@@ -146,14 +348,16 @@ Generate automation scripts and analyze failed test cases.
 
 **Alternative**: Try describing the test scenario instead:
 - `generate automation scripts for <your test description>`"""
-                                  else:
-                                      feature_description = steps
-                                      test_case_title = case.title if case else ""
-                                      st.success(f"✅ Retrieved test case {polarion_id} successfully!")
-                          except Exception as e:
-                              error_msg = str(e)
-                              if "Failed to resolve" in error_msg or "nodename nor servname provided" in error_msg:
-                                  reply = """❌ **Network Error**: Cannot reach Polarion server
+                                      else:
+                                          # Plain-text steps, cached per work item
+                                          feature_description = prepare_steps(steps, polarion_id)["steps"]
+                                          test_case_title = case.title if case else ""
+                                          st.session_state.last_polarion_id = polarion_id
+                                          st.success(f"✅ Retrieved test case {polarion_id} successfully!")
+                              except Exception as e:
+                                  error_msg = str(e)
+                                  if "Failed to resolve" in error_msg or "nodename nor servname provided" in error_msg:
+                                      reply = """❌ **Network Error**: Cannot reach Polarion server
                                   
 **This means:**
 - You're not connected to Red Hat's internal network
@@ -163,8 +367,8 @@ Generate automation scripts and analyze failed test cases.
 1. **Connect to Red Hat VPN** (if you're a Red Hat employee)
 2. **Use text-based generation**: `generate automation scripts for <description>`
 3. **Contact IT** for VPN access to internal tools"""
-                              elif "Authentication failed" in error_msg or "No valid personal access token" in error_msg:
-                                  reply = """❌ **Authentication Error**: Polarion token invalid
+                                  elif "Authentication failed" in error_msg or "No valid personal access token" in error_msg:
+                                      reply = """❌ **Authentication Error**: Polarion token invalid
                                   
 **This means:**
 - Your Polarion token may be expired or invalid
@@ -176,106 +380,67 @@ Generate automation scripts and analyze failed test cases.
 3. **Use text-based generation**: `generate automation scripts for <description>`
 
 **Note**: The standalone script works, suggesting a Streamlit-specific token handling issue."""
-                              else:
-                                  reply = f"""❌ **Polarion Error**: {error_msg}
+                                  else:
+                                      reply = f"""❌ **Polarion Error**: {error_msg}
                                   
 **Alternative**: Try text-based script generation:
 - `generate automation scripts for <your test description>`"""
-                     else:
-                       feature_description = re.sub(r"generate( automation)? scripts", "", prompt, flags=re.IGNORECASE).strip()  
+                         else:
+                           feature_description = re.sub(r"generate( automation)? scripts", "", prompt, flags=re.IGNORECASE).strip()  
                      
-                     # Extract single code file path from prompt if any
-                     code_file_path = extract_code_path_from_prompt(prompt)
-                     code_file_content = None
-                     if code_file_path:
-                         with st.spinner(f"Loading code file: {code_file_path}..."):
-                             try:
-                                 code_file_content = load_code_file(code_file_path)
-                                 st.success(f"✅ Loaded code file: {code_file_path}")
-                             except Exception as e:
-                                 st.error(f"❌ Error loading file {code_file_path}: {str(e)}")
+                         # Extract single code file path from prompt if any
+                         code_file_path = extract_code_path_from_prompt(prompt)
+                         code_file_content = None
+                         if code_file_path:
+                             with st.spinner(f"Loading code file: {code_file_path}..."):
+                                 try:
+                                     code_file_content = load_code_file(code_file_path)
+                                     st.success(f"✅ Loaded code file: {code_file_path}")
+                                 except Exception as e:
+                                     st.error(f"❌ Error loading file {code_file_path}: {str(e)}")
                      
-                     # Only generate test script if we have feature_description and no error reply
-                     if not reply and feature_description:
+                         # Only generate test script if we have feature_description and no error reply
+                         if not reply and feature_description:
                             
-                            result = generate_test_script_with_fixture(client, feature_description, code_file_content=code_file_content)
-                            
-                            # Write files to output directory
-                            file_info = write_test_files_to_output(
-                                result['test_script'], 
-                                result['fixture_content'],
-                                test_name=feature_description[:50] if len(feature_description) > 10 else None
-                            )
-                            
-                            # Update reply to include file paths
-                            reply = f"""**Automation scripts:**
-
-```javascript
-{result['test_script']}
-```
-
-**Fixture File:**
-```json
-{result['fixture_content']}
-```
-
-**Files saved to:**
-- Test script: `{file_info['test_file_path']}`
-- Fixture file: `{file_info['fixture_file_path']}`"""
-                     elif not reply:
-                            reply = f"**No steps available.**"
-                     st.markdown(reply)
-            elif intent == "analyze_failure_url":
-                 # if not st.session_state.get("generated"):
-                    # URL 
-                    url_match = re.match(r"^(.*?/\d+)/", prompt)
-                    #match = re.match(r"^(.*?/\d+)/", url)
-                
-                    url_name = url_match.group(1) if url_match else st.session_state.last_suite_url
-                    if not url_name:
-                        reply = "Please provide the correct job URL. For example: https://jenkins-csb-rhacm-tests.dno.corp.redhat.com/view/Global%20Hub/job/globalhub-e2e/819"
-                    else:
-                        st.session_state.last_suite_url = url_name
-                        component = extract_component_from_url(url_name)
-                        if not component:
-                           reply = f"Not find the component name"
-                        else:   
-                           failed_cases = get_error_message(url_name)
-                           st.session_state['failed_cases'] = failed_cases
-                        if not failed_cases:
-                            reply = f"No found failed cases for url `{url_name}`."
+                                case_key = polarion_id or "text-" + hashlib.sha1(feature_description.encode("utf-8")).hexdigest()[:16]
+                                reply = start_job("generation", generation_job, case_key, feature_description, test_case_title,
+                                                  code_file_content, polarion_id, regenerate,
+                                                  description=f"generate the script for {polarion_id or feature_description[:40]}")
+                         elif not reply:
+                                reply = f"**No steps available.**"
+                         st.markdown(reply)
+                elif intent == "analyze_failure_url":
+                     # if not st.session_state.get("generated"):
+                        # URL 
+                        # Jenkins build, ReportPortal launch or JSON lines export
+                        url_name = find_source(prompt) or st.session_state.last_suite_url
+                        if not url_name:
+                            reply = "Please provide the correct job URL. For example: https://jenkins-csb-rhacm-tests.dno.corp.redhat.com/view/Global%20Hub/job/globalhub-e2e/819"
                         else:
-                            results = []
-                            guideline = load_rules("runbooks/component-keywords.md")     
-                            analysis = analyze_failed_case(client, component, failed_cases, guidelines_dict=guideline)
-                            #results.append(f"{analysis}")
-                            #reply = "\n\n---\n\n".join(results)
-                            reply = analysis
-                            st.session_state.last_intent = "analyze_failure_url" 
-                           # st.session_state.generated = True
-                    st.markdown(reply)
-                    col1, col2 = st.columns([1,1])
-                    with col1:
-                              if st.session_state.last_suite_url:
-                                  st.markdown(
-                                        f"[🔗 Link to Jenkins Job]({st.session_state.last_suite_url})",
-                                        unsafe_allow_html=True,
-                                     )
-            else:
-              # AI chat by default
-              # parse AI response
-              response = client.chat(st.session_state.messages)
-              if isinstance(response, str):
-                reply = response
-              elif isinstance(response, dict) and "choices" in response:
-                reply = response["choices"][0]["message"]["content"]
-              else:
-                 reply = "Unexpected AI response"
-            # show reply
-              st.markdown(reply)
-            # save chat record
-            st.session_state.messages.append({"role": "assistant", "content": reply})
-            st.session_state.last_intent = intent
+                            st.session_state.last_suite_url = url_name
+                            reply = start_job("analysis", analysis_job, url_name, guidelines(), description=f"analyse {url_name}")
+                        st.markdown(reply)
+                elif intent == "analyze_multiple_builds":
+                        reply = start_job("multi-build", multiple_builds_job, build_urls, guidelines(),
+                                          description=f"analyse {len(build_urls)} builds")
+                        st.markdown(reply)
+                else:
+                  # AI chat by default
+                  # parse AI response
+                  response = client.chat(st.session_state.chat_memory.context(st.session_state.messages))
+                  if isinstance(response, str):
+                    reply = response
+                  elif isinstance(response, dict) and "choices" in response:
+                    reply = response["choices"][0]["message"]["content"]
+                  else:
+                     reply = "Unexpected AI response"
+                # show reply
+                  st.markdown(reply)
+                # save chat record
+                st.session_state.messages.append({"role": "assistant", "content": reply})
+                st.session_state.last_intent = intent
+      st.session_state.last_trace_id = getattr(request_trace, "trace_id", None)
+    show_timing_breakdown(st.session_state.get("last_trace_id"))
                 
 if __name__ == "__main__":
     run_streamlit_app()
\ No newline at end of file
@@ -1,17 +1,74 @@
-from typing import Dict, List
-import httpx
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
 import requests
 import urllib3
+from tools import tracing
 
 # Disable SSL warnings for Red Hat internal services
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Seconds a single model request may take; a call can override it with timeout=.
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT") or 120)
+
+_answered_by = contextvars.ContextVar("model_answered_by", default=None)
+
+
+@contextmanager
+def track_models():
+    """Collect the models that answered the calls made inside the block, in call order."""
+    models = []
+    token = _answered_by.set(models)
+    try:
+        yield models
+    finally:
+        _answered_by.reset(token)
+
+
+def _answered(model):
+    models = _answered_by.get()
+    if models is not None:
+        models.append(model)
+
+
 class AssistantClient:
-    def __init__(self, api_key, base_url, model):
+    def __init__(self, api_key, base_url, model, timeout=MODEL_TIMEOUT):
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
+        self.timeout = timeout
+
+    track_models = staticmethod(track_models)
+
     def chat(self, messages, **kwargs):
+        # Routing hints (see ModelRouter); a single client ignores them.
+        kwargs.pop("task", None)
+        kwargs.pop("validate", None)
+        kwargs.pop("escalate", None)
+        deadline = kwargs.pop("deadline", None)
+        if deadline:
+            kwargs.setdefault("timeout", deadline)
+        with tracing.span("llm.chat", model=self.model) as span:
+            span.set("bytes", sum(len(str(msg.get("content", ""))) for msg in messages))
+            response = self._dispatch(messages, **kwargs)
+        _answered(self.model)
+        return response
+
+    def _record_usage(self, data):
+        """Attach token usage from a Claude or OpenAI style response to the current span."""
+        usage = data.get("usage") if isinstance(data, dict) else None
+        if not usage:
+            return
+        span = tracing.current_span()
+        span.set("prompt_tokens", usage.get("input_tokens", usage.get("prompt_tokens", 0)))
+        span.set("completion_tokens", usage.get("output_tokens", usage.get("completion_tokens", 0)))
+
+    def _dispatch(self, messages, **kwargs):
         # Detect API type based on base_url and model
         if "anthropic.com" in self.base_url:
             return self._chat_claude(messages, **kwargs)
@@ -25,6 +82,7 @@ class AssistantClient:
     
     def _chat_claude(self, messages, **kwargs):
         """Handle Claude API calls"""
+        timeout = kwargs.pop("timeout", self.timeout)
         headers = {
             "x-api-key": self.api_key,
             "Content-Type": "application/json",
@@ -53,13 +111,12 @@ class AssistantClient:
         
         if system_message:
             payload["system"] = system_message
-            
-        print("Debug - Claude Request Payload:", payload)
-        
+
         try:
-            response = requests.post(f"{self.base_url.rstrip('/')}/v1/messages", headers=headers, json=payload, verify=False)
+            response = requests.post(f"{self.base_url.rstrip('/')}/v1/messages", headers=headers, json=payload, verify=False, timeout=timeout)
             response.raise_for_status()
             data = response.json()
+            self._record_usage(data)
             return data["content"][0]["text"]
         except requests.exceptions.HTTPError as e:
             print("Status code:", response.status_code)
@@ -68,6 +125,10 @@ class AssistantClient:
     
     def _chat_redhat_claude(self, messages, **kwargs):
         """Handle Red Hat internal Claude API calls"""
+        timeout = kwargs.pop("timeout", self.timeout)
+        # The timeout covers the whole call, not each endpoint tried.
+        deadline_at = time.time() + timeout
+        response = None
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -95,6 +156,9 @@ class AssistantClient:
         ]
         
         for endpoint in possible_endpoints:
+            remaining = deadline_at - time.time()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(f"Red Hat Claude did not answer within {timeout:.0f}s")
             try:
                 if endpoint == "/v1beta/openai/chat/completions":
                     # OpenAI-compatible format
@@ -141,13 +205,14 @@ class AssistantClient:
                         payload["system"] = system_message
                 
                 url = f"{self.base_url.rstrip('/')}{endpoint}"
-                print(f"Debug - Trying Red Hat Claude endpoint: {url}")
-                print(f"Debug - Payload: {payload}")
-                
-                response = requests.post(url, headers=headers, json=payload, verify=False)
+                # The llm.chat span already has the prompt size; record which endpoint was tried last.
+                tracing.current_span().set("endpoint", endpoint)
+
+                response = requests.post(url, headers=headers, json=payload, verify=False, timeout=remaining)
                 
                 if response.status_code == 200:
                     data = response.json()
+                    self._record_usage(data)
                     # Try different response formats
                     if "content" in data and isinstance(data["content"], list):
                         # Standard Claude format
@@ -171,16 +236,21 @@ class AssistantClient:
                     # If it's not a 404, this might be the right endpoint with a different error
                     print(f"Red Hat Claude endpoint {endpoint} returned {response.status_code}: {response.text}")
                     
+            except requests.exceptions.Timeout:
+                # Used up the deadline; the next endpoint would only overrun it.
+                raise
             except Exception as e:
                 print(f"Error trying endpoint {endpoint}: {str(e)}")
                 continue
         
         # If all endpoints fail, raise an error with helpful information
+        last = f"{response.status_code} - {response.text}" if response is not None else "No response"
         raise ConnectionError(f"Could not connect to Red Hat Claude service. Tried endpoints: {possible_endpoints}. "
-                            f"Last response: {response.status_code} - {response.text if 'response' in locals() else 'No response'}")
+                            f"Last response: {last}")
     
     def _chat_openai_compatible(self, messages, **kwargs):
         """Handle OpenAI-compatible API calls (for other models)"""
+        timeout = kwargs.pop("timeout", self.timeout)
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -190,12 +260,12 @@ class AssistantClient:
             "messages": messages,
             **kwargs
         }
-        print("Debug - OpenAI Request Payload:", payload) 
 
         try:
-          response = requests.post(f"{self.base_url.rstrip('/')}/v1/chat/completions", headers=headers, json=payload, verify=False)
+          response = requests.post(f"{self.base_url.rstrip('/')}/v1/chat/completions", headers=headers, json=payload, verify=False, timeout=timeout)
           response.raise_for_status()
           data = response.json()
+          self._record_usage(data)
           message = data["choices"][0]["message"]["content"]
           return message
         except requests.exceptions.HTTPError as e:
@@ -212,3 +282,219 @@ class AssistantClient:
         else:
             raise ValueError("prompt must be str or list of messages")       
         return self.chat(messages, **kwargs)
+
+
+class EndpointHealth:
+    """Recent latencies and consecutive failures of one endpoint."""
+
+    def __init__(self, window: int = 50):
+        self.latencies = deque(maxlen=window)
+        self.failures = 0
+        self.open_until = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class HedgedClient:
+    """
+    Calls the first healthy endpoint; if it has not answered within its
+    hedge_quantile latency (MODEL_HEDGE_DELAY until enough calls were seen),
+    sends the same request to the next endpoint and returns whichever answers
+    first. Errors move on to the next endpoint at once. An endpoint that fails
+    or times out failure_threshold times in a row is skipped for cooldown
+    seconds.
+
+    A request that has started cannot be interrupted: the losing request keeps
+    its pool thread until it answers or reaches the call's deadline, and its
+    answer is discarded (its latency still feeds the endpoint's health). Only
+    requests still queued in the pool are dropped. Size max_workers
+    (MODEL_HEDGE_WORKERS) for the concurrent calls times the endpoints; calls
+    beyond that wait for a thread, and the wait counts against their deadline.
+    """
+
+    def __init__(self, clients: List[AssistantClient], hedge_quantile: float = float(os.getenv("MODEL_HEDGE_QUANTILE") or 0.9),
+                 hedge_delay: float = float(os.getenv("MODEL_HEDGE_DELAY") or 20), deadline: float = MODEL_TIMEOUT,
+                 failure_threshold: int = 3, cooldown: float = 300, max_workers: Optional[int] = None):
+        self.clients = clients
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health = {id(client): EndpointHealth() for client in clients}
+        self.lock = threading.Lock()
+        max_workers = max_workers or int(os.getenv("MODEL_HEDGE_WORKERS") or 4 * len(clients))
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+
+    track_models = staticmethod(track_models)
+
+    @property
+    def model(self):
+        return self.clients[0].model
+
+    def _ordered(self) -> List[AssistantClient]:
+        """Healthy endpoints in configured order; all of them when none is healthy."""
+        now = time.time()
+        with self.lock:
+            healthy = [c for c in self.clients if self.health[id(c)].open_until <= now]
+        return healthy or list(self.clients)
+
+    def _delay(self, client) -> float:
+        with self.lock:
+            observed = self.health[id(client)].quantile(self.hedge_quantile)
+        return self.hedge_delay if observed is None else observed
+
+    def _record(self, client, latency: Optional[float]):
+        with self.lock:
+            health = self.health[id(client)]
+            if latency is not None:
+                health.latencies.append(latency)
+                health.failures = 0
+                return
+            health.failures += 1
+            if health.failures >= self.failure_threshold and health.open_until <= time.time():
+                health.open_until = time.time() + self.cooldown
+                print(f"Skipping model endpoint {client.base_url} for {self.cooldown:.0f}s after {health.failures} failures")
+
+    def _call(self, client, messages, deadline_at, kwargs):
+        # Only the winner counts as having answered; chat() records it.
+        _answered_by.set(None)
+        started = time.time()
+        try:
+            response = client.chat(messages, timeout=max(deadline_at - started, 1), **kwargs)
+        except Exception:
+            self._record(client, None)
+            raise
+        self._record(client, time.time() - started)
+        return response
+
+    def chat(self, messages, deadline: Optional[float] = None, **kwargs):
+        kwargs.pop("timeout", None)
+        deadline_at = time.time() + (deadline or self.deadline)
+        waiting = self._ordered()
+        running = {}
+        last_error = None
+        with tracing.span("llm.hedge", endpoints=len(self.clients)) as span:
+            while True:
+                if waiting and (not running or time.time() >= hedge_at):
+                    client = waiting.pop(0)
+                    running[self.pool.submit(tracing.bind(self._call), client, messages, deadline_at, kwargs)] = client
+                    hedge_at = time.time() + self._delay(client)
+                    span.set("requests", len(running))
+                if not running:
+                    raise last_error or TimeoutError("No model endpoint configured")
+                now = time.time()
+                if now >= deadline_at:
+                    # The requests themselves time out at the deadline and are recorded as failures then.
+                    raise TimeoutError(f"No model endpoint answered within {deadline or self.deadline:.0f}s")
+                wait_for = deadline_at - now if not waiting else min(hedge_at, deadline_at) - now
+                done, _ = wait(list(running), timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    client = running.pop(future)
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        print(f"Model endpoint {client.base_url} failed: {e}")
+                        last_error = e
+                        # Try the next endpoint right away.
+                        hedge_at = 0
+                        continue
+                    span.set("winner", self.clients.index(client))
+                    _answered(client.model)
+                    # Drops losers still queued; running ones finish in the background.
+                    span.set("abandoned", sum(not loser.cancel() for loser in running))
+                    return response
+
+    def __call__(self, prompt, *args, **kwargs):
+        messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        return self.chat(messages, **kwargs)
+
+# Tier used per task; tasks not listed (free chat, for example) use the strong tier.
+TASK_TIERS = {
+    "analyze_failed_case": "fast",
+    "generate_fixture_file": "fast",
+    "fixture_mapping": "fast",
+    "patch_test_script": "fast",
+    "summarize_chat": "fast",
+    "generate_test_script": "strong",
+}
+
+
+class ModelRouter:
+    """
+    Sends each call to a named tier of clients by task. A fast-tier answer that
+    raises, or that the caller's validate(response) rejects (malformed or
+    low-confidence), is retried once on the strong tier, unless the caller
+    passes escalate=False because it has a cheaper fallback of its own: then a
+    rejected answer is returned as is and errors are raised. Without a fast
+    tier everything goes to the strong one.
+    """
+
+    def __init__(self, tiers: Dict[str, "AssistantClient | HedgedClient"], task_tiers: Optional[Dict[str, str]] = None,
+                 default_tier: str = "strong"):
+        self.tiers = tiers
+        self.task_tiers = dict(TASK_TIERS if task_tiers is None else task_tiers)
+        self.default_tier = default_tier
+
+    track_models = staticmethod(track_models)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Strong tier from MODEL_API/MODEL_ID/MODEL_KEY, fast tier from
+        MODEL_FAST_ID (same endpoint unless MODEL_FAST_API/MODEL_FAST_KEY).
+        With MODEL_FALLBACK_API/MODEL_FALLBACK_ID/MODEL_FALLBACK_KEY both tiers
+        hedge to the fallback endpoint.
+        """
+        tiers = {"strong": AssistantClient(api_key=os.getenv("MODEL_KEY"), base_url=os.getenv("MODEL_API"), model=os.getenv("MODEL_ID"))}
+        if os.getenv("MODEL_FAST_ID"):
+            tiers["fast"] = AssistantClient(
+                api_key=os.getenv("MODEL_FAST_KEY") or os.getenv("MODEL_KEY"),
+                base_url=os.getenv("MODEL_FAST_API") or os.getenv("MODEL_API"),
+                model=os.getenv("MODEL_FAST_ID"))
+        if os.getenv("MODEL_FALLBACK_API"):
+            fallback = AssistantClient(
+                api_key=os.getenv("MODEL_FALLBACK_KEY") or os.getenv("MODEL_KEY"),
+                base_url=os.getenv("MODEL_FALLBACK_API"),
+                model=os.getenv("MODEL_FALLBACK_ID") or os.getenv("MODEL_ID"))
+            tiers = {name: HedgedClient([client, fallback]) for name, client in tiers.items()}
+        return cls(tiers)
+
+    @property
+    def model(self):
+        return self.tiers[self.default_tier].model
+
+    def tier_for(self, task: Optional[str]) -> str:
+        tier = self.task_tiers.get(task, self.default_tier)
+        return tier if tier in self.tiers else self.default_tier
+
+    def chat(self, messages, task: Optional[str] = None, validate: Optional[Callable[[str], bool]] = None,
+             escalate: bool = True, **kwargs):
+        tier = self.tier_for(task)
+        with tracing.span("llm.route", task=task or "chat", tier=tier) as span:
+            if tier == self.default_tier:
+                return self.tiers[tier].chat(messages, **kwargs)
+            models = _answered_by.get()
+            mark = len(models) if models is not None else 0
+            try:
+                response = self.tiers[tier].chat(messages, **kwargs)
+                if validate is None or validate(response) or not escalate:
+                    return response
+                print(f"Escalating {task} to the {self.default_tier} model: the {tier} answer did not validate")
+            except Exception as e:
+                if not escalate:
+                    raise
+                print(f"Escalating {task} to the {self.default_tier} model: {e}")
+            if models is not None:
+                # The discarded answer doesn't count.
+                del models[mark:]
+            span.set("escalated", 1)
+            return self.tiers[self.default_tier].chat(messages, **kwargs)
+
+    def __call__(self, prompt, *args, **kwargs):
+        messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        return self.chat(messages, **kwargs)
@@ -0,0 +1,348 @@
+"""
+Local stand-ins for the services the tools talk to, for offline benchmarks.
+
+One threaded HTTP server answers:
+
+- Jenkins: /job/<name>/<build>/testReport/ (HTML), .../testReport/api/json,
+  .../testReport/<case>/summary, /job/<name>/<build>/api/json (downstream
+  builds) and .../logText/progressiveText. Build number N has N failed cases.
+- ReportPortal: /api/v1/<project>/launch, /item and /log with paging.
+  Launch "<name> #N" has N failed items.
+- Model gateway: OpenAI /v1/chat/completions and Anthropic /v1/messages with
+  configurable latency and token rate.
+
+FakePolarionClient mimics the few polarion client calls the tools use.
+"""
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeConfig:
+    def __init__(self, stacktrace_lines=40, page_padding_kb=0, llm_latency=0.2, llm_tokens_per_second=400.0,
+                 llm_completion_tokens=300, jenkins_latency=0.0, downstream_jobs=12, rp_logs_per_item=3,
+                 console_lines=20000, last_completed_build=5, rp_launches=1000):
+        self.stacktrace_lines = stacktrace_lines
+        # Extra markup per testReport page, to simulate multi-megabyte reports.
+        self.page_padding_kb = page_padding_kb
+        self.llm_latency = llm_latency
+        self.llm_tokens_per_second = llm_tokens_per_second
+        self.llm_completion_tokens = llm_completion_tokens
+        self.jenkins_latency = jenkins_latency
+        self.downstream_jobs = downstream_jobs
+        self.rp_logs_per_item = rp_logs_per_item
+        self.console_lines = console_lines
+        # Reported as lastCompletedBuild by every job; raise it to simulate new builds.
+        self.last_completed_build = last_completed_build
+        # "bench-launch #N" launches listed by an unfiltered /launch query; launch N has N failed items.
+        self.rp_launches = rp_launches
+
+
+def case_path(job, index):
+    return f"junit/RHACM4K_{10000 + index}__{job}__policies__Verify_policy_case_{index}"
+
+
+def stacktrace(index, lines):
+    frames = [f"    at Context.<anonymous> (cypress/tests/policy_{index}.spec.js:{index % 90 + 10}:12)"]
+    frames += [f"    at runnable (node_modules/cypress/runner/runnable.js:{n}:5)" for n in range(lines - 1)]
+    return f"AssertionError: Timed out retrying after 120000ms: Expected to find element: #policy-{index}\n" + "\n".join(frames)
+
+
+def jenkins_report_html(job, failures, padding_kb):
+    rows = []
+    for i in range(failures):
+        path = case_path(job, i)
+        rows.append(
+            f'<tr><td class="pane"><a href="{path}">{path}</a>'
+            f'<div class="failure-summary" id="test-{path}" style="display: none">'
+            f'<h4>Error Message</h4><pre>RHACM4K case {i} failed</pre></div></td>'
+            f'<td class="pane" style="text-align:right;">1.2 sec</td></tr>'
+        )
+    padding = "<!-- " + "x" * (padding_kb * 1024) + " -->" if padding_kb else ""
+    return (f"<html><head><title>Test Result : {job}</title></head><body>{padding}"
+            f"<table class=\"pane sortable\" id=\"testresult\">{''.join(rows)}</table></body></html>")
+
+
+def jenkins_case_html(path, index, lines):
+    return (f"<html><head><title>{path}</title></head><body><h1>Failed</h1>"
+            f"<h3>Error Message</h3><pre style=\"display: \" id=\"test-{path}-error\">"
+            f"Timed out retrying after 120000ms: Expected to find element: #policy-{index}</pre>"
+            f"<h3>Stacktrace</h3><pre id=\"test-{path}-stacktrace\">{stacktrace(index, lines)}</pre></body></html>")
+
+
+def jenkins_report_json(job, failures, lines):
+    cases = []
+    for i in range(failures):
+        path = case_path(job, i)
+        class_name, name = path.split("/", 1)
+        cases.append({"className": class_name, "name": name, "status": "FAILED",
+                      "errorDetails": f"Timed out retrying after 120000ms: Expected to find element: #policy-{i}",
+                      "errorStackTrace": stacktrace(i, lines)})
+    return {"failCount": failures, "suites": [{"name": job, "cases": cases}]}
+
+
+def console_log(lines):
+    out = []
+    for n in range(lines):
+        if n % 997 == 0 and n:
+            out.append(f"Error: failed to get the managedcluster resources ({n})")
+        else:
+            out.append(f"[{n:08d}] INFO step {n} finished")
+    return ("\n".join(out) + "\n").encode()
+
+
+def fake_completion(prompt, completion_tokens):
+    """A response shaped like what each tools prompt asks for."""
+    if "failed cases list" in prompt:
+        ids = sorted(set(re.findall(r"Case ID: (\S+)", prompt)))
+        rows = "\n".join(f"| {case} | case | Automation bug | timed out | re-run |" for case in ids)
+        return ("#### Test failure Analysis report\n\n| Case ID | Case Title | Failure Type With High Possibility "
+                f"| Assert Reason |Suggestion/Note|\n|---|---|---|---|---|\n{rows}\n")
+    if "fixture" in prompt.lower() and "JSON fixture" in prompt:
+        return '```json\n{"bench-profile": {"day1-profile": {"ClusterName": "bench", "Region": "us-east-1"}}}\n```'
+    body = "\n".join(f"    cy.get('[data-testid=\"step-{n}\"]').click();" for n in range(max(completion_tokens // 12, 1)))
+    return f"```javascript\ndescribe('Bench', () => {{\n  it('runs', () => {{\n{body}\n  }});\n}});\n```"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _send(self, body, content_type="text/html", status=200, headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+            content_type = "application/json"
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.count_request()
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        # Jenkins tolerates the double slashes get_error_message produces.
+        path = re.sub(r"/{2,}", "/", parsed.path)
+        if path.startswith("/api/v1/"):
+            return self._reportportal(path, query)
+        if "/job/" in path:
+            return self._jenkins(path, query)
+        self._send("not found", status=404)
+
+    def do_POST(self):
+        self.server.count_request()
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+        if path.endswith("/chat/completions") or path.endswith("/messages"):
+            return self._llm(path, payload)
+        self._send("not found", status=404)
+
+    def _jenkins(self, path, query):
+        if self.config.jenkins_latency:
+            time.sleep(self.config.jenkins_latency)
+        job_api = re.match(r"^.*/job/(?P<job>[^/]+)/api/json/?$", path)
+        if job_api:
+            return self._jenkins_job(job_api.group("job"))
+        match = re.match(r"^(?P<prefix>.*?)/job/(?P<job>[^/]+)/(?P<build>\d+)(?P<rest>/.*)?$", path)
+        if not match:
+            return self._send("not found", status=404)
+        job, build, rest = match.group("job"), int(match.group("build")), match.group("rest") or "/"
+        lines = self.config.stacktrace_lines
+        if rest in ("/api/json", "/api/json/"):
+            if job.startswith("upstream"):
+                per_job = max(build // max(self.config.downstream_jobs, 1), 1)
+                subs = [{"jobName": f"c{n}-e2e", "buildNumber": per_job, "result": "UNSTABLE",
+                         "url": f"job/c{n}-e2e/{per_job}/"} for n in range(self.config.downstream_jobs)]
+                return self._send({"number": build, "subBuilds": subs})
+            return self._send({"number": build, "result": "UNSTABLE", "subBuilds": []})
+        if rest.startswith("/testReport/api/json"):
+            return self._send(jenkins_report_json(job, build, lines))
+        if rest.rstrip("/") == "/testReport":
+            return self._send(jenkins_report_html(job, build, self.config.page_padding_kb))
+        if rest.startswith("/testReport/") and rest.rstrip("/").endswith("/summary"):
+            case = rest[len("/testReport/"):].rstrip("/")[:-len("/summary")]
+            index = int(re.search(r"Verify_policy_case_(\d+)", case).group(1))
+            return self._send(jenkins_case_html(case, index, lines))
+        if rest.startswith("/logText/progressiveText"):
+            log = self.server.console(self.config.console_lines)
+            start = int(query.get("start", 0))
+            chunk = log[start:start + 256 * 1024]
+            more = start + len(chunk) < len(log)
+            headers = {"X-Text-Size": str(start + len(chunk))}
+            if more:
+                headers["X-More-Data"] = "true"
+            return self._send(chunk, content_type="text/plain", headers=headers)
+        self._send("not found", status=404)
+
+    def _jenkins_job(self, job):
+        number = self.config.last_completed_build
+        etag = f'"{job}-{number}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send({"lastCompletedBuild": {"number": number}}, headers={"ETag": etag})
+
+    def _reportportal(self, path, query):
+        page = int(query.get("page.page", 1))
+        size = int(query.get("page.size", 20))
+        if path.endswith("/launch/latest"):
+            return self._send({"content": []})
+        launch = re.search(r"/launch/(\d+)$", path)
+        if launch:
+            number = int(launch.group(1))
+            return self._send({"id": number, "name": "bench-launch", "number": number})
+        if path.endswith("/launch"):
+            if "filter.eq.name" not in query:
+                content = [{"id": n, "name": "bench-launch", "number": n} for n in range(self.config.rp_launches, 0, -1)]
+                return self._paged(content, page, size)
+            number = int(query.get("filter.eq.number", 1))
+            content = [{"id": number, "name": query["filter.eq.name"], "number": number}]
+            return self._paged(content, page, size)
+        if path.endswith("/item"):
+            failures = int(query.get("filter.eq.launchId", 0))
+            content = [{"id": failures * 100000 + i, "name": f"RHACM4K-{10000 + i}: verify policy case {i}",
+                        "status": "FAILED"} for i in range(failures)]
+            return self._paged(content, page, size)
+        if path.endswith("/log"):
+            item = int(query.get("filter.eq.item", 0))
+            content = [{"time": 1700000000000 + n, "level": "ERROR",
+                        "message": stacktrace(item % 100000, self.config.stacktrace_lines) if n else f"case {item} failed"}
+                       for n in range(self.config.rp_logs_per_item)]
+            return self._paged(content, page, size)
+        self._send("not found", status=404)
+
+    def _paged(self, content, page, size):
+        total_pages = max(math.ceil(len(content) / size), 1)
+        window = content[(page - 1) * size:page * size]
+        # ReportPortal pages are 1-based.
+        self._send({"content": window, "page": {"number": page, "size": size,
+                                                "totalElements": len(content), "totalPages": total_pages}})
+
+    def _llm(self, path, payload):
+        messages = payload.get("messages", [])
+        prompt = "\n".join(
+            m["content"] if isinstance(m.get("content"), str) else " ".join(c.get("text", "") for c in m["content"])
+            for m in messages
+        )
+        prompt_tokens = max(len(prompt) // 4, 1)
+        completion_tokens = self.config.llm_completion_tokens
+        time.sleep(self.config.llm_latency + completion_tokens / self.config.llm_tokens_per_second)
+        text = fake_completion(prompt, completion_tokens)
+        if path.endswith("/messages"):
+            return self._send({"content": [{"type": "text", "text": text}],
+                               "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens}})
+        self._send({"choices": [{"message": {"role": "assistant", "content": text}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}})
+
+
+class FakeServices:
+    """Start the fake Jenkins/ReportPortal/model server on a free local port."""
+
+    def __init__(self, config=None):
+        self.config = config or FakeConfig()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.config = self.config
+        self.server.requests = 0
+        lock = threading.Lock()
+        console_cache = {}
+
+        def count_request():
+            with lock:
+                self.server.requests += 1
+
+        def console(lines):
+            if lines not in console_cache:
+                console_cache[lines] = console_log(lines)
+            return console_cache[lines]
+
+        self.server.count_request = count_request
+        self.server.console = console
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def jenkins_build_url(self, failures, job="grc-e2e-test-execution"):
+        return f"{self.url}/job/qe-acm-automation-poc/job/{job}/{failures}/"
+
+    def upstream_build_url(self, failures):
+        return f"{self.url}/job/qe-acm-automation-poc/job/upstream-nightly/{failures}/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+class FakeWorkitem:
+    def __init__(self, case_id, steps, latency):
+        self.id = case_id
+        self.title = f"Verify policy creation for {case_id}"
+        self._steps = steps
+        self._latency = latency
+
+    def getTestSteps(self):
+        time.sleep(self._latency)
+        return self._steps
+
+    def getCustomField(self, name):
+        return "grc" if name == "casecomponent" else None
+
+
+class FakeProject:
+    def __init__(self, steps, latency):
+        self._steps = steps
+        self._latency = latency
+
+    def getWorkitem(self, case_id):
+        time.sleep(self._latency)
+        return FakeWorkitem(case_id, self._steps, self._latency)
+
+
+class FakePolarionClient:
+    """Stand-in for polarion.Polarion returning rich-text steps like the real work items."""
+
+    def __init__(self, steps=8, latency=0.05):
+        self.latency = latency
+        self.steps = [
+            {
+                "step": f"<p><span style=\"font-size: 10pt;\">Log in to the console and input \"bench-cluster-{n}\" "
+                        f"in the <b>Cluster name</b> field, select region \"us-east-{n % 2 + 1}\"</span></p>",
+                "expectedResult": f"<p><span style=\"font-size: 10pt;\">The cluster form step {n} is valid</span></p>",
+            }
+            for n in range(steps)
+        ]
+
+    def getProject(self, project_id):
+        time.sleep(self.latency)
+        return FakeProject(self.steps, self.latency)
@@ -0,0 +1,233 @@
+"""
+Offline performance benchmarks against local fake services.
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenario analysis-100 --repeat 5
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --tolerance 0.2
+
+Each scenario is run --repeat times. The report shows throughput (items per
+second), p50/p95 latency per run and peak Python memory. With --baseline the
+run exits non-zero when a scenario's p50 latency or peak memory regressed by
+more than --tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_services import FakeConfig, FakePolarionClient, FakeServices
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+RP_PROJECT = "bench"
+
+
+def _client(services):
+    from agents.assistant_clients import AssistantClient
+    return AssistantClient(api_key="bench", base_url=services.url, model="bench-model")
+
+
+def _guidelines():
+    from tools import load_rules
+    return load_rules("runbooks/component-keywords.md")
+
+
+def analysis_scenario(failures):
+    def run(services):
+        from tools import analyze_failed_case, get_error_message
+        failed_cases = get_error_message(services.jenkins_build_url(failures))
+        analyze_failed_case(_client(services), "grc", failed_cases, _guidelines())
+        return len(failed_cases)
+    return run
+
+
+def multi_build_scenario(failures):
+    def run(services):
+        from tools import analyze_builds
+        results = analyze_builds(_client(services), [services.upstream_build_url(failures)], _guidelines())
+        return sum(len(r["failed_cases"]) for r in results)
+    return run
+
+
+def reportportal_scenario(failures):
+    def run(services):
+        os.environ.update({"RP_ENDPOINT": services.url, "RP_APITOKEN": "bench", "RP_PROJECT": RP_PROJECT})
+        from tools import get_results_from_reportportal as rp
+        rp.base_url = services.url
+        rp.project = RP_PROJECT
+        # In memory only, so every run measures the lookup instead of a warm index file.
+        rp.launch_index = rp.LaunchIndex()
+        return len(rp.get_failed_cases_from_launch(f"bench-launch #{failures}"))
+    return run
+
+
+def generation_scenario(count):
+    def run(services):
+        from tools import get_test_case_by_id
+        from tools.utils import generate_test_script_with_polarion_fixture
+        polarion = FakePolarionClient()
+        client = _client(services)
+        for n in range(count):
+            case, steps, _ = get_test_case_by_id(polarion, "RHACM4K", f"RHACM4K-{n}")
+            generate_test_script_with_polarion_fixture(client, steps, case.title, force_cypress=True)
+        return count
+    return run
+
+
+# What the Streamlit app and the CLIs import before their first request.
+COLD_START_MODULES = ["tools", "tools.utils", "tools.failure_sources", "tools.chat_memory", "agents.assistant_clients"]
+
+
+def cold_start_scenario(modules):
+    def run(services):
+        subprocess.run([sys.executable, "-c", "import " + ", ".join(modules)], check=True)
+        return 1
+    return run
+
+
+def import_profile(modules, top=20):
+    """Print the slowest imports (cumulative microseconds) of a fresh interpreter importing the modules."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>9.1f} ms  {name}")
+
+
+SCENARIOS = {
+    "analysis-10": analysis_scenario(10),
+    "analysis-100": analysis_scenario(100),
+    "analysis-1000": analysis_scenario(1000),
+    "multi-build-120": multi_build_scenario(120),
+    "reportportal-100": reportportal_scenario(100),
+    "generation-10": generation_scenario(10),
+    "cold-start": cold_start_scenario(COLD_START_MODULES),
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_scenario(name, services, repeat):
+    run = SCENARIOS[name]
+    latencies = []
+    items = 0
+    tracemalloc.start()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items += run(services)
+        latencies.append(time.perf_counter() - started)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "scenario": name,
+        "runs": repeat,
+        "items": items,
+        "throughput": items / sum(latencies) if sum(latencies) else 0.0,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 95),
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human readable regressions against the baseline."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result["scenario"])
+        if not base:
+            continue
+        for key in ("p50", "peak_memory_mb"):
+            if base[key] and result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{result['scenario']}: {key} {result[key]:.3f} > baseline {base[key]:.3f}")
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"{'scenario':<20} {'items/s':>10} {'p50 s':>9} {'p95 s':>9} {'peak MB':>9} {'vs base p50':>12}")
+    for r in results:
+        base = baseline.get(r["scenario"], {})
+        delta = f"{(r['p50'] / base['p50'] - 1) * 100:+.1f}%" if base.get("p50") else "-"
+        print(f"{r['scenario']:<20} {r['throughput']:>10.1f} {r['p50']:>9.3f} {r['p95']:>9.3f} "
+              f"{r['peak_memory_mb']:>9.1f} {delta:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline performance benchmarks against fake services.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake model time to first token, seconds")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=400.0, help="Fake model token rate")
+    parser.add_argument("--stacktrace-lines", type=int, default=40, help="Frames per fake stacktrace")
+    parser.add_argument("--page-padding-kb", type=int, default=0, help="Extra markup per fake testReport page")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression before failing (0.2 = 20%%)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--import-profile", action="store_true", help="Show the slowest imports of a cold start and exit")
+    args = parser.parse_args()
+
+    if args.import_profile:
+        import_profile(COLD_START_MODULES)
+        return 0
+
+    config = FakeConfig(stacktrace_lines=args.stacktrace_lines, page_padding_kb=args.page_padding_kb,
+                        llm_latency=args.llm_latency, llm_tokens_per_second=args.llm_tokens_per_second)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    # Import up front so the first scenario doesn't pay (or trace) the import cost.
+    import agents.assistant_clients  # noqa: F401
+    import tools.multi_build_analysis  # noqa: F401
+    import tools.utils  # noqa: F401
+
+    results = []
+    # The tools print every case they collect; keep the benchmark output readable.
+    stdout = sys.stdout
+    with FakeServices(config) as services:
+        for name in args.scenario or list(SCENARIOS):
+            sys.stdout = open(os.devnull, "w")
+            try:
+                results.append(run_scenario(name, services, args.repeat))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            print(f"finished {name}", file=sys.stderr)
+
+    print_table(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        merged = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        merged.update({r["scenario"]: r for r in results})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+const appProfiles = require("../fixtures/AlcSubscriptionApplication.json");
+const app = appProfiles["alc-git-subscription"]["day1-profile"];
+const day2 = appProfiles["alc-git-subscription"]["day2-profile"];
+
+const appUrl = `/multicloud/applications/details/${app.Namespace}/${app.ApplicationName}`;
+
+describe(
+  "ALC - Deploy a subscription application from a Git repository",
+  { tags: ["alc", "application", "subscription", "git"] },
+  () => {
+    before(() => {
+      cy.exec(`oc delete namespace ${app.Namespace} --ignore-not-found --wait=true`, { timeout: 300000 });
+    });
+
+    after(() => {
+      cy.exec(`oc delete application.app.k8s.io ${app.ApplicationName} -n ${app.Namespace} --ignore-not-found`);
+      cy.exec(`oc delete namespace ${app.Namespace} --ignore-not-found`);
+    });
+
+    it("Open the subscription application wizard", () => {
+      cy.visit("/multicloud/applications");
+      cy.contains("button", "Create application", { timeout: 60000 }).click();
+      cy.contains("Subscription").click();
+      cy.url().should("include", "/create/subscription");
+    });
+
+    it("Fill in the application name, namespace and Git repository", () => {
+      cy.get("#eman").type(app.ApplicationName);
+      cy.get("#emanspace").type(app.Namespace);
+      cy.get(`#${app.RepositoryType.toLowerCase()}`).click();
+      cy.get("#githubURL").type(app.RepositoryURL, { timeout: 30000 });
+      cy.get("#githubBranch", { timeout: 30000 }).type(app.Branch);
+      cy.get("#githubPath").type(app.Path);
+    });
+
+    it("Deploy to the local cluster and create", () => {
+      cy.get("#local-cluster-checkbox").check();
+      cy.get("#create-button-portal-id-btn").click();
+      cy.url({ timeout: 60000 }).should("include", appUrl);
+    });
+
+    it("Become ready with the resources of the repository", () => {
+      cy.exec(
+        `oc wait subscription.apps.open-cluster-management.io -n ${app.Namespace} --all ` +
+          `--for=jsonpath='{.status.phase}'=Propagated --timeout=${app.ReadyTimeout / 1000}s`,
+        { timeout: app.ReadyTimeout + 10000 }
+      );
+      cy.visit(`${appUrl}/topology`);
+      app.ExpectedResources.forEach((kind) => {
+        cy.get("#topology", { timeout: app.ReadyTimeout }).should("contain.text", kind.toLowerCase());
+      });
+      cy.exec(`oc get route -n ${app.Namespace} -o jsonpath='{.items[0].spec.host}'`)
+        .its("stdout")
+        .should("not.be.empty");
+    });
+
+    it("Delete the application together with its deployed resources", () => {
+      cy.visit(appUrl);
+      cy.contains("button", "Actions").click();
+      cy.contains("Delete application").click();
+      if (day2.DeleteResources) {
+        cy.get("#remove-app-resources").check();
+      }
+      cy.contains("button", "Delete").click();
+      cy.url({ timeout: 60000 }).should("match", /\/multicloud\/applications$/);
+      cy.contains("a", app.ApplicationName).should("not.exist");
+      cy.exec(
+        `oc wait deployment -n ${app.Namespace} --all --for=delete --timeout=${day2.DeleteTimeout / 1000}s`,
+        { timeout: day2.DeleteTimeout + 10000 }
+      );
+    });
+  }
+);
@@ -0,0 +1,76 @@
+const clusterProfiles = require("../fixtures/ClcImportCluster.json");
+const cluster = clusterProfiles["clc-import-cluster"]["day1-profile"];
+const day2 = clusterProfiles["clc-import-cluster"]["day2-profile"];
+
+const kubeconfig = Cypress.env("IMPORT_KUBECONFIG");
+const clusterUrl = `/multicloud/infrastructure/clusters/details/${cluster.ClusterName}/${cluster.ClusterName}/overview`;
+
+describe(
+  "CLC - Import an OpenShift cluster with a kubeconfig, relabel and detach it",
+  { tags: ["clc", "import", "managedcluster"] },
+  () => {
+    before(() => {
+      cy.exec(`oc delete managedcluster ${cluster.ClusterName} --ignore-not-found --wait=true`, {
+        timeout: 300000,
+      });
+    });
+
+    it("Launch the import cluster wizard", () => {
+      cy.visit("/multicloud/infrastructure/clusters/managed");
+      cy.contains("button", "Import cluster", { timeout: 60000 }).should("be.enabled").click();
+      cy.url().should("include", "/import");
+    });
+
+    it("Fill in the cluster details and the kubeconfig", () => {
+      cy.get("#clusterName").type(cluster.ClusterName);
+      cy.get("#managedClusterSet").click();
+      cy.contains("button", cluster.ClusterSet).click();
+      Object.entries(cluster.Labels).forEach(([key, value]) => {
+        cy.get("#additionalLabels input").type(`${key}=${value}{enter}`);
+      });
+      cy.get("#import-mode").click();
+      cy.contains("button", cluster.ImportMode).click();
+      cy.get("#kubeConfigEntry").type(kubeconfig, { log: false, delay: 0 });
+      cy.contains("button", "Next").click();
+    });
+
+    it("Review and import", () => {
+      cy.contains("Review").should("be.visible");
+      cy.contains(cluster.ClusterName).should("be.visible");
+      cy.contains("button", "Import").click();
+      cy.url({ timeout: 60000 }).should("include", clusterUrl);
+    });
+
+    it("Become Ready with the default add-ons available", () => {
+      cy.contains("#status", cluster.ExpectedStatus, { timeout: cluster.ImportTimeout }).should("be.visible");
+      cy.exec(
+        `oc get managedclusteraddons -n ${cluster.ClusterName} ` +
+          `-o jsonpath='{range .items[?(@.status.conditions[?(@.type=="Available")].status=="True")]}{.metadata.name}{"\\n"}{end}'`
+      ).then(({ stdout }) => {
+        cluster.Addons.forEach((addon) => expect(stdout).to.include(addon));
+      });
+    });
+
+    it("Update the cluster labels", () => {
+      cy.visit(clusterUrl);
+      cy.contains("button", "Actions").click();
+      cy.contains("Edit labels").click();
+      Object.entries(day2.Labels).forEach(([key, value]) => {
+        cy.get("#labels-input").type(`${key}=${value}{enter}`);
+      });
+      cy.contains("button", "Save").click();
+      cy.exec(`oc get managedcluster ${cluster.ClusterName} -o jsonpath='{.metadata.labels.environment}'`)
+        .its("stdout")
+        .should("eq", day2.Labels.environment);
+    });
+
+    it("Detach the cluster", () => {
+      cy.contains("button", "Actions").click();
+      cy.contains("Detach cluster").click();
+      cy.get("#confirm").type(cluster.ClusterName);
+      cy.contains("button", "Detach").click();
+      cy.url({ timeout: 60000 }).should("include", "/multicloud/infrastructure/clusters/managed");
+      cy.contains("a", cluster.ClusterName, { timeout: 300000 }).should("not.exist");
+    });
+  }
+);
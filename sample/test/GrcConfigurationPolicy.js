@@ -0,0 +1,123 @@
+const policyProfiles = require("../fixtures/GrcConfigurationPolicy.json");
+const policy = policyProfiles["grc-configuration-policy"]["day1-profile"];
+const enforced = policyProfiles["grc-configuration-policy"]["day2-profile"];
+
+const policyUrl = `/multicloud/governance/policies/details/${policy.Namespace}/${policy.PolicyName}`;
+const manifestPath = "cypress/tmp/grc-configuration-policy.json";
+
+// Policy, Placement and PlacementBinding built from the fixture; oc accepts JSON lists.
+function policyManifests(remediation) {
+  return {
+    apiVersion: "v1",
+    kind: "List",
+    items: [
+      {
+        apiVersion: "policy.open-cluster-management.io/v1",
+        kind: "Policy",
+        metadata: {
+          name: policy.PolicyName,
+          namespace: policy.Namespace,
+          annotations: {
+            "policy.open-cluster-management.io/standards": policy.Standards,
+            "policy.open-cluster-management.io/categories": policy.Categories,
+            "policy.open-cluster-management.io/controls": policy.Controls,
+          },
+        },
+        spec: {
+          remediationAction: remediation,
+          disabled: false,
+          "policy-templates": [
+            {
+              objectDefinition: {
+                apiVersion: "policy.open-cluster-management.io/v1",
+                kind: "ConfigurationPolicy",
+                metadata: { name: `${policy.PolicyName}-config` },
+                spec: {
+                  remediationAction: remediation,
+                  severity: policy.Severity,
+                  "object-templates": [
+                    { complianceType: "musthave", objectDefinition: policy.ObjectDefinition },
+                  ],
+                },
+              },
+            },
+          ],
+        },
+      },
+      {
+        apiVersion: "cluster.open-cluster-management.io/v1beta1",
+        kind: "Placement",
+        metadata: { name: policy.Placement.Name, namespace: policy.Namespace },
+        spec: {
+          clusterSets: [policy.Placement.ClusterSet],
+          predicates: [
+            { requiredClusterSelector: { labelSelector: { matchLabels: policy.Placement.LabelSelector } } },
+          ],
+        },
+      },
+      {
+        apiVersion: "policy.open-cluster-management.io/v1",
+        kind: "PlacementBinding",
+        metadata: { name: `${policy.PolicyName}-binding`, namespace: policy.Namespace },
+        placementRef: {
+          apiGroup: "cluster.open-cluster-management.io",
+          kind: "Placement",
+          name: policy.Placement.Name,
+        },
+        subjects: [
+          { apiGroup: "policy.open-cluster-management.io", kind: "Policy", name: policy.PolicyName },
+        ],
+      },
+    ],
+  };
+}
+
+describe(
+  "GRC - Configuration policy reports a missing namespace and creates it when enforced",
+  { tags: ["grc", "policy", "configuration-policy"] },
+  () => {
+    before(() => {
+      cy.exec(`oc create namespace ${policy.Namespace} --dry-run=client -o yaml | oc apply -f -`);
+      cy.exec(`oc delete namespace ${policy.ObjectDefinition.metadata.name} --ignore-not-found`);
+    });
+
+    after(() => {
+      cy.exec(`oc delete -f ${manifestPath} --ignore-not-found`, { failOnNonZeroExit: false });
+      cy.exec(`oc delete namespace ${policy.ObjectDefinition.metadata.name} --ignore-not-found`);
+    });
+
+    it("Create the inform policy and its placement", () => {
+      cy.writeFile(manifestPath, policyManifests(policy.Remediation));
+      cy.exec(`oc apply -f ${manifestPath}`).its("code").should("eq", 0);
+      cy.visit("/multicloud/governance/policies");
+      cy.contains("a", policy.PolicyName, { timeout: 60000 }).should("be.visible").click();
+      cy.url().should("include", policyUrl);
+      cy.contains(policy.Remediation, { matchCase: false }).should("be.visible");
+    });
+
+    it("Report local-cluster as non-compliant while the namespace is missing", () => {
+      cy.visit(`${policyUrl}/results`);
+      cy.contains("tr", "local-cluster", { timeout: 120000 }).should("contain.text", "Violations");
+      cy.exec(
+        `oc get policy ${policy.PolicyName} -n ${policy.Namespace} -o jsonpath='{.status.compliant}'`
+      )
+        .its("stdout")
+        .should("eq", policy.ExpectedStatus);
+    });
+
+    it("Create the namespace once the policy is enforced", () => {
+      cy.writeFile(manifestPath, policyManifests(enforced.Remediation));
+      cy.exec(`oc apply -f ${manifestPath}`).its("code").should("eq", 0);
+      cy.visit(`${policyUrl}/results`);
+      cy.contains("tr", "local-cluster", { timeout: 120000 }).should("contain.text", "No violations");
+      cy.exec(`oc get namespace ${policy.ObjectDefinition.metadata.name} -o jsonpath='{.status.phase}'`)
+        .its("stdout")
+        .should("eq", "Active");
+      cy.exec(
+        `oc get policy ${policy.PolicyName} -n ${policy.Namespace} -o jsonpath='{.status.compliant}'`
+      )
+        .its("stdout")
+        .should("eq", enforced.ExpectedStatus);
+    });
+  }
+);
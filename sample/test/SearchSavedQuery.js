@@ -0,0 +1,73 @@
+const searchProfiles = require("../fixtures/SearchQueries.json");
+const search = searchProfiles["search-saved-query"]["day1-profile"];
+const renamed = searchProfiles["search-saved-query"]["day2-profile"];
+
+const labelArgs = Object.entries(search.Labels)
+  .map(([key, value]) => `${key}=${value}`)
+  .join(" ");
+
+// The search collector syncs periodically: repeat the query until the result shows up.
+function searchUntilFound(query, text, attempts = 18) {
+  cy.get("#acm-search-bar").clear().type(`${query}{enter}`);
+  cy.get("body").then(($body) => {
+    if (!$body.text().includes(text) && attempts > 1) {
+      cy.wait(10000);
+      searchUntilFound(query, text, attempts - 1);
+    }
+  });
+}
+
+describe(
+  "Search - Find a deployment by namespace and label and save the query",
+  { tags: ["search", "saved-search"] },
+  () => {
+    before(() => {
+      cy.exec(`oc create namespace ${search.Namespace} --dry-run=client -o yaml | oc apply -f -`);
+      cy.exec(
+        `oc create deployment ${search.DeploymentName} -n ${search.Namespace} --image=${search.Image} ` +
+          `--dry-run=client -o yaml | oc apply -f -`
+      );
+      cy.exec(`oc label deployment ${search.DeploymentName} -n ${search.Namespace} ${labelArgs} --overwrite`);
+    });
+
+    after(() => {
+      cy.exec(`oc delete namespace ${search.Namespace} --ignore-not-found`);
+    });
+
+    it("Find the deployment once the search collector indexed it", () => {
+      cy.visit("/multicloud/search");
+      searchUntilFound(search.Query, search.DeploymentName, search.IndexTimeout / 10000);
+      cy.contains(".pf-v5-c-expandable-section", "Deployment").should("contain.text", `(${search.ExpectedCount})`);
+      cy.contains("a", search.DeploymentName).should("be.visible");
+    });
+
+    it("Open the deployment details from the result", () => {
+      cy.contains("a", search.DeploymentName).click();
+      cy.url().should("include", "/multicloud/search/resources");
+      cy.contains(search.Namespace).should("be.visible");
+      cy.contains("YAML").click();
+      cy.contains(search.Image).should("exist");
+    });
+
+    it("Save the search", () => {
+      cy.go("back");
+      cy.contains("button", "Save search").click();
+      cy.get("#add-query-name").type(search.SavedSearchName);
+      cy.get("#add-query-desc").type(search.SavedSearchDescription);
+      cy.contains("button", "Save").click();
+      cy.visit("/multicloud/search");
+      cy.contains(".pf-v5-c-card", search.SavedSearchName).should("contain.text", search.SavedSearchDescription);
+    });
+
+    it("Rename and delete the saved search", () => {
+      cy.contains(".pf-v5-c-card", search.SavedSearchName).find("button[aria-label='Actions']").click();
+      cy.contains("Edit").click();
+      cy.get("#add-query-name").clear().type(renamed.SavedSearchName);
+      cy.contains("button", "Save").click();
+      cy.contains(".pf-v5-c-card", renamed.SavedSearchName).find("button[aria-label='Actions']").click();
+      cy.contains("Delete").click();
+      cy.contains("button", "Delete").click();
+      cy.contains(".pf-v5-c-card", renamed.SavedSearchName).should("not.exist");
+    });
+  }
+);
@@ -0,0 +1,199 @@
+package globalhub_test
+
+import (
+	"encoding/json"
+	"fmt"
+	"os"
+	"os/exec"
+	"strings"
+	"time"
+
+	. "github.com/onsi/ginkgo/v2"
+	. "github.com/onsi/gomega"
+)
+
+type globalHubDatabase struct {
+	Pod             string `json:"Pod"`
+	Name            string `json:"Name"`
+	User            string `json:"User"`
+	ComplianceTable string `json:"ComplianceTable"`
+	PolicyTable     string `json:"PolicyTable"`
+}
+
+type globalHubPolicyProfile struct {
+	GlobalHubNamespace      string            `json:"GlobalHubNamespace"`
+	MGHName                 string            `json:"MGHName"`
+	ManagedHubKubeconfigEnv string            `json:"ManagedHubKubeconfigEnv"`
+	PolicyName              string            `json:"PolicyName"`
+	PolicyNamespace         string            `json:"PolicyNamespace"`
+	ManagedCluster          string            `json:"ManagedCluster"`
+	Remediation             string            `json:"Remediation"`
+	ExpectedCompliance      string            `json:"ExpectedCompliance"`
+	Database                globalHubDatabase `json:"Database"`
+	SyncTimeout             string            `json:"SyncTimeout"`
+	PollInterval            string            `json:"PollInterval"`
+}
+
+// loadGlobalHubProfiles reads the day1 profile and applies the day2 overrides on a copy.
+func loadGlobalHubProfiles() (day1, day2 globalHubPolicyProfile) {
+	data, err := os.ReadFile("../fixtures/GlobalHubPolicyStatus.json")
+	Expect(err).NotTo(HaveOccurred())
+	var profiles map[string]map[string]json.RawMessage
+	Expect(json.Unmarshal(data, &profiles)).To(Succeed())
+	profile := profiles["globalhub-policy-status"]
+	Expect(json.Unmarshal(profile["day1-profile"], &day1)).To(Succeed())
+	day2 = day1
+	Expect(json.Unmarshal(profile["day2-profile"], &day2)).To(Succeed())
+	return day1, day2
+}
+
+// oc runs the oc CLI against the cluster of the given kubeconfig ("" for the global hub).
+func oc(kubeconfig string, args ...string) (string, error) {
+	cmd := exec.Command("oc", args...)
+	cmd.Env = os.Environ()
+	if kubeconfig != "" {
+		cmd.Env = append(cmd.Env, "KUBECONFIG="+kubeconfig)
+	}
+	out, err := cmd.CombinedOutput()
+	return strings.TrimSpace(string(out)), err
+}
+
+func policyManifest(p globalHubPolicyProfile, remediation string) string {
+	return fmt.Sprintf(`apiVersion: policy.open-cluster-management.io/v1
+kind: Policy
+metadata:
+  name: %[1]s
+  namespace: %[2]s
+spec:
+  remediationAction: %[3]s
+  disabled: false
+  policy-templates:
+  - objectDefinition:
+      apiVersion: policy.open-cluster-management.io/v1
+      kind: ConfigurationPolicy
+      metadata:
+        name: %[1]s-namespace
+      spec:
+        remediationAction: %[3]s
+        severity: low
+        object-templates:
+        - complianceType: musthave
+          objectDefinition:
+            apiVersion: v1
+            kind: Namespace
+            metadata:
+              name: %[1]s-required
+---
+apiVersion: cluster.open-cluster-management.io/v1beta1
+kind: Placement
+metadata:
+  name: %[1]s-placement
+  namespace: %[2]s
+spec:
+  predicates:
+  - requiredClusterSelector:
+      labelSelector:
+        matchLabels:
+          name: %[4]s
+---
+apiVersion: policy.open-cluster-management.io/v1
+kind: PlacementBinding
+metadata:
+  name: %[1]s-binding
+  namespace: %[2]s
+placementRef:
+  apiGroup: cluster.open-cluster-management.io
+  kind: Placement
+  name: %[1]s-placement
+subjects:
+- apiGroup: policy.open-cluster-management.io
+  kind: Policy
+  name: %[1]s
+`, p.PolicyName, p.PolicyNamespace, remediation, p.ManagedCluster)
+}
+
+func applyManifest(kubeconfig, manifest string) error {
+	cmd := exec.Command("oc", "apply", "-f", "-")
+	cmd.Env = append(os.Environ(), "KUBECONFIG="+kubeconfig)
+	cmd.Stdin = strings.NewReader(manifest)
+	out, err := cmd.CombinedOutput()
+	if err != nil {
+		return fmt.Errorf("oc apply failed: %v: %s", err, out)
+	}
+	return nil
+}
+
+// queryDatabase runs a single-value SQL query in the global hub postgres pod.
+func queryDatabase(p globalHubPolicyProfile, query string) (string, error) {
+	return oc("", "exec", "-n", p.GlobalHubNamespace, p.Database.Pod, "--",
+		"psql", "-U", p.Database.User, "-d", p.Database.Name, "-t", "-A", "-c", query)
+}
+
+var _ = Describe("Global Hub - policy status sync", Ordered, Label("globalhub", "policy"), func() {
+	var day1, day2 globalHubPolicyProfile
+	var managedHub string
+	var timeout, interval time.Duration
+
+	BeforeAll(func() {
+		day1, day2 = loadGlobalHubProfiles()
+		managedHub = os.Getenv(day1.ManagedHubKubeconfigEnv)
+		Expect(managedHub).NotTo(BeEmpty(), "%s must point to the managed hub kubeconfig", day1.ManagedHubKubeconfigEnv)
+		var err error
+		timeout, err = time.ParseDuration(day1.SyncTimeout)
+		Expect(err).NotTo(HaveOccurred())
+		interval, err = time.ParseDuration(day1.PollInterval)
+		Expect(err).NotTo(HaveOccurred())
+
+		By("Checking the MGH CR is running")
+		phase, err := oc("", "get", "multiclusterglobalhub", day1.MGHName, "-n", day1.GlobalHubNamespace,
+			"-o", "jsonpath={.status.phase}")
+		Expect(err).NotTo(HaveOccurred(), phase)
+		Expect(phase).To(Equal("Running"), "the MGH CR was not healthy")
+
+		_, err = oc(managedHub, "create", "namespace", day1.PolicyNamespace)
+		if err != nil {
+			GinkgoWriter.Printf("namespace %s already exists\n", day1.PolicyNamespace)
+		}
+	})
+
+	AfterAll(func() {
+		_, _ = oc(managedHub, "delete", "namespace", day1.PolicyNamespace, "--ignore-not-found")
+		_, _ = oc(managedHub, "delete", "namespace", day1.PolicyName+"-required", "--ignore-not-found")
+	})
+
+	It("syncs a new policy to the global hub database", func() {
+		Expect(applyManifest(managedHub, policyManifest(day1, day1.Remediation))).To(Succeed())
+
+		Eventually(func(g Gomega) {
+			count, err := queryDatabase(day1, fmt.Sprintf(
+				"select count(*) from %s where payload->'metadata'->>'name' = '%s'",
+				day1.Database.PolicyTable, day1.PolicyName))
+			g.Expect(err).NotTo(HaveOccurred(), count)
+			g.Expect(count).To(Equal("1"), "the policy was not updated in the database")
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+	})
+
+	It("reports the managed cluster as non-compliant in the database", func() {
+		Eventually(func(g Gomega) {
+			compliance, err := queryDatabase(day1, fmt.Sprintf(
+				"select c.compliance from %s c join %s p on c.policy_id = p.id "+
+					"where p.payload->'metadata'->>'name' = '%s' and c.cluster_name = '%s'",
+				day1.Database.ComplianceTable, day1.Database.PolicyTable, day1.PolicyName, day1.ManagedCluster))
+			g.Expect(err).NotTo(HaveOccurred(), compliance)
+			g.Expect(compliance).To(Equal(day1.ExpectedCompliance), "not same with the db data")
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+	})
+
+	It("updates the compliance in the database after the policy is enforced", func() {
+		Expect(applyManifest(managedHub, policyManifest(day2, day2.Remediation))).To(Succeed())
+
+		Eventually(func(g Gomega) {
+			compliance, err := queryDatabase(day2, fmt.Sprintf(
+				"select c.compliance from %s c join %s p on c.policy_id = p.id "+
+					"where p.payload->'metadata'->>'name' = '%s' and c.cluster_name = '%s'",
+				day2.Database.ComplianceTable, day2.Database.PolicyTable, day2.PolicyName, day2.ManagedCluster))
+			g.Expect(err).NotTo(HaveOccurred(), compliance)
+			g.Expect(compliance).To(Equal(day2.ExpectedCompliance), "not same with the db data")
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+	})
+})
@@ -0,0 +1,148 @@
+package observability_test
+
+import (
+	"crypto/tls"
+	"encoding/json"
+	"fmt"
+	"io"
+	"net/http"
+	"net/url"
+	"os"
+	"os/exec"
+	"strconv"
+	"strings"
+	"time"
+
+	. "github.com/onsi/ginkgo/v2"
+	. "github.com/onsi/gomega"
+)
+
+type observabilityProfile struct {
+	Namespace      string         `json:"Namespace"`
+	MCOName        string         `json:"MCOName"`
+	ManagedCluster string         `json:"ManagedCluster"`
+	StatefulSets   map[string]int `json:"StatefulSets"`
+	Deployments    map[string]int `json:"Deployments"`
+	Metric         string         `json:"Metric"`
+	QueryRoute     string         `json:"QueryRoute"`
+	ReadyTimeout   string         `json:"ReadyTimeout"`
+	PollInterval   string         `json:"PollInterval"`
+}
+
+func loadObservabilityProfiles() (day1, day2 observabilityProfile) {
+	data, err := os.ReadFile("../fixtures/ObservabilityMetrics.json")
+	Expect(err).NotTo(HaveOccurred())
+	var profiles map[string]map[string]json.RawMessage
+	Expect(json.Unmarshal(data, &profiles)).To(Succeed())
+	profile := profiles["observability-metrics"]
+	Expect(json.Unmarshal(profile["day1-profile"], &day1)).To(Succeed())
+	day2 = day1
+	Expect(json.Unmarshal(profile["day2-profile"], &day2)).To(Succeed())
+	return day1, day2
+}
+
+func ocOutput(args ...string) (string, error) {
+	out, err := exec.Command("oc", args...).CombinedOutput()
+	return strings.TrimSpace(string(out)), err
+}
+
+func readyReplicas(namespace, kind, name string) (int, error) {
+	out, err := ocOutput("get", kind, name, "-n", namespace, "-o", "jsonpath={.status.readyReplicas}")
+	if err != nil {
+		return 0, fmt.Errorf("%s %s not found: %s", kind, name, out)
+	}
+	if out == "" {
+		return 0, nil
+	}
+	return strconv.Atoi(out)
+}
+
+// queryMetric asks the hub's query proxy for the metric of one cluster and returns the number of series.
+func queryMetric(p observabilityProfile) (int, error) {
+	host, err := ocOutput("get", "route", p.QueryRoute, "-n", p.Namespace, "-o", "jsonpath={.spec.host}")
+	if err != nil {
+		return 0, fmt.Errorf("query route: %s", host)
+	}
+	token, err := ocOutput("whoami", "-t")
+	if err != nil {
+		return 0, fmt.Errorf("token: %s", token)
+	}
+	query := url.Values{"query": {fmt.Sprintf(`%s{cluster="%s"}`, p.Metric, p.ManagedCluster)}}
+	req, err := http.NewRequest(http.MethodGet, "https://"+host+"/api/v1/query?"+query.Encode(), nil)
+	if err != nil {
+		return 0, err
+	}
+	req.Header.Set("Authorization", "Bearer "+token)
+	client := &http.Client{Timeout: 30 * time.Second, Transport: &http.Transport{TLSClientConfig: &tls.Config{InsecureSkipVerify: true}}}
+	resp, err := client.Do(req)
+	if err != nil {
+		return 0, err
+	}
+	defer resp.Body.Close()
+	body, err := io.ReadAll(resp.Body)
+	if err != nil {
+		return 0, err
+	}
+	var result struct {
+		Data struct {
+			Result []json.RawMessage `json:"result"`
+		} `json:"data"`
+	}
+	if err := json.Unmarshal(body, &result); err != nil {
+		return 0, fmt.Errorf("unexpected query response %d: %s", resp.StatusCode, body)
+	}
+	return len(result.Data.Result), nil
+}
+
+var _ = Describe("Observability - components and metrics", Ordered, Label("observability"), func() {
+	var day1, day2 observabilityProfile
+	var timeout, interval time.Duration
+
+	BeforeAll(func() {
+		day1, day2 = loadObservabilityProfiles()
+		var err error
+		timeout, err = time.ParseDuration(day1.ReadyTimeout)
+		Expect(err).NotTo(HaveOccurred())
+		interval, err = time.ParseDuration(day1.PollInterval)
+		Expect(err).NotTo(HaveOccurred())
+	})
+
+	AfterAll(func() {
+		patch := fmt.Sprintf(`{"spec":{"advanced":{"grafana":{"replicas":%d}}}}`, day1.Deployments["observability-grafana"])
+		_, _ = ocOutput("patch", "multiclusterobservability", day1.MCOName, "--type", "merge", "-p", patch)
+	})
+
+	It("runs every observability component with its expected replicas", func() {
+		for name, replicas := range day1.StatefulSets {
+			Eventually(func() (int, error) {
+				return readyReplicas(day1.Namespace, "statefulset", name)
+			}).WithTimeout(timeout).WithPolling(interval).Should(Equal(replicas),
+				"%s should have %d ready replicas", name, replicas)
+		}
+		for name, replicas := range day1.Deployments {
+			Eventually(func() (int, error) {
+				return readyReplicas(day1.Namespace, "deployment", name)
+			}).WithTimeout(timeout).WithPolling(interval).Should(Equal(replicas),
+				"%s should have %d ready replicas", name, replicas)
+		}
+	})
+
+	It("receives the metrics of the managed cluster", func() {
+		Eventually(func() (int, error) {
+			return queryMetric(day1)
+		}).WithTimeout(timeout).WithPolling(interval).Should(BeNumerically(">", 0),
+			"no data for the metric %s of %s", day1.Metric, day1.ManagedCluster)
+	})
+
+	It("scales grafana when the MultiClusterObservability CR changes", func() {
+		replicas := day2.Deployments["observability-grafana"]
+		patch := fmt.Sprintf(`{"spec":{"advanced":{"grafana":{"replicas":%d}}}}`, replicas)
+		out, err := ocOutput("patch", "multiclusterobservability", day2.MCOName, "--type", "merge", "-p", patch)
+		Expect(err).NotTo(HaveOccurred(), out)
+
+		Eventually(func() (int, error) {
+			return readyReplicas(day2.Namespace, "deployment", "observability-grafana")
+		}).WithTimeout(timeout).WithPolling(interval).Should(Equal(replicas),
+			"observability-grafana should have %d ready replicas", replicas)
+	})
+})
@@ -0,0 +1,130 @@
+package serverfoundation_test
+
+import (
+	"encoding/json"
+	"os"
+	"os/exec"
+	"strings"
+	"time"
+
+	. "github.com/onsi/ginkgo/v2"
+	. "github.com/onsi/gomega"
+)
+
+type manifestWorkProfile struct {
+	ManagedCluster   string            `json:"ManagedCluster"`
+	ManifestWorkName string            `json:"ManifestWorkName"`
+	TargetNamespace  string            `json:"TargetNamespace"`
+	ConfigMapName    string            `json:"ConfigMapName"`
+	Data             map[string]string `json:"Data"`
+	ApplyTimeout     string            `json:"ApplyTimeout"`
+	PollInterval     string            `json:"PollInterval"`
+}
+
+func loadManifestWorkProfiles() (day1, day2 manifestWorkProfile) {
+	data, err := os.ReadFile("../fixtures/ServerFoundationManifestWork.json")
+	Expect(err).NotTo(HaveOccurred())
+	var profiles map[string]map[string]json.RawMessage
+	Expect(json.Unmarshal(data, &profiles)).To(Succeed())
+	profile := profiles["server-foundation-manifestwork"]
+	Expect(json.Unmarshal(profile["day1-profile"], &day1)).To(Succeed())
+	day2 = day1
+	Expect(json.Unmarshal(profile["day2-profile"], &day2)).To(Succeed())
+	return day1, day2
+}
+
+func runOc(stdin string, args ...string) (string, error) {
+	cmd := exec.Command("oc", args...)
+	if stdin != "" {
+		cmd.Stdin = strings.NewReader(stdin)
+	}
+	out, err := cmd.CombinedOutput()
+	return strings.TrimSpace(string(out)), err
+}
+
+// manifestWork wraps a ConfigMap with the profile's data in a ManifestWork for the managed cluster.
+func manifestWork(p manifestWorkProfile) string {
+	work := map[string]interface{}{
+		"apiVersion": "work.open-cluster-management.io/v1",
+		"kind":       "ManifestWork",
+		"metadata":   map[string]string{"name": p.ManifestWorkName, "namespace": p.ManagedCluster},
+		"spec": map[string]interface{}{
+			"workload": map[string]interface{}{
+				"manifests": []interface{}{
+					map[string]interface{}{
+						"apiVersion": "v1",
+						"kind":       "ConfigMap",
+						"metadata":   map[string]string{"name": p.ConfigMapName, "namespace": p.TargetNamespace},
+						"data":       p.Data,
+					},
+				},
+			},
+		},
+	}
+	out, err := json.Marshal(work)
+	Expect(err).NotTo(HaveOccurred())
+	return string(out)
+}
+
+var _ = Describe("Server Foundation - ManifestWork", Ordered, Label("server-foundation", "work"), func() {
+	var day1, day2 manifestWorkProfile
+	var timeout, interval time.Duration
+
+	BeforeAll(func() {
+		day1, day2 = loadManifestWorkProfiles()
+		var err error
+		timeout, err = time.ParseDuration(day1.ApplyTimeout)
+		Expect(err).NotTo(HaveOccurred())
+		interval, err = time.ParseDuration(day1.PollInterval)
+		Expect(err).NotTo(HaveOccurred())
+
+		By("Checking the managed cluster is available")
+		available, err := runOc("", "get", "managedcluster", day1.ManagedCluster,
+			"-o", `jsonpath={.status.conditions[?(@.type=="ManagedClusterConditionAvailable")].status}`)
+		Expect(err).NotTo(HaveOccurred(), "failed to get the managedcluster: %s", available)
+		Expect(available).To(Equal("True"), "managed cluster %s is not ready", day1.ManagedCluster)
+	})
+
+	AfterAll(func() {
+		_, _ = runOc("", "delete", "manifestwork", day1.ManifestWorkName, "-n", day1.ManagedCluster, "--ignore-not-found")
+	})
+
+	It("applies the ConfigMap on the managed cluster", func() {
+		out, err := runOc(manifestWork(day1), "apply", "-f", "-")
+		Expect(err).NotTo(HaveOccurred(), "failed to create the manifestwork: %s", out)
+
+		Eventually(func(g Gomega) {
+			applied, err := runOc("", "get", "manifestwork", day1.ManifestWorkName, "-n", day1.ManagedCluster,
+				"-o", `jsonpath={.status.conditions[?(@.type=="Applied")].status}`)
+			g.Expect(err).NotTo(HaveOccurred(), applied)
+			g.Expect(applied).To(Equal("True"), "no condition in status")
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+
+		version, err := runOc("", "get", "configmap", day1.ConfigMapName, "-n", day1.TargetNamespace,
+			"-o", "jsonpath={.data.version}")
+		Expect(err).NotTo(HaveOccurred(), "failed to get the configmap: %s", version)
+		Expect(version).To(Equal(day1.Data["version"]))
+	})
+
+	It("updates the ConfigMap when the ManifestWork changes", func() {
+		out, err := runOc(manifestWork(day2), "apply", "-f", "-")
+		Expect(err).NotTo(HaveOccurred(), "failed to update the manifestwork: %s", out)
+
+		Eventually(func(g Gomega) {
+			version, err := runOc("", "get", "configmap", day2.ConfigMapName, "-n", day2.TargetNamespace,
+				"-o", "jsonpath={.data.version}")
+			g.Expect(err).NotTo(HaveOccurred(), version)
+			g.Expect(version).To(Equal(day2.Data["version"]))
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+	})
+
+	It("removes the ConfigMap when the ManifestWork is deleted", func() {
+		out, err := runOc("", "delete", "manifestwork", day1.ManifestWorkName, "-n", day1.ManagedCluster)
+		Expect(err).NotTo(HaveOccurred(), "failed to delete the manifestwork: %s", out)
+
+		Eventually(func() string {
+			out, _ := runOc("", "get", "configmap", day1.ConfigMapName, "-n", day1.TargetNamespace)
+			return out
+		}).WithTimeout(timeout).WithPolling(interval).Should(ContainSubstring("NotFound"))
+	})
+})
@@ -0,0 +1,184 @@
+package volsync_test
+
+import (
+	"encoding/json"
+	"fmt"
+	"os"
+	"os/exec"
+	"strings"
+	"time"
+
+	. "github.com/onsi/ginkgo/v2"
+	. "github.com/onsi/gomega"
+)
+
+type volsyncProfile struct {
+	AddonNamespace       string `json:"AddonNamespace"`
+	SourceNamespace      string `json:"SourceNamespace"`
+	DestinationNamespace string `json:"DestinationNamespace"`
+	PVCName              string `json:"PVCName"`
+	Capacity             string `json:"Capacity"`
+	StorageClass         string `json:"StorageClass"`
+	VolumeSnapshotClass  string `json:"VolumeSnapshotClass"`
+	CopyMethod           string `json:"CopyMethod"`
+	Schedule             string `json:"Schedule"`
+	SyncTimeout          string `json:"SyncTimeout"`
+	PollInterval         string `json:"PollInterval"`
+}
+
+func loadVolsyncProfiles() (day1, day2 volsyncProfile) {
+	data, err := os.ReadFile("../fixtures/VolsyncReplication.json")
+	Expect(err).NotTo(HaveOccurred())
+	var profiles map[string]map[string]json.RawMessage
+	Expect(json.Unmarshal(data, &profiles)).To(Succeed())
+	profile := profiles["volsync-rsync-tls"]
+	Expect(json.Unmarshal(profile["day1-profile"], &day1)).To(Succeed())
+	day2 = day1
+	Expect(json.Unmarshal(profile["day2-profile"], &day2)).To(Succeed())
+	return day1, day2
+}
+
+func kubectl(stdin string, args ...string) (string, error) {
+	cmd := exec.Command("oc", args...)
+	if stdin != "" {
+		cmd.Stdin = strings.NewReader(stdin)
+	}
+	out, err := cmd.CombinedOutput()
+	return strings.TrimSpace(string(out)), err
+}
+
+func applyJSON(object map[string]interface{}) {
+	manifest, err := json.Marshal(object)
+	Expect(err).NotTo(HaveOccurred())
+	out, err := kubectl(string(manifest), "apply", "-f", "-")
+	Expect(err).NotTo(HaveOccurred(), out)
+}
+
+func replicationDestination(p volsyncProfile) map[string]interface{} {
+	return map[string]interface{}{
+		"apiVersion": "volsync.backube/v1alpha1",
+		"kind":       "ReplicationDestination",
+		"metadata":   map[string]string{"name": p.PVCName + "-dst", "namespace": p.DestinationNamespace},
+		"spec": map[string]interface{}{
+			"rsyncTLS": map[string]interface{}{
+				"copyMethod":              "Snapshot",
+				"capacity":                p.Capacity,
+				"accessModes":             []string{"ReadWriteOnce"},
+				"storageClassName":        p.StorageClass,
+				"volumeSnapshotClassName": p.VolumeSnapshotClass,
+				"serviceType":             "ClusterIP",
+			},
+		},
+	}
+}
+
+func replicationSource(p volsyncProfile, address, keySecret string) map[string]interface{} {
+	return map[string]interface{}{
+		"apiVersion": "volsync.backube/v1alpha1",
+		"kind":       "ReplicationSource",
+		"metadata":   map[string]string{"name": p.PVCName + "-src", "namespace": p.SourceNamespace},
+		"spec": map[string]interface{}{
+			"sourcePVC": p.PVCName,
+			"trigger":   map[string]string{"schedule": p.Schedule},
+			"rsyncTLS": map[string]interface{}{
+				"keySecret":               keySecret,
+				"address":                 address,
+				"copyMethod":              p.CopyMethod,
+				"storageClassName":        p.StorageClass,
+				"volumeSnapshotClassName": p.VolumeSnapshotClass,
+			},
+		},
+	}
+}
+
+var _ = Describe("VolSync - rsync-tls replication", Ordered, Label("volsync"), func() {
+	var day1, day2 volsyncProfile
+	var timeout, interval time.Duration
+	var address, keySecret string
+
+	BeforeAll(func() {
+		day1, day2 = loadVolsyncProfiles()
+		var err error
+		timeout, err = time.ParseDuration(day1.SyncTimeout)
+		Expect(err).NotTo(HaveOccurred())
+		interval, err = time.ParseDuration(day1.PollInterval)
+		Expect(err).NotTo(HaveOccurred())
+
+		By("Checking the volsync add-on is available")
+		available, err := kubectl("", "get", "managedclusteraddon", "volsync", "-n", day1.AddonNamespace,
+			"-o", `jsonpath={.status.conditions[?(@.type=="Available")].status}`)
+		Expect(err).NotTo(HaveOccurred(), available)
+		Expect(available).To(Equal("True"), "volsync add-on is not ready")
+
+		for _, ns := range []string{day1.SourceNamespace, day1.DestinationNamespace} {
+			_, _ = kubectl("", "create", "namespace", ns)
+		}
+		applyJSON(map[string]interface{}{
+			"apiVersion": "v1",
+			"kind":       "PersistentVolumeClaim",
+			"metadata":   map[string]string{"name": day1.PVCName, "namespace": day1.SourceNamespace},
+			"spec": map[string]interface{}{
+				"accessModes":      []string{"ReadWriteOnce"},
+				"storageClassName": day1.StorageClass,
+				"resources":        map[string]interface{}{"requests": map[string]string{"storage": day1.Capacity}},
+			},
+		})
+	})
+
+	AfterAll(func() {
+		_, _ = kubectl("", "delete", "namespace", day1.SourceNamespace, day1.DestinationNamespace, "--ignore-not-found")
+	})
+
+	It("publishes the destination address and key", func() {
+		applyJSON(replicationDestination(day1))
+		Eventually(func(g Gomega) {
+			var err error
+			address, err = kubectl("", "get", "replicationdestination", day1.PVCName+"-dst", "-n", day1.DestinationNamespace,
+				"-o", "jsonpath={.status.rsyncTLS.address}")
+			g.Expect(err).NotTo(HaveOccurred(), address)
+			g.Expect(address).NotTo(BeEmpty())
+			keySecret, err = kubectl("", "get", "replicationdestination", day1.PVCName+"-dst", "-n", day1.DestinationNamespace,
+				"-o", "jsonpath={.status.rsyncTLS.keySecret}")
+			g.Expect(err).NotTo(HaveOccurred(), keySecret)
+			g.Expect(keySecret).NotTo(BeEmpty())
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+
+		// The source reads the key from its own namespace.
+		out, err := kubectl("", "get", "secret", keySecret, "-n", day1.DestinationNamespace, "-o", "json")
+		Expect(err).NotTo(HaveOccurred(), out)
+		var secret map[string]interface{}
+		Expect(json.Unmarshal([]byte(out), &secret)).To(Succeed())
+		secret["metadata"] = map[string]string{"name": keySecret, "namespace": day1.SourceNamespace}
+		applyJSON(secret)
+	})
+
+	It("completes a synchronization from the source PVC", func() {
+		applyJSON(replicationSource(day1, address, keySecret))
+		Eventually(func(g Gomega) {
+			lastSync, err := kubectl("", "get", "replicationsource", day1.PVCName+"-src", "-n", day1.SourceNamespace,
+				"-o", "jsonpath={.status.lastSyncTime}")
+			g.Expect(err).NotTo(HaveOccurred(), lastSync)
+			g.Expect(lastSync).NotTo(BeEmpty(), "replication source has not synced")
+		}).WithTimeout(timeout).WithPolling(interval).Should(Succeed())
+
+		image, err := kubectl("", "get", "replicationdestination", day1.PVCName+"-dst", "-n", day1.DestinationNamespace,
+			"-o", "jsonpath={.status.latestImage.name}")
+		Expect(err).NotTo(HaveOccurred(), image)
+		Expect(image).NotTo(BeEmpty(), "no snapshot of the replicated data")
+	})
+
+	It("keeps syncing after switching the source copy method", func() {
+		before, err := kubectl("", "get", "replicationsource", day2.PVCName+"-src", "-n", day2.SourceNamespace,
+			"-o", "jsonpath={.status.lastSyncTime}")
+		Expect(err).NotTo(HaveOccurred(), before)
+		applyJSON(replicationSource(day2, address, keySecret))
+		out, err := kubectl("", "patch", "replicationsource", day2.PVCName+"-src", "-n", day2.SourceNamespace,
+			"--type", "merge", "-p", fmt.Sprintf(`{"spec":{"trigger":{"manual":"%d"}}}`, time.Now().Unix()))
+		Expect(err).NotTo(HaveOccurred(), out)
+
+		Eventually(func() (string, error) {
+			return kubectl("", "get", "replicationsource", day2.PVCName+"-src", "-n", day2.SourceNamespace,
+				"-o", "jsonpath={.status.lastSyncTime}")
+		}).WithTimeout(timeout).WithPolling(interval).ShouldNot(Equal(before))
+	})
+})
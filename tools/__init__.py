@@ -1,3 +1,42 @@
-from .get_result_from_jenkins import get_error_message
-from .get_test_steps_from_polarion import get_test_case_by_id, login_to_polarion
-from .utils import extract_component_from_url, load_rules, analyze_failed_case, generate_test_script, extract_code_path_from_prompt, load_code_file, generate_test_script_with_fixture, write_test_files_to_output
\ No newline at end of file
+"""
+Public helpers of the tools package, loaded on first use.
+
+`from tools import get_error_message` imports only the module that defines
+it, so CLI start-up and Streamlit reruns don't pay for polarion, bs4 or the
+Jenkins scraper unless they are used. Add new exports to _EXPORTS.
+"""
+import importlib
+
+_EXPORTS = {
+    "get_result_from_jenkins": ["get_error_message"],
+    "get_test_steps_from_polarion": ["get_test_case_by_id", "login_to_polarion"],
+    "utils": [
+        "extract_component_from_url", "extract_build_from_url", "load_rules", "analyze_failed_case",
+        "generate_test_script", "extract_code_path_from_prompt", "load_code_file", "generate_test_script_with_fixture",
+        "generate_test_script_incremental", "generation_metadata", "write_test_files_to_output",
+    ],
+    "failure_history": ["FailureHistory", "parse_classifications"],
+    "multi_build_analysis": ["analyze_builds", "build_consolidated_report", "discover_downstream_builds"],
+    "console_log_miner": ["get_console_failures", "mine_console_log"],
+    "failure_sources": ["FailureSource", "collect_cases", "find_source", "gather_cases", "open_source", "register_provider"],
+    "stacktrace": ["compact_cases", "compact_stacktrace", "configure_component"],
+    "generation_store": ["GenerationStore", "apply_unified_diff"],
+    "artifact_store": ["ArtifactStore"],
+}
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULE_OF)
+
+
+def __getattr__(name):
+    module = _MODULE_OF.get(name)
+    if module is None:
+        # Not an export: let `from tools import <submodule>` fall through to the import system.
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,378 @@
+"""
+HTTP API for failure triage and test generation, for CI pipelines and bots.
+
+Usage:
+    python -m tools.api_server --port 8080 --workers 4 --max-pending 32
+
+Requests are answered at once with a job id; the work runs on a bounded
+JobManager pool shared by all clients:
+
+    POST   /triage            {"source": "<Jenkins build URL | rp:name #N | export.jsonl>", "analysis": true}
+    POST   /generate          {"case_id": "RHACM4K-1234"} or {"description": "...", "title": "..."}
+                              (optional "steps": [...] instead of fetching them from Polarion,
+                              "code_file_content": "...", "force": true to skip the stored generation)
+    GET    /jobs              all jobs, without results
+    GET    /jobs/<id>         status, progress and, once finished, the result
+    GET    /jobs/<id>/stream  JSON lines with every progress change until the job ends; the last line has the result
+    DELETE /jobs/<id>         cancel
+    GET    /artifacts/<case>  stored script/fixture versions of a case id (or the case_key of a generation)
+    GET    /health            workers and pending jobs
+
+A request for a build or case that already has an unfinished job returns
+that job (202 with "coalesced": true) instead of starting a second one. When
+--max-pending jobs are waiting or running, new submissions get 429 with a
+Retry-After header.
+
+Sources are checked before a job starts: URLs must be on one of the
+--allowed-hosts (API_ALLOWED_HOSTS, comma separated; the RP_ENDPOINT host is
+always allowed) and JSON lines exports must lie inside --export-dir
+(API_EXPORT_DIR); without it, file sources are refused. Set API_SERVER_TOKEN
+to require "Authorization: Bearer <token>" on every request; listening on
+anything but localhost requires it.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from . import tracing
+from .artifact_store import ArtifactStore
+from .batch_triage import source_key, triage_source
+from .failure_sources import open_source
+from .jobs import JobManager, JobQueueFull
+from .polarion_steps import prepare_steps
+from .utils import generate_test_script_incremental, generation_metadata, load_rules, write_test_files_to_output
+
+# Source kinds the API accepts; other registered providers stay CLI-only.
+API_SOURCE_KINDS = ("jenkins", "jenkins-json", "reportportal", "export")
+MAX_BODY_BYTES = 1024 * 1024
+# Seconds between the status checks of a /stream response, and between keep-alive lines.
+STREAM_INTERVAL = 0.5
+STREAM_HEARTBEAT = 15
+
+
+def job_view(job, result: bool = True) -> Dict:
+    view = {"id": job.id, "kind": job.kind, "description": job.description, "status": job.status,
+            "progress": round(job.progress, 3), "message": job.message, "error": job.error,
+            "created": job.created, "started": job.started, "finished": job.finished}
+    if result and job.done:
+        view["result"] = job.result
+    return view
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class ApiService:
+    """Jobs behind the HTTP handlers; the model client, runbook and Polarion login are shared by all requests."""
+
+    def __init__(self, ai_client=None, guidelines: Dict = None, max_workers: int = 4, max_pending: int = 32,
+                 fetch_workers: int = 8, polarion: Optional[Dict] = None, allowed_hosts: Iterable[str] = (),
+                 export_dir: Optional[str] = None, token: Optional[str] = None):
+        self.allowed_hosts = {host.strip().lower() for host in allowed_hosts if host.strip()}
+        rp_host = urlparse(os.getenv("RP_ENDPOINT") or "").hostname
+        if rp_host:
+            self.allowed_hosts.add(rp_host.lower())
+        self.export_dir = os.path.realpath(export_dir) if export_dir else None
+        self.token = token
+        self.manager = JobManager(max_workers=max_workers, max_pending=max_pending)
+        self.ai_client = ai_client
+        self.guidelines = guidelines or {}
+        self.fetch_workers = fetch_workers
+        self.polarion = polarion or {}
+        self._polarion_client = None
+        self._polarion_lock = threading.Lock()
+
+    def submit_triage(self, body: Dict) -> Dict:
+        source = str(body.get("source") or "").strip()
+        if not source:
+            raise ValueError("'source' is required")
+        kind = open_source(source).kind
+        self.check_source(source, kind)
+        analysis = bool(body.get("analysis", True)) and self.ai_client is not None
+        key = f"triage:{source_key(source)}:{int(analysis)}"
+        return self._submit("triage", self._triage_job, {"kind": kind, "source": source}, analysis,
+                            description=source, key=key)
+
+    def check_source(self, source: str, kind: str):
+        """Raise PermissionError for sources a client may not make the server read."""
+        if kind not in API_SOURCE_KINDS:
+            raise PermissionError(f"Sources of kind {kind!r} are not accepted over the API")
+        if source.startswith(("http://", "https://")):
+            host = (urlparse(source).hostname or "").lower()
+            if host not in self.allowed_hosts:
+                raise PermissionError(f"Host {host or '(none)'} is not in the allowed hosts")
+        elif kind == "export":
+            path = os.path.realpath(source)
+            if not self.export_dir or os.path.commonpath([path, self.export_dir]) != self.export_dir:
+                raise PermissionError("Export files are only read from the configured export directory")
+
+    def authorized(self, header: Optional[str]) -> bool:
+        if not self.token:
+            return True
+        return hmac.compare_digest((header or "").encode("utf-8"), f"Bearer {self.token}".encode("utf-8"))
+
+    def submit_generation(self, body: Dict) -> Dict:
+        case_id = str(body.get("case_id") or "").strip() or None
+        description = body.get("description")
+        steps = body.get("steps")
+        if case_id and not re.fullmatch(r"(?:RHACM4K|OCP)-\d+", case_id):
+            raise ValueError(f"Unrecognised Polarion case id: {case_id}")
+        if not case_id and not description and not steps:
+            raise ValueError("'case_id', 'description' or 'steps' is required")
+        if self.ai_client is None:
+            raise ValueError("Test generation needs a model; the server was started with --no-analysis")
+        inputs = {"description": description, "steps": steps, "title": body.get("title"),
+                  "code_file_content": body.get("code_file_content"), "force": bool(body.get("force"))}
+        case_key = case_id or "text-" + _digest(description, steps)
+        return self._submit("generation", self._generation_job, case_id, case_key, inputs,
+                            description=case_id or str(description or "steps")[:80],
+                            key=f"generate:{case_key}:{_digest(inputs)}")
+
+    def _submit(self, kind, fn, *args, description: str, key: str) -> Dict:
+        before = {job.id for job in self.manager.list()}
+        job_id = self.manager.submit(kind, fn, *args, description=description, key=key)
+        return {"id": job_id, "coalesced": job_id in before}
+
+    def _triage_job(self, job, entry, analysis):
+        job.update(0.05, f"Triaging {entry['source']}")
+        result = triage_source(entry, self.ai_client if analysis else None, self.guidelines,
+                               fetch_workers=self.fetch_workers)
+        job.check_cancelled()
+        return result
+
+    def polarion_client(self):
+        with self._polarion_lock:
+            if self._polarion_client is None:
+                if not self.polarion.get("endpoint") or not self.polarion.get("project"):
+                    raise RuntimeError("POLARION_API and POLARION_PROJECT must be set to generate from a case id")
+                from .get_test_steps_from_polarion import login_to_polarion
+                self._polarion_client = login_to_polarion(self.polarion["endpoint"], self.polarion.get("user"),
+                                                          self.polarion.get("password"), self.polarion.get("token"))
+                if not self._polarion_client:
+                    raise RuntimeError("Polarion login failed")
+            return self._polarion_client
+
+    def _generation_job(self, job, case_id, case_key, inputs):
+        title = inputs["title"] or ""
+        feature_description = inputs["steps"] or inputs["description"]
+        if case_id and not inputs["steps"]:
+            job.update(0.05, f"Fetching {case_id} from Polarion")
+            from .get_test_steps_from_polarion import get_test_case_by_id
+            case, steps, _ = get_test_case_by_id(self.polarion_client(), self.polarion["project"], case_id)
+            if case is None:
+                raise RuntimeError(f"Test case {case_id} not found in {self.polarion['project']}")
+            title = title or case.title
+            feature_description = steps
+        if isinstance(feature_description, list):
+            feature_description = prepare_steps(feature_description, case_id)["steps"]
+        job.check_cancelled()
+        job.update(0.1, f"Generating the script for {case_id or 'the description'}")
+        result = generate_test_script_incremental(self.ai_client, case_key, feature_description, title,
+                                                  code_file_content=inputs["code_file_content"], force=inputs["force"])
+        job.check_cancelled()
+        job.update(0.9, "Writing the files")
+        files = write_test_files_to_output(result["test_script"], result["fixture_content"],
+                                           test_name=case_id or (title or str(inputs["description"] or ""))[:50] or None,
+                                           case_key=case_key, metadata=generation_metadata(result))
+        return {"case_key": case_key, "mode": result["mode"], "version": files["version"], "test_script": result["test_script"],
+                "fixture_content": result["fixture_content"], "files": files}
+
+    def health(self) -> Dict:
+        jobs = self.manager.list()
+        return {"status": "ok", "workers": self.manager.max_workers, "max_pending": self.manager.max_pending,
+                "queued": sum(1 for job in jobs if job.status == "queued"),
+                "running": sum(1 for job in jobs if job.status == "running")}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "qe-tools-api"
+    # Set by make_server().
+    service: ApiService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body, headers: Optional[Dict] = None):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        if self.service.authorized(self.headers.get("Authorization")):
+            return True
+        self._send(401, {"error": "Missing or wrong bearer token"})
+        return False
+
+    def _job(self, job_id: str):
+        job = self.service.manager.get(job_id)
+        if job is None:
+            self._send(404, {"error": f"No job {job_id}"})
+        return job
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts == ["health"]:
+            self._send(200, self.service.health())
+        elif parts == ["jobs"]:
+            self._send(200, {"jobs": [job_view(job, result=False) for job in self.service.manager.list()]})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job:
+                self._send(200, job_view(job))
+        elif len(parts) == 2 and parts[0] == "artifacts":
+            versions = ArtifactStore().versions(parts[1])
+            if versions:
+                self._send(200, {"case": parts[1], "versions": versions})
+            else:
+                self._send(404, {"error": f"No stored generation for {parts[1]}"})
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+            job = self._job(parts[1])
+            if job:
+                self._stream(job)
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        submit = {"/triage": self.service.submit_triage, "/generate": self.service.submit_generation}.get(self.path.rstrip("/"))
+        if submit is None:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": f"Request body over {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("The request body must be a JSON object")
+            submitted = submit(body)
+        except JobQueueFull as e:
+            self._send(429, {"error": str(e)}, {"Retry-After": "30"})
+            return
+        except PermissionError as e:
+            self._send(403, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        self._send(202, dict(submitted, status_url=f"/jobs/{submitted['id']}",
+                             stream_url=f"/jobs/{submitted['id']}/stream"),
+                   {"Location": f"/jobs/{submitted['id']}"})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        job = self._job(parts[1])
+        if job:
+            self._send(200, {"id": job.id, "cancelled": self.service.manager.cancel(job.id)})
+
+    def _stream(self, job):
+        """One JSON line per status change, a keep-alive line when idle, the full view (with the result) last."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        last, last_sent = None, 0.0
+        try:
+            while not job.done:
+                state = (job.status, round(job.progress, 3), job.message)
+                if state != last or time.time() - last_sent >= STREAM_HEARTBEAT:
+                    self.wfile.write((json.dumps(job_view(job, result=False)) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                    last, last_sent = state, time.time()
+                time.sleep(STREAM_INTERVAL)
+            self.wfile.write((json.dumps(job_view(job), default=str) + "\n").encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running and can be polled later.
+            pass
+
+
+def make_server(service: ApiService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    handler = type("BoundApiHandler", (ApiHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve failure triage and test generation as HTTP jobs.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (0.0.0.0 for all interfaces)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--allowed-hosts", default=os.getenv("API_ALLOWED_HOSTS", ""),
+                        help="Comma separated Jenkins/ReportPortal hosts that source URLs may point to")
+    parser.add_argument("--export-dir", default=os.getenv("API_EXPORT_DIR"),
+                        help="Directory JSON lines export sources may be read from (default: none)")
+    parser.add_argument("--workers", type=int, default=4, help="Jobs run at the same time")
+    parser.add_argument("--max-pending", type=int, default=32, help="Jobs waiting or running before new ones get 429")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Case pages downloaded at the same time per source")
+    parser.add_argument("--rules", default="runbooks/component-keywords.md", help="Runbook used to classify failures")
+    parser.add_argument("--no-analysis", action="store_true", help="Only collect failed cases; disables /generate")
+    parser.add_argument("--trace-file", help="Enable tracing and append spans to this JSON lines file")
+    args = parser.parse_args()
+
+    token = os.getenv("API_SERVER_TOKEN")
+    if not token and args.host not in ("127.0.0.1", "localhost", "::1"):
+        print("Set API_SERVER_TOKEN before listening on a non-local address")
+        return 2
+
+    if args.trace_file:
+        tracing.enable(trace_file=args.trace_file)
+
+    ai_client = None
+    if not args.no_analysis:
+        from agents.assistant_clients import ModelRouter
+        ai_client = ModelRouter.from_env()
+
+    service = ApiService(
+        ai_client=ai_client,
+        guidelines=load_rules(args.rules),
+        max_workers=args.workers,
+        max_pending=args.max_pending,
+        fetch_workers=args.fetch_workers,
+        polarion={"endpoint": os.getenv("POLARION_API"), "project": os.getenv("POLARION_PROJECT"),
+                  "user": os.getenv("POLARION_USER"), "password": os.getenv("POLARION_PASSWORD"),
+                  "token": os.getenv("POLARION_TOKEN")},
+        allowed_hosts=args.allowed_hosts.split(","),
+        export_dir=args.export_dir,
+        token=token,
+    )
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} ({args.workers} workers, {args.max_pending} pending jobs)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+"""
+Content-addressed store for generated test scripts and fixtures.
+
+Files are stored once per content under ARTIFACT_STORE_DIR:
+
+    objects/<2 hex>/<sha256>.js|.json     the script or fixture, named by its hash
+    cases/<case key>.json                 the versions of one case, oldest first
+
+A version records the hashes and paths of its script and fixture with the
+metadata of the generation (model, prompt hash, mode, duration). Writing the
+same script and fixture for a case again returns the latest version instead
+of adding one, and identical content shared by several cases is stored once.
+Finding a case's latest script reads one small JSON file, however many
+generations the store holds. All writes go to a temporary file first and are
+renamed into place.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from . import tracing
+
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", "output/artifacts")
+
+# Case files are read-modify-written; jobs of the app and the API server run in threads of one process.
+_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: str, data: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ArtifactStore:
+    def __init__(self, directory: str = ARTIFACT_STORE_DIR):
+        self.directory = directory
+
+    def object_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest + suffix)
+
+    def _case_path(self, case: str) -> str:
+        return os.path.join(self.directory, "cases", re.sub(r"[^\w\-]+", "_", case)[:100] + ".json")
+
+    def put(self, content: str, suffix: str) -> str:
+        """Store content unless it is already there; return its hash."""
+        digest = content_hash(content)
+        path = self.object_path(digest, suffix)
+        if not os.path.exists(path):
+            _write_atomic(path, content)
+        return digest
+
+    def get(self, digest: str, suffix: str) -> Optional[str]:
+        try:
+            with open(self.object_path(digest, suffix), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def versions(self, case: str) -> List[Dict]:
+        """The versions of a case, oldest first ([] for an unknown case)."""
+        path = self._case_path(case)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("versions", [])
+        except (OSError, ValueError) as e:
+            print(f"Error reading artifact index {path}: {e}")
+            return []
+
+    def latest(self, case: str) -> Optional[Dict]:
+        versions = self.versions(case)
+        return versions[-1] if versions else None
+
+    def save(self, case: str, test_script: str, fixture_content: str, name: Optional[str] = None,
+             metadata: Optional[Dict] = None) -> Dict:
+        """
+        Store a generation of a case and return its version record, with
+        "reused": True when it is the same content as the latest version.
+        """
+        with tracing.span("artifacts.save", case=case) as span:
+            test_hash = self.put(test_script, ".js")
+            fixture_hash = self.put(fixture_content, ".json")
+            with _lock:
+                versions = self.versions(case)
+                latest = versions[-1] if versions else None
+                if latest and latest["test_hash"] == test_hash and latest["fixture_hash"] == fixture_hash:
+                    span.set("reused", 1)
+                    return dict(latest, reused=True)
+                version = dict(metadata or {})
+                version.update({
+                    "version": len(versions) + 1,
+                    "name": name or case,
+                    "test_hash": test_hash,
+                    "fixture_hash": fixture_hash,
+                    "test_path": self.object_path(test_hash, ".js"),
+                    "fixture_path": self.object_path(fixture_hash, ".json"),
+                    "created": time.time(),
+                })
+                versions.append(version)
+                _write_atomic(self._case_path(case), json.dumps({"case": case, "versions": versions}, indent=2))
+            span.set("bytes", len(test_script.encode("utf-8")) + len(fixture_content.encode("utf-8")))
+            return dict(version, reused=False)
@@ -0,0 +1,259 @@
+"""
+Headless failure triage for a list of Jenkins builds and ReportPortal launches.
+
+Usage:
+    python -m tools.batch_triage sources.txt --output-dir triage
+
+sources.txt holds one source per line, in any shape tools.failure_sources
+accepts: a Jenkins build URL (or its testReport/api/json URL), a ReportPortal
+launch as "name #number" (optionally prefixed with "rp:") or launch URL, or a
+JSON lines export written by get_results_from_reportportal.py --export. Blank lines and
+lines starting with "#" are ignored. Progress is appended to
+<output-dir>/progress.jsonl, so re-running the same command after a crash or
+timeout only triages the sources that have not finished yet.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from . import tracing
+from .failure_sources import collect_cases, open_source
+from .generate_failed_case_report import write_report
+from . import parse_pool
+from .get_result_from_jenkins import get_report_url
+from .stacktrace import compact_cases
+from .utils import analyze_failed_case, extract_build_from_url, load_rules
+
+PROGRESS_FILE = "progress.jsonl"
+
+
+def read_sources(path: str) -> List[Dict]:
+    """Read the sources file into [{"kind": <provider kind>, "source": ...}]; unrecognised lines are skipped."""
+    sources = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                kind = open_source(line).kind
+            except ValueError as e:
+                print(f"Skipping source: {e}")
+                continue
+            if kind == "reportportal":
+                line = re.sub(r"^rp:", "", line).strip()
+            sources.append({"kind": kind, "source": line})
+    return sources
+
+
+def source_key(source: str) -> str:
+    """File-system friendly name for a source, stable across runs."""
+    if source.startswith("http"):
+        source = re.sub(r"^https?://[^/]+", "", get_report_url(source))
+        source = source.replace("/job/", "/")
+    return re.sub(r"[^\w\-]+", "_", source).strip("_")[:120]
+
+
+def load_progress(output_dir: str) -> Dict[str, Dict]:
+    """Return the last recorded progress entry per source key."""
+    progress = {}
+    path = os.path.join(output_dir, PROGRESS_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a partial last line.
+                    continue
+                progress[entry["key"]] = entry
+    return progress
+
+
+def triage_source(entry: Dict, ai_client, guidelines: Dict, fetch_workers: int = None) -> Dict:
+    """Fetch, classify and analyse one source. Errors are reported in the result, never raised."""
+    started = time.time()
+    source = entry["source"]
+    result = {"key": source_key(source), "kind": entry["kind"], "source": source,
+              "component": None, "failed_cases": [], "analysis": "", "status": "done", "error": ""}
+    try:
+        failure_source = open_source(source, fetch_workers=fetch_workers)
+        result["component"] = failure_source.component
+        result["failed_cases"] = collect_cases(failure_source)
+        if not result["component"] and result["failed_cases"]:
+            result["component"] = result["failed_cases"][0]["Component"]
+        # Compacted once here, so the prompt and the JSON/HTML reports carry the same trimmed traces.
+        result["failed_cases"] = compact_cases(result["failed_cases"], result["component"])
+        if result["failed_cases"] and ai_client:
+            result["analysis"] = analyze_failed_case(ai_client, result["component"], result["failed_cases"], guidelines)
+    except Exception as e:
+        print(f"Error triaging {source}: {e}")
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["duration"] = round(time.time() - started, 3)
+    return result
+
+
+def _markdown_report(result: Dict) -> str:
+    lines = [f"# Triage: {result['source']}", "",
+             f"- Component: {result['component'] or 'unknown'}",
+             f"- Failed cases: {len(result['failed_cases'])}"]
+    if result["error"]:
+        lines.append(f"- Error: {result['error']}")
+    if result["analysis"]:
+        lines += ["", result["analysis"]]
+    elif result["failed_cases"]:
+        lines += ["", "| Case ID | Case Title | Error Message |", "|---------|------------|---------------|"]
+        for case in result["failed_cases"]:
+            error = " ".join(case["Error Message"].split()).replace("|", "\\|")
+            lines.append(f"| {case['ID']} | {case['Title']} | {error} |")
+    return "\n".join(lines) + "\n"
+
+
+def write_job_outputs(output_dir: str, result: Dict) -> Dict[str, str]:
+    """Write the JSON, markdown and HTML report for one source and return their paths."""
+    base = os.path.join(output_dir, result["key"])
+    files = {"json": base + ".json", "markdown": base + ".md", "html": base + ".html"}
+    writers = {
+        "json": lambda f: json.dump(result, f, indent=2),
+        "markdown": lambda f: f.write(_markdown_report(result)),
+        "html": lambda f: write_report(result["failed_cases"], f, title=f"Triage: {result['source']}"),
+    }
+    for kind, path in files.items():
+        with tracing.span("file.write", task="batch_triage", kind=kind) as span:
+            # Write then rename, so a killed run never leaves a half written report.
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                writers[kind](f)
+            os.replace(path + ".tmp", path)
+            span.set("bytes", os.path.getsize(path))
+    return files
+
+
+def write_summary(output_dir: str, progress: Dict[str, Dict]) -> str:
+    """Write summary.json and summary.md over every source recorded in progress."""
+    entries = sorted(progress.values(), key=lambda e: e["key"])
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    lines = ["# Nightly triage summary", "",
+             f"- Sources: {len(entries)}",
+             f"- Failed cases: {sum(e['failed_cases'] for e in entries)}",
+             f"- Errors: {sum(1 for e in entries if e['status'] != 'done')}", "",
+             "| Source | Component | Failed cases | Status | Report |",
+             "|--------|-----------|--------------|--------|--------|"]
+    for e in entries:
+        status = e["status"] if not e.get("error") else f"{e['status']}: {e['error']}"
+        report = os.path.basename(e["files"]["markdown"]) if e.get("files") else ""
+        lines.append(f"| {e['source']} | {e['component'] or 'unknown'} | {e['failed_cases']} | {status} | {report} |")
+    path = os.path.join(output_dir, "summary.md")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def record_result(output_dir: str, progress: Dict[str, Dict], lock, result: Dict, files: Dict[str, str],
+                  history=None) -> Dict:
+    """
+    Append a triaged source to progress.jsonl and the in-memory progress, and
+    record a finished Jenkins build in the failure history when one is given.
+    """
+    record = {"key": result["key"], "source": result["source"], "kind": result["kind"],
+              "component": result["component"], "failed_cases": len(result["failed_cases"]),
+              "status": result["status"], "error": result["error"],
+              "duration": result["duration"], "files": files}
+    with lock:
+        with open(os.path.join(output_dir, PROGRESS_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        progress[record["key"]] = record
+    build = extract_build_from_url(result["source"]) if history is not None and result["status"] == "done" else None
+    if build:
+        from .failure_history import parse_classifications
+        history.record_build(build[0], build[1], result["component"], result["failed_cases"],
+                             classifications=parse_classifications(result["analysis"]))
+    print(f"[{record['status']}] {record['source']}: {record['failed_cases']} failed cases in {record['duration']}s")
+    return record
+
+
+def run_batch(sources: List[Dict], output_dir: str, ai_client=None, guidelines: Dict = None,
+              jobs: int = 4, parse_workers: int = None, fetch_workers: int = 8, retry_errors: bool = True,
+              history=None) -> Dict[str, Dict]:
+    """
+    Triage every source not yet completed in output_dir and return the full
+    progress. Finished Jenkins builds are recorded in history (a FailureHistory) when given.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    progress = load_progress(output_dir)
+    pending = []
+    for entry in sources:
+        previous = progress.get(source_key(entry["source"]))
+        if previous and (previous["status"] == "done" or not retry_errors):
+            continue
+        pending.append(entry)
+    print(f"{len(sources) - len(pending)} of {len(sources)} sources already triaged, {len(pending)} pending")
+    if not pending:
+        write_summary(output_dir, progress)
+        return progress
+
+    lock = threading.Lock()
+
+    def run_one(entry):
+        with tracing.trace("batch_triage.source", source=entry["source"]):
+            result = triage_source(entry, ai_client, guidelines, fetch_workers)
+        record_result(output_dir, progress, lock, result, write_job_outputs(output_dir, result), history=history)
+
+    if parse_workers is not None:
+        parse_pool.configure(workers=parse_workers)
+    with ThreadPoolExecutor(max_workers=jobs) as job_pool:
+        list(job_pool.map(run_one, pending))
+
+    write_summary(output_dir, progress)
+    return progress
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Triage failed cases for a list of Jenkins builds and ReportPortal launches.")
+    parser.add_argument("sources", help="File with one Jenkins build URL or ReportPortal launch ('name #number') per line")
+    parser.add_argument("--output-dir", default="triage", help="Directory for per-job reports, the summary and progress")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of sources triaged at the same time")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes used for HTML parsing (default: CPU count)")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Case pages downloaded at the same time per source")
+    parser.add_argument("--rules", default="runbooks/component-keywords.md", help="Runbook used to classify failures")
+    parser.add_argument("--no-analysis", action="store_true", help="Only collect failed cases, skip the AI analysis")
+    parser.add_argument("--skip-errors", action="store_true", help="Do not retry sources that failed in a previous run")
+    parser.add_argument("--trace-file", help="Enable tracing and append spans to this JSON lines file")
+    args = parser.parse_args()
+
+    if args.trace_file:
+        tracing.enable(trace_file=args.trace_file)
+
+    ai_client = None
+    if not args.no_analysis:
+        from agents.assistant_clients import ModelRouter
+        ai_client = ModelRouter.from_env()
+
+    progress = run_batch(
+        read_sources(args.sources),
+        args.output_dir,
+        ai_client=ai_client,
+        guidelines=load_rules(args.rules),
+        jobs=args.jobs,
+        parse_workers=args.parse_workers,
+        fetch_workers=args.fetch_workers,
+        retry_errors=not args.skip_errors,
+    )
+    print(f"Summary written to {os.path.join(args.output_dir, 'summary.md')}")
+    if tracing.is_enabled():
+        with open(os.path.join(args.output_dir, "metrics.prom"), "w", encoding="utf-8") as f:
+            f.write(tracing.prometheus_snapshot())
+    return 0 if all(e["status"] == "done" for e in progress.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
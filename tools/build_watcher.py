@@ -0,0 +1,236 @@
+"""
+Watch Jenkins jobs and triage every new build as soon as it completes.
+
+Usage:
+    python -m tools.build_watcher jobs.txt --output-dir watch
+    python -m tools.build_watcher jobs.txt --once        # one polling pass, e.g. from cron
+
+jobs.txt holds one Jenkins job URL per line (blank lines and "#" comments are
+ignored). Each poll asks only for the number of lastCompletedBuild and sends
+the previous ETag/Last-Modified, so an idle job costs one tiny (often 304)
+response. Jobs without new builds are polled less and less often, up to
+--max-interval; a new build resets the interval. Every build above the job's
+high-water mark goes through get_error_message -> analyze_failed_case (with
+the console log fallback) and gets the same reports as the batch triage.
+The high-water marks live in <output-dir>/watch_state.json, so a restarted
+watcher continues where it stopped.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from . import tracing
+from .batch_triage import load_progress, record_result, triage_source, write_job_outputs, write_summary
+from .failure_history import FailureHistory
+from .multi_build_analysis import normalize_build_url
+from .utils import load_rules
+
+STATE_FILE = "watch_state.json"
+LAST_BUILD_TREE = "lastCompletedBuild[number]"
+BACKOFF_FACTOR = 1.5
+
+
+def read_jobs(path: str) -> List[str]:
+    """Read the job URLs, normalised to end with a slash. Build URLs are reduced to their job."""
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            build = normalize_build_url(line)
+            job = build.rstrip("/").rsplit("/", 1)[0] + "/" if build else line.rstrip("/") + "/"
+            if job not in jobs:
+                jobs.append(job)
+    return jobs
+
+
+def load_state(output_dir: str) -> Dict[str, Dict]:
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading watcher state, starting fresh: {e}")
+        return {}
+
+
+def save_state(output_dir: str, state: Dict[str, Dict]):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def poll_last_completed(job_url: str, job_state: Dict, timeout: int = 30) -> Optional[int]:
+    """
+    Return the job's last completed build number. A 304 answer reuses the
+    number from job_state. The response validators are stored in job_state.
+    Raises requests.RequestException when Jenkins can't be reached.
+    """
+    headers = {}
+    if job_state.get("etag"):
+        headers["If-None-Match"] = job_state["etag"]
+    if job_state.get("last_modified"):
+        headers["If-Modified-Since"] = job_state["last_modified"]
+    with tracing.span("jenkins.poll", url=job_url) as span:
+        response = requests.get(job_url + "api/json", params={"tree": LAST_BUILD_TREE},
+                                headers=headers, verify=False, timeout=timeout)
+        span.set("bytes", len(response.content))
+        if response.status_code == 304:
+            span.set("cache_hit", 1)
+            return job_state.get("latest")
+        response.raise_for_status()
+        job_state["etag"] = response.headers.get("ETag")
+        job_state["last_modified"] = response.headers.get("Last-Modified")
+        build = response.json().get("lastCompletedBuild") or {}
+        job_state["latest"] = build.get("number")
+        return job_state["latest"]
+
+
+class BuildWatcher:
+    """Polls jobs, triages their new builds and keeps a high-water mark per job."""
+
+    def __init__(self, jobs: List[str], output_dir: str, ai_client=None, guidelines: Dict = None,
+                 interval: float = 300, max_interval: float = 3600, backfill: int = 1, max_builds: int = 10,
+                 history_dir: Optional[str] = None, fetch_workers: int = 8, max_workers: int = 4):
+        self.jobs = jobs
+        self.output_dir = output_dir
+        self.ai_client = ai_client
+        self.guidelines = guidelines or {}
+        self.interval = interval
+        self.max_interval = max_interval
+        # Builds analysed when a job is seen for the first time.
+        self.backfill = backfill
+        # Most builds analysed per job and poll; older missed builds are skipped.
+        self.max_builds = max_builds
+        self.history = FailureHistory.shared(history_dir) if history_dir else None
+        self.fetch_workers = fetch_workers
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+        self.state = load_state(output_dir)
+        self.progress = load_progress(output_dir)
+
+    def _job_state(self, job: str) -> Dict:
+        with self.lock:
+            return self.state.setdefault(job, {"last_build": None, "interval": self.interval, "next_poll": 0})
+
+    def new_builds(self, job_state: Dict, latest: Optional[int]) -> List[int]:
+        if not latest:
+            return []
+        last = job_state.get("last_build")
+        first = latest - self.backfill + 1 if last is None else last + 1
+        return list(range(max(first, latest - self.max_builds + 1, 1), latest + 1))
+
+    def check_job(self, job: str) -> int:
+        """Poll one job and triage its new builds. Returns the number of builds triaged."""
+        job_state = self._job_state(job)
+        try:
+            latest = poll_last_completed(job, job_state)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error polling {job}: {e}")
+            self._schedule(job_state, job_state["interval"] * 2)
+            return 0
+        triaged = 0
+        for number in self.new_builds(job_state, latest):
+            with tracing.trace("build_watcher.build", job=job, build=number):
+                result = triage_source({"kind": "jenkins", "source": f"{job}{number}/"},
+                                       self.ai_client, self.guidelines, self.fetch_workers)
+            record_result(self.output_dir, self.progress, self.lock, result,
+                          write_job_outputs(self.output_dir, result), history=self.history)
+            if result["status"] != "done":
+                # Keep the mark below the failed build so the next poll retries it.
+                self._schedule(job_state, job_state["interval"] * 2)
+                return triaged
+            triaged += 1
+            with self.lock:
+                job_state["last_build"] = number
+                save_state(self.output_dir, self.state)
+        # Idle jobs back off; a job that just produced a build is checked again soon.
+        self._schedule(job_state, self.interval if triaged else job_state["interval"] * BACKOFF_FACTOR)
+        return triaged
+
+    def _schedule(self, job_state: Dict, interval: float):
+        with self.lock:
+            job_state["interval"] = min(max(interval, self.interval), self.max_interval)
+            job_state["next_poll"] = time.time() + job_state["interval"]
+            save_state(self.output_dir, self.state)
+
+    def poll_once(self, force: bool = False) -> int:
+        """Check every job that is due (all jobs with force) and return the number of builds triaged."""
+        now = time.time()
+        due = [job for job in self.jobs if force or self._job_state(job)["next_poll"] <= now]
+        if not due:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due))) as pool:
+            triaged = sum(pool.map(tracing.bind(self.check_job), due))
+        if triaged:
+            write_summary(self.output_dir, self.progress)
+        return triaged
+
+    def run(self):
+        print(f"Watching {len(self.jobs)} jobs, results in {self.output_dir}")
+        while True:
+            self.poll_once()
+            next_poll = min(self._job_state(job)["next_poll"] for job in self.jobs)
+            time.sleep(max(next_poll - time.time(), 1))
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Poll Jenkins jobs and triage every new completed build.")
+    parser.add_argument("jobs", help="File with one Jenkins job URL per line")
+    parser.add_argument("--output-dir", default="watch", help="Directory for reports, progress and high-water marks")
+    parser.add_argument("--interval", type=float, default=300, help="Seconds between polls of an active job")
+    parser.add_argument("--max-interval", type=float, default=3600, help="Longest poll interval for an idle job")
+    parser.add_argument("--backfill", type=int, default=1, help="Builds triaged for a job seen for the first time")
+    parser.add_argument("--max-builds", type=int, default=10, help="Most builds triaged per job and poll")
+    parser.add_argument("--jobs-parallel", type=int, default=4, help="Jobs checked at the same time")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Case pages downloaded at the same time per build")
+    parser.add_argument("--rules", default="runbooks/component-keywords.md", help="Runbook used to classify failures")
+    parser.add_argument("--history-dir", default=os.getenv("FAILURE_HISTORY_DIR", "history"),
+                        help="Failure history to record builds in ('' to disable)")
+    parser.add_argument("--no-analysis", action="store_true", help="Only collect failed cases, skip the AI analysis")
+    parser.add_argument("--once", action="store_true", help="Poll every job once and exit")
+    args = parser.parse_args()
+
+    ai_client = None
+    if not args.no_analysis:
+        from agents.assistant_clients import ModelRouter
+        ai_client = ModelRouter.from_env()
+
+    watcher = BuildWatcher(
+        read_jobs(args.jobs),
+        args.output_dir,
+        ai_client=ai_client,
+        guidelines=load_rules(args.rules),
+        interval=args.interval,
+        max_interval=args.max_interval,
+        backfill=args.backfill,
+        max_builds=args.max_builds,
+        history_dir=args.history_dir or None,
+        fetch_workers=args.fetch_workers,
+        max_workers=args.jobs_parallel,
+    )
+    if args.once:
+        print(f"Triaged {watcher.poll_once(force=True)} new builds")
+        return 0
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
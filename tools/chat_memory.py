@@ -0,0 +1,130 @@
+"""
+Bounded conversation context for the default chat path.
+
+The chat history in st.session_state.messages grows with every generated
+script and analysis table. ChatMemory.context() builds what is actually sent
+to the model:
+
+    - the system messages
+    - a rolling summary of the turns that fell out of the window
+    - the last max_turns turns, newest first, within token_budget, with large
+      code blocks and tables of earlier replies replaced by a short reference
+
+Turns leave the window in batches of summary_batch messages, and each batch is
+folded into the cached summary with one short model call (or a local digest
+without a client), so the prompt size and the per-turn latency stay flat over
+a long session.
+"""
+import os
+import re
+from typing import Dict, List
+
+from . import tracing
+
+CHAT_MAX_TURNS = int(os.getenv("CHAT_MAX_TURNS") or 6)
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET") or 6000)
+
+_CODE_BLOCK_RE = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
+_TABLE_RE = re.compile(r"(?:^\|.*\|[ \t]*\n?){6,}", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return len(text or "") // 4 + 1
+
+
+def strip_large_blocks(text: str, max_block_chars: int = 600) -> str:
+    """Replace code blocks longer than max_block_chars and long markdown tables by a short reference."""
+    def code(match):
+        body = match.group(2)
+        if len(body) <= max_block_chars:
+            return match.group(0)
+        return f"[{match.group(1) or 'code'} block of {body.count(chr(10)) + 1} lines omitted]"
+
+    def table(match):
+        rows = match.group(0).rstrip("\n").split("\n")
+        return "\n".join(rows[:3]) + f"\n[table with {len(rows) - 2} rows, omitted]\n"
+
+    return _TABLE_RE.sub(table, _CODE_BLOCK_RE.sub(code, text or ""))
+
+
+def _digest(message: Dict, max_chars: int = 200) -> str:
+    text = " ".join(strip_large_blocks(str(message.get("content", "")), 0).split())
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip() + " ..."
+    return f"{message['role']}: {text}"
+
+
+class ChatMemory:
+    """Keeps the rolling summary for one chat session; messages is the full, append-only history."""
+
+    def __init__(self, ai_client=None, max_turns: int = CHAT_MAX_TURNS, token_budget: int = CHAT_TOKEN_BUDGET,
+                 summary_batch: int = 4, max_summary_chars: int = 2000, max_block_chars: int = 600):
+        self.ai_client = ai_client
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_batch = summary_batch
+        self.max_summary_chars = max_summary_chars
+        self.max_block_chars = max_block_chars
+        self.summary = ""
+        # Index (in the non-system messages) up to which the history is in the summary.
+        self.summarized = 0
+
+    def _summarize(self, messages: List[Dict]):
+        digests = "\n".join(_digest(message, 600) for message in messages)
+        summary = None
+        if self.ai_client is not None:
+            prompt = (
+                "Update the summary of a QA assistant conversation with the new messages. Keep test case IDs, "
+                "build URLs, components, failure classifications and open requests; drop code and tables. "
+                f"Answer with the summary only, at most {self.max_summary_chars // 5} words.\n\n"
+                f"### Summary so far\n{self.summary or '(empty)'}\n\n### New messages\n{digests}"
+            )
+            try:
+                response = self.ai_client.chat([{"role": "user", "content": prompt}], task="summarize_chat")
+                summary = response if isinstance(response, str) else None
+            except Exception as e:
+                print(f"Error summarizing chat history: {e}")
+        if not summary:
+            summary = "\n".join(filter(None, [self.summary, "\n".join(_digest(message) for message in messages)]))
+        self.summary = summary.strip()[-self.max_summary_chars:]
+
+    def context(self, messages: List[Dict]) -> List[Dict]:
+        """Return the messages to send for the next model call."""
+        with tracing.span("chat.context") as span:
+            system = [message for message in messages if message["role"] == "system"]
+            history = [message for message in messages if message["role"] != "system"]
+            budget = self.token_budget - sum(estimate_tokens(m["content"]) for m in system)
+            budget -= estimate_tokens(self.summary)
+
+            # Newest first: the last message verbatim, earlier ones with large blocks stripped.
+            window = []
+            for n in range(len(history) - 1, self.summarized - 1, -1):
+                message = history[n]
+                if window:
+                    message = {"role": message["role"], "content": strip_large_blocks(message["content"], self.max_block_chars)}
+                cost = estimate_tokens(message["content"])
+                if window and (len(window) >= self.max_turns * 2 or cost > budget):
+                    break
+                window.insert(0, message)
+                budget -= cost
+            start = len(history) - len(window)
+
+            # Fold the turns that left the window into the summary, a batch at a time.
+            evicted = start - self.summarized
+            if evicted >= self.summary_batch or (evicted and budget < 0):
+                self._summarize(history[self.summarized:start])
+                self.summarized = start
+            # Evicted turns still waiting for the next batch go in as one-line digests.
+            pending = [_digest(message) for message in history[self.summarized:start]]
+
+            summary = "\n".join(filter(None, [self.summary, "\n".join(pending)]))
+            # One system message: some clients keep only the last one.
+            system_text = [message["content"] for message in system]
+            if summary:
+                system_text.append(f"Summary of the earlier conversation:\n{summary}")
+            context = [{"role": "system", "content": "\n\n".join(system_text)}] if system_text else []
+            context += window
+            span.set("messages", len(context))
+            span.set("tokens", sum(estimate_tokens(m["content"]) for m in context))
+            return context
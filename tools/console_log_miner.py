@@ -0,0 +1,221 @@
+"""
+Mine a Jenkins console log for failures without downloading it whole.
+
+Builds that die before JUnit results are published have no testReport, so
+get_error_message finds nothing. mine_console_log() reads the console through
+logText/progressiveText in streamed chunks starting at a byte offset (or near
+the end with tail_bytes), matches every line against the runbook keywords of
+the component plus generic error patterns, and keeps only a bounded window of
+lines around each match.
+"""
+import codecs
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import requests
+
+from . import tracing
+from .get_result_from_jenkins import get_report_url
+from .utils import extract_component_from_url, find_guideline, load_rules
+
+GENERIC_PATTERNS = [
+    ("Build error", r"\b(?:ERROR|FATAL)\b"),
+    ("Build error", r"\bpanic:"),
+    ("Build error", r"Traceback \(most recent call last\)"),
+    ("Build error", r"\bexit (?:code|status) [1-9]\d*"),
+    ("Build error", r"\bBuild step .* marked build as failure"),
+]
+READ_CHUNK_SIZE = 64 * 1024
+# How much of the end of the log the no-testReport fallback reads.
+CONSOLE_TAIL_BYTES = int(os.getenv("CONSOLE_TAIL_BYTES") or 2 * 1024 * 1024)
+
+
+def load_error_patterns(component: str, md_file: str = "runbooks/component-keywords.md") -> List[tuple]:
+    """
+    Turn the numbered keywords of a component's runbook section into
+    (failure type, compiled regex) pairs, followed by the generic patterns.
+    """
+    section = find_guideline(load_rules(md_file), component) if component else ""
+    patterns = []
+    failure_type = None
+    for line in section.splitlines():
+        heading = re.match(r"^###\s+(.+?):?\s*$", line)
+        if heading:
+            failure_type = heading.group(1).strip()
+            continue
+        keyword = re.match(r"^\s*\d+\.\s+(.+?)\s*$", line)
+        if keyword and failure_type:
+            # Keywords are literal text; only the runbook's ".*" stands for anything.
+            text = keyword.group(1).strip("`")
+            patterns.append((failure_type, re.compile(".*".join(map(re.escape, text.split(".*"))), re.IGNORECASE)))
+    patterns += [(failure_type, re.compile(p)) for failure_type, p in GENERIC_PATTERNS]
+    return patterns
+
+
+class _Matcher:
+    """Scans lines one at a time and keeps bounded context around matches."""
+
+    def __init__(self, patterns, context_before, context_after, max_matches):
+        self.patterns = patterns
+        # One combined pass filters the lines; only hits are checked per pattern.
+        # Each alternative keeps its own case sensitivity.
+        self.combined = re.compile("|".join(
+            f"(?i:{p.pattern})" if p.flags & re.IGNORECASE else f"(?:{p.pattern})" for _, p in patterns
+        )) if patterns else None
+        self.before = deque(maxlen=context_before)
+        self.context_after = context_after
+        self.max_matches = max_matches
+        self.matches = []
+        self.total_matches = 0
+        self.line_no = 0
+        self._open = []
+
+    def feed_line(self, line: str):
+        self.line_no += 1
+        for match in self._open:
+            match["context"].append(line)
+        self._open = [m for m in self._open if len(m["context"]) < m["_until"]]
+        hits = []
+        if self.combined is not None and self.combined.search(line):
+            hits = [(failure_type, p.pattern) for failure_type, p in self.patterns if p.search(line)]
+        if hits:
+            self.total_matches += 1
+            if len(self.matches) < self.max_matches:
+                match = {
+                    "line": self.line_no,
+                    "failure_type": hits[0][0],
+                    "patterns": [pattern for _, pattern in hits],
+                    "text": line,
+                    "context": list(self.before) + [line],
+                }
+                match["_until"] = len(match["context"]) + self.context_after
+                self.matches.append(match)
+                self._open.append(match)
+        self.before.append(line)
+
+    def results(self):
+        return [{k: v for k, v in m.items() if not k.startswith("_")} for m in self.matches]
+
+
+class _LineReader:
+    """Turns byte chunks into lines, carrying partial lines and characters across chunks and responses."""
+
+    def __init__(self, matcher: _Matcher, skip_first_line: bool = False):
+        self.matcher = matcher
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.carry = ""
+        # Reading from the middle of the log starts inside a line.
+        self.skip_first_line = skip_first_line
+
+    def feed(self, chunk: bytes):
+        lines = (self.carry + self.decoder.decode(chunk)).split("\n")
+        self.carry = lines.pop()
+        for line in lines:
+            if self.skip_first_line:
+                self.skip_first_line = False
+                continue
+            self.matcher.feed_line(line.rstrip("\r"))
+
+    def close(self):
+        self.carry += self.decoder.decode(b"", final=True)
+        if self.carry and not self.skip_first_line:
+            self.matcher.feed_line(self.carry.rstrip("\r"))
+        self.carry = ""
+
+
+def _read_progressive(url: str, start: int, reader: _LineReader, timeout: int):
+    """Stream one progressiveText response into the reader; return (next offset, more data)."""
+    with requests.get(url, params={"start": start}, stream=True, verify=False, timeout=timeout) as response:
+        response.raise_for_status()
+        received = 0
+        for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+            received += len(chunk)
+            reader.feed(chunk)
+        tracing.current_span().add("bytes", received)
+        next_start = int(response.headers.get("X-Text-Size", start + received))
+        return next_start, response.headers.get("X-More-Data") == "true"
+
+
+def get_console_size(build_url: str, timeout: int = 60) -> Optional[int]:
+    """Current console size in bytes, read from the progressiveText headers without reading the body."""
+    url = get_report_url(build_url).rstrip("/") + "/logText/progressiveText"
+    try:
+        with requests.get(url, params={"start": 0}, stream=True, verify=False, timeout=timeout) as response:
+            response.raise_for_status()
+            size = response.headers.get("X-Text-Size")
+            return int(size) if size is not None else None
+    except requests.RequestException as e:
+        print(f"Error reading console size: {e}")
+        return None
+
+
+def mine_console_log(build_url: str, component: Optional[str] = None, start: int = 0, tail_bytes: Optional[int] = None,
+                     context_before: int = 3, context_after: int = 5, max_matches: int = 50,
+                     follow: bool = False, poll_interval: float = 5.0, timeout: int = 60,
+                     patterns: Optional[List[tuple]] = None) -> Dict:
+    """
+    Scan a build's console log and return the matched lines with context.
+
+    start       byte offset to begin reading at
+    tail_bytes  read only the last N bytes of the log (overrides start)
+    follow      keep polling while Jenkins reports more data (running builds)
+    """
+    component = component or extract_component_from_url(build_url)
+    if patterns is None:
+        patterns = load_error_patterns(component)
+    url = get_report_url(build_url).rstrip("/") + "/logText/progressiveText"
+    if tail_bytes:
+        size = get_console_size(build_url, timeout)
+        if size is not None:
+            start = max(size - tail_bytes, 0)
+    matcher = _Matcher(patterns, context_before, context_after, max_matches)
+    reader = _LineReader(matcher, skip_first_line=start > 0)
+    first_offset = start
+    with tracing.span("jenkins.console", url=url, start=start):
+        while True:
+            next_start, more = _read_progressive(url, start, reader, timeout)
+            progressed = next_start > start
+            start = next_start
+            if not more:
+                break
+            if not progressed:
+                # The build is still running and nothing new was written.
+                if not follow:
+                    break
+                time.sleep(poll_interval)
+        reader.close()
+    return {
+        "url": build_url,
+        "component": component,
+        "start": first_offset,
+        "end": start,
+        "lines_scanned": matcher.line_no,
+        "total_matches": matcher.total_matches,
+        "matches": matcher.results(),
+    }
+
+
+def console_matches_to_cases(result: Dict, max_cases: int = 20) -> List[Dict]:
+    """Shape console matches like get_error_message records so analyze_failed_case can classify them."""
+    cases = []
+    for match in result["matches"][:max_cases]:
+        cases.append({
+            "ID": f"CONSOLE-{match['line']}",
+            "Title": f"Console log line {match['line']} ({match['failure_type']})",
+            "Error Message": match["text"].strip(),
+            "Stacktrace Message": "\n".join(match["context"]),
+        })
+    return cases
+
+
+def get_console_failures(build_url: str, component: Optional[str] = None,
+                         tail_bytes: Optional[int] = CONSOLE_TAIL_BYTES) -> List[Dict]:
+    """Fallback for builds without a test report: failure records mined from the end of the console log."""
+    try:
+        return console_matches_to_cases(mine_console_log(build_url, component=component, tail_bytes=tail_bytes))
+    except requests.RequestException as e:
+        print(f"Error reading console log of {build_url}: {e}")
+        return []
@@ -0,0 +1,380 @@
+"""
+Per-build, per-case test outcome history for trend queries.
+
+FailureHistory keeps append-only NumPy columns and interned string tables
+under one directory. Several writers share a directory: the app's job
+threads and the build watcher, often in separate processes.
+FailureHistory.shared() returns one instance per directory and process.
+Every append holds a thread lock and an exclusive flock on <dir>/.lock and
+first reads what other writers appended, so build indexes and interned ids
+stay unique. Queries pick up other writers' builds in the same way.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import tracing
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: writers in one process are still serialized by the thread lock.
+    fcntl = None
+
+DEFAULT_HISTORY_DIR = "history"
+
+OUTCOME_FAILED = 1
+OUTCOME_PASSED = 0
+
+# Column files are raw little-endian arrays appended with tobytes(), so an
+# append never rewrites what is already on disk.
+BUILD_COLUMNS = {
+    "job": np.int32,
+    "number": np.int32,
+    "component": np.int32,
+    "timestamp": np.int64,
+}
+RESULT_COLUMNS = {
+    "build": np.int32,
+    "case": np.int32,
+    "outcome": np.int8,
+    "classification": np.int16,
+}
+INTERN_TABLES = ("jobs", "components", "cases", "classifications")
+
+
+class _InternTable:
+    """Append-only string <-> int mapping backed by a newline separated file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = []
+        self.index = {}
+        self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Read the values other writers appended since the last read."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # Only whole lines; a line being written is picked up next time.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").split("\n")[:-1]:
+            self._add(line)
+        self.offset += end
+
+    def _add(self, value):
+        self.index[value] = len(self.values)
+        self.values.append(value)
+
+    def intern(self, value):
+        value = (value or "").replace("\n", " ")
+        if value not in self.index:
+            line = (value + "\n").encode("utf-8")
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self._add(value)
+            self.offset += len(line)
+        return self.index[value]
+
+    def get(self, value):
+        return self.index.get(value)
+
+
+class FailureHistory:
+    """
+    Append-only columnar store of per-build, per-case test outcomes.
+
+    Every recorded build gets one row in the build columns; every failed (or
+    explicitly passed) case gets one row in the result columns pointing at its
+    build. Case IDs, jobs, components and classifications are interned to ints
+    so all trend queries run as NumPy operations over small integer arrays.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, history_dir: str = DEFAULT_HISTORY_DIR) -> "FailureHistory":
+        """The process-wide instance for a directory; use it instead of creating one per job."""
+        key = os.path.realpath(history_dir)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(history_dir)
+            return cls._shared[key]
+
+    def __init__(self, history_dir: str = DEFAULT_HISTORY_DIR):
+        self.history_dir = history_dir
+        os.makedirs(history_dir, exist_ok=True)
+        self.lock = threading.RLock()
+        with self._locked():
+            self.tables = {name: _InternTable(os.path.join(history_dir, f"{name}.txt")) for name in INTERN_TABLES}
+            self.builds = self._load_columns("build", BUILD_COLUMNS)
+            n_builds = len(self.builds["job"])
+            self.results = self._load_columns("result", RESULT_COLUMNS)
+            # A crash between writing results and the build row leaves orphans at the
+            # tail of the result columns; drop them so the next build can't adopt them.
+            valid = self.results["build"] < n_builds
+            if not valid.all():
+                size = int(np.argmin(valid))
+                for name, dtype in RESULT_COLUMNS.items():
+                    os.truncate(self._column_path("result", name), size * np.dtype(dtype).itemsize)
+                self.results = {name: col[:size] for name, col in self.results.items()}
+            self._recorded = set(zip(self.builds["job"].tolist(), self.builds["number"].tolist()))
+
+    @contextmanager
+    def _locked(self):
+        """This instance's thread lock plus an exclusive flock shared with other processes."""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.history_dir, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_tail(self, prefix, columns, loaded):
+        """Append the rows other writers added to the files since they were loaded."""
+        sizes = []
+        for name, dtype in columns.items():
+            path = self._column_path(prefix, name)
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        # Only rows present in every column: the last append of a writer may still be in progress.
+        size = min(sizes)
+        start = len(loaded[next(iter(columns))])
+        if size <= start:
+            return 0
+        for name, dtype in columns.items():
+            tail = np.fromfile(self._column_path(prefix, name), dtype=dtype, count=size - start,
+                               offset=start * np.dtype(dtype).itemsize)
+            loaded[name] = np.concatenate([loaded[name], tail])
+        return size - start
+
+    def refresh(self):
+        """Pick up the builds, results and interned values written by other instances or processes."""
+        with self.lock:
+            for table in self.tables.values():
+                table.refresh()
+            start = len(self.builds["job"])
+            if self._load_tail("build", BUILD_COLUMNS, self.builds):
+                self._recorded.update(zip(self.builds["job"][start:].tolist(), self.builds["number"][start:].tolist()))
+            self._load_tail("result", RESULT_COLUMNS, self.results)
+
+    def _column_path(self, prefix, name):
+        return os.path.join(self.history_dir, f"{prefix}_{name}.bin")
+
+    def _load_columns(self, prefix, columns):
+        loaded = {}
+        for name, dtype in columns.items():
+            path = self._column_path(prefix, name)
+            loaded[name] = np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.empty(0, dtype=dtype)
+        # Keep columns aligned even if the last append was interrupted.
+        size = min(len(col) for col in loaded.values())
+        for name, dtype in columns.items():
+            if len(loaded[name]) > size:
+                os.truncate(self._column_path(prefix, name), size * np.dtype(dtype).itemsize)
+        return {name: col[:size] for name, col in loaded.items()}
+
+    def _append_columns(self, prefix, columns, loaded, rows):
+        for name, dtype in columns.items():
+            arr = np.asarray(rows[name], dtype=dtype)
+            with open(self._column_path(prefix, name), "ab") as f:
+                f.write(arr.tobytes())
+            loaded[name] = np.concatenate([loaded[name], arr])
+
+    def has_build(self, job: str, build_number: int) -> bool:
+        job_id = self.tables["jobs"].get(job)
+        return job_id is not None and (job_id, int(build_number)) in self._recorded
+
+    def record_build(self, job: str, build_number: int, component: str, failed_cases: List[Dict],
+                     classifications: Optional[Dict[str, str]] = None, passed_case_ids: Optional[List[str]] = None,
+                     timestamp: Optional[float] = None) -> bool:
+        """
+        Record the outcome of one build.
+
+        failed_cases are records as returned by get_error_message (only "ID" is
+        required). Cases that are absent from a recorded build count as passed.
+        Returns False if the build was already recorded.
+        """
+        with self._locked():
+            # Other writers may have appended since this instance last looked.
+            self.refresh()
+            return self._record_build(job, build_number, component, failed_cases, classifications,
+                                      passed_case_ids, timestamp)
+
+    def _record_build(self, job, build_number, component, failed_cases, classifications, passed_case_ids, timestamp):
+        if self.has_build(job, build_number):
+            return False
+        classifications = classifications or {}
+        job_id = self.tables["jobs"].intern(job)
+        component_id = self.tables["components"].intern(component or "")
+        build_idx = len(self.builds["job"])
+
+        case_ids, outcomes, labels = [], [], []
+        for case in failed_cases:
+            case_ids.append(self.tables["cases"].intern(case["ID"]))
+            outcomes.append(OUTCOME_FAILED)
+            label = classifications.get(case["ID"], "")
+            labels.append(self.tables["classifications"].intern(label) if label else -1)
+        for case_id in passed_case_ids or []:
+            case_ids.append(self.tables["cases"].intern(case_id))
+            outcomes.append(OUTCOME_PASSED)
+            labels.append(-1)
+
+        with tracing.span("history.write", job=job, cases=len(case_ids)):
+            # Results go first; the build row written last is what commits them.
+            self._append_columns("result", RESULT_COLUMNS, self.results, {
+                "build": [build_idx] * len(case_ids),
+                "case": case_ids,
+                "outcome": outcomes,
+                "classification": labels,
+            })
+            self._append_columns("build", BUILD_COLUMNS, self.builds, {
+                "job": [job_id],
+                "number": [int(build_number)],
+                "component": [component_id],
+                "timestamp": [int(timestamp if timestamp is not None else time.time())],
+            })
+        self._recorded.add((job_id, int(build_number)))
+        return True
+
+    def _window(self, job: Optional[str] = None, component: Optional[str] = None, last_n: Optional[int] = None):
+        """Return the build indices (ordered by build number) matching the filters."""
+        self.refresh()
+        mask = np.ones(len(self.builds["job"]), dtype=bool)
+        if job is not None:
+            job_id = self.tables["jobs"].get(job)
+            if job_id is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.builds["job"] == job_id
+        if component is not None:
+            component_id = self.tables["components"].get(component)
+            if component_id is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.builds["component"] == component_id
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(self.builds["number"][idx], kind="stable")]
+        if last_n is not None:
+            idx = idx[-last_n:]
+        return idx
+
+    def _failure_matrix(self, builds):
+        """Dense bool matrix [build x case] of failures for the given builds."""
+        position = np.full(len(self.builds["job"]), -1, dtype=np.int64)
+        position[builds] = np.arange(len(builds))
+        rows = position[self.results["build"]]
+        selected = (rows >= 0) & (self.results["outcome"] == OUTCOME_FAILED)
+        rows = rows[selected]
+        cases, cols = np.unique(self.results["case"][selected], return_inverse=True)
+        matrix = np.zeros((len(builds), len(cases)), dtype=bool)
+        matrix[rows, cols] = True
+        return cases, matrix
+
+    def _case_names(self, case_ids):
+        values = self.tables["cases"].values
+        return [values[i] for i in case_ids]
+
+    def failed_in(self, min_failures: int, last_n: int, job: Optional[str] = None,
+                  component: Optional[str] = None) -> List[Dict]:
+        """Cases that failed in at least min_failures of the last last_n builds."""
+        builds = self._window(job, component, last_n)
+        cases, matrix = self._failure_matrix(builds)
+        counts = matrix.sum(axis=0)
+        hits = np.flatnonzero(counts >= min_failures)
+        hits = hits[np.argsort(-counts[hits], kind="stable")]
+        names = self._case_names(cases[hits])
+        return [{"ID": name, "failures": int(counts[i]), "builds": len(builds)} for name, i in zip(names, hits)]
+
+    def flakiness(self, job: Optional[str] = None, component: Optional[str] = None,
+                  last_n: Optional[int] = None) -> List[Dict]:
+        """
+        Per-case failure rate and flip rate over the window.
+
+        The flip rate is the share of consecutive build pairs where the case
+        changed between pass and fail; a consistently broken case scores 0.
+        """
+        builds = self._window(job, component, last_n)
+        cases, matrix = self._failure_matrix(builds)
+        if not len(cases):
+            return []
+        failure_rate = matrix.mean(axis=0)
+        flips = np.count_nonzero(matrix[1:] != matrix[:-1], axis=0)
+        flip_rate = flips / max(len(builds) - 1, 1)
+        order = np.lexsort((-failure_rate, -flip_rate))
+        names = self._case_names(cases[order])
+        return [
+            {"ID": name, "failure_rate": float(failure_rate[i]), "flip_rate": float(flip_rate[i]), "builds": len(builds)}
+            for name, i in zip(names, order)
+        ]
+
+    def failure_streaks(self, job: Optional[str] = None, component: Optional[str] = None,
+                        last_n: Optional[int] = None) -> List[Dict]:
+        """
+        Current and longest consecutive failure streak per case, plus the build
+        number where the current streak started (the first failing build).
+        """
+        builds = self._window(job, component, last_n)
+        cases, matrix = self._failure_matrix(builds)
+        if not len(cases):
+            return []
+        n = len(builds)
+        steps = np.arange(1, n + 1)[:, None]
+        # Index of the most recent passing build at or before each row.
+        last_pass = np.maximum.accumulate(np.where(matrix, 0, steps), axis=0)
+        run_length = steps - last_pass
+        longest = run_length.max(axis=0)
+        current = run_length[-1]
+        numbers = self.builds["number"][builds]
+        names = self._case_names(cases)
+        results = []
+        for i in np.argsort(-current, kind="stable"):
+            first_failing = int(numbers[n - current[i]]) if current[i] else None
+            results.append({
+                "ID": names[i],
+                "current_streak": int(current[i]),
+                "longest_streak": int(longest[i]),
+                "first_failing_build": first_failing,
+            })
+        return results
+
+    def first_failing_build(self, case_id: str, job: Optional[str] = None,
+                            component: Optional[str] = None) -> Optional[int]:
+        """Build number where the case's current failure streak started, or None if it last passed."""
+        case = self.tables["cases"].get(case_id)
+        if case is None:
+            return None
+        builds = self._window(job, component)
+        if not len(builds):
+            return None
+        failed = np.zeros(len(self.builds["job"]), dtype=bool)
+        hit = (self.results["case"] == case) & (self.results["outcome"] == OUTCOME_FAILED)
+        failed[self.results["build"][hit]] = True
+        series = failed[builds]
+        if not series[-1]:
+            return None
+        passed = np.flatnonzero(~series)
+        start = passed[-1] + 1 if len(passed) else 0
+        return int(self.builds["number"][builds[start]])
+
+
+def parse_classifications(analysis: str) -> Dict[str, str]:
+    """Pull 'Case ID -> Failure Type' pairs out of the markdown table returned by analyze_failed_case."""
+    classifications = {}
+    if not isinstance(analysis, str):
+        return classifications
+    for line in analysis.splitlines():
+        cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+        if len(cells) >= 3 and re.match(r"^[A-Z0-9]+-\d+$", cells[0]):
+            classifications[cells[0]] = cells[2]
+    return classifications
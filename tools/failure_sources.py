@@ -0,0 +1,252 @@
+"""
+Pluggable failure sources.
+
+Everything that collects failed cases (the Streamlit app, the batch triage,
+the build watcher, the multi-build analysis) goes through open_source(),
+which picks a provider by the shape of the source:
+
+    https://jenkins/.../job/<job>/<n>/                 Jenkins test report pages (HTML)
+    https://jenkins/.../job/<job>/<n>/testReport/api/json
+                                                       Jenkins test report JSON API
+    rp:<name> #<n>, <name> #<n>,
+    https://reportportal/ui/#<project>/launches/all/<id>
+                                                       ReportPortal launch
+    <file>.jsonl, .jsonl.gz, .jsonl.zst                local JSON lines export
+
+Providers yield case records asynchronously (`async for case in
+source.cases()`), normalized to the keys "ID", "Title", "Error Message",
+"Stacktrace Message", "Component" and "Source". Each provider keeps its own
+concurrency and caching; the analysis stages only see the records.
+"""
+import asyncio
+import os
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from . import tracing
+from .utils import extract_component_from_url
+
+_DONE = object()
+
+
+class FailureSource(ABC):
+    """
+    Base provider. Subclasses implement matches() and iter_records(), a plain
+    (blocking) generator of records; cases() runs it in a worker thread and
+    hands the records to the event loop as they are produced.
+    """
+
+    kind = ""
+
+    def __init__(self, source: str, **options):
+        self.source = source.strip()
+        self.options = options
+
+    @classmethod
+    @abstractmethod
+    def matches(cls, source: str) -> bool:
+        """Whether this provider reads the given source string."""
+
+    @property
+    def component(self) -> Optional[str]:
+        return None
+
+    @abstractmethod
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield the raw failed-case records of the source; may block."""
+
+    def normalize(self, record: Dict) -> Dict:
+        return {
+            "ID": record.get("ID", ""),
+            "Title": record.get("Title", ""),
+            "Error Message": record.get("Error Message") or "",
+            "Stacktrace Message": record.get("Stacktrace Message") or "",
+            "Component": record.get("Component") or self.component,
+            "Source": record.get("Source") or self.source,
+        }
+
+    async def cases(self) -> AsyncIterator[Dict]:
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def produce():
+            try:
+                for record in self.iter_records():
+                    loop.call_soon_threadsafe(queue.put_nowait, self.normalize(record))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+        producer = loop.run_in_executor(None, tracing.bind(produce))
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+
+
+class JenkinsHtmlSource(FailureSource):
+    """Jenkins build: one testReport page plus a page per failed case, console log when there is no report."""
+
+    kind = "jenkins"
+
+    @classmethod
+    def matches(cls, source):
+        return source.startswith(("http://", "https://")) and re.search(r"/job/[^/]+/\d+(?:/|$)", source) is not None
+
+    @property
+    def component(self):
+        return extract_component_from_url(self.source)
+
+    def iter_records(self):
+        # The scrapers are imported on first use, keeping find_source() cheap for the chat.
+        from .get_result_from_jenkins import get_error_message
+        return get_error_message(self.source, fetch_workers=self.options.get("fetch_workers")) or self._console_records()
+
+    def _console_records(self):
+        """Failures mined from the console log, only for builds that published no test report."""
+        from .console_log_miner import get_console_failures
+        from .get_result_from_jenkins import test_report_exists
+        if test_report_exists(self.source):
+            return []
+        return get_console_failures(self.source, self.component)
+
+
+class JenkinsJsonSource(JenkinsHtmlSource):
+    """Jenkins build read through the testReport JSON API, a single request per build."""
+
+    kind = "jenkins-json"
+
+    @classmethod
+    def matches(cls, source):
+        return super().matches(source) and source.rstrip("/").endswith("/api/json")
+
+    def iter_records(self):
+        from .get_result_from_jenkins import get_error_message_from_json
+        return get_error_message_from_json(self.source) or self._console_records()
+
+
+class ReportPortalSource(FailureSource):
+    """ReportPortal launch, as 'rp:name #number', 'name #number' or a launch URL of the web UI."""
+
+    kind = "reportportal"
+    _URL_RE = re.compile(r"/launches/[^/]+/(\d+)")
+
+    @classmethod
+    def matches(cls, source):
+        if source.startswith(("http://", "https://")):
+            return cls._URL_RE.search(source) is not None
+        return source.startswith("rp:") or re.match(r"^[^\s/#][^#]*#\s*\d+$", source) is not None
+
+    def __init__(self, source, **options):
+        super().__init__(source, **options)
+        match = self._URL_RE.search(self.source)
+        self.launch_id = int(match.group(1)) if match else None
+        self.launch = None if match else re.sub(r"^rp:", "", self.source).strip()
+
+    @staticmethod
+    def _client():
+        # Imported here: the module checks the ReportPortal connection on import.
+        from . import get_results_from_reportportal as rp
+        return rp
+
+    @property
+    def component(self):
+        if self.launch is None:
+            # Launch URLs only carry the id; the name comes from the launch itself.
+            launch = self._client().get_launch(self.launch_id)
+            self.launch = f"{launch['name']} #{launch['number']}" if launch else ""
+        return self.launch.rsplit("#", 1)[0].strip().split("-")[0] or None
+
+    def iter_records(self):
+        rp = self._client()
+        if self.launch_id is None:
+            self.launch_id = rp.get_launch_id_by_name(self.launch)
+        if self.launch_id is None:
+            return iter(())
+        return rp.iter_failed_cases(self.launch_id, self.options.get("log_workers", 8))
+
+
+class JsonlFileSource(FailureSource):
+    """Failed cases saved as JSON lines (for example a ReportPortal --export), optionally compressed."""
+
+    kind = "export"
+    SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+
+    @classmethod
+    def matches(cls, source):
+        return source.endswith(cls.SUFFIXES)
+
+    def normalize(self, record):
+        # The component is per record: from the record, its launch, or else the file name.
+        case = super().normalize(record)
+        if not case["Component"]:
+            name = record.get("Launch") or os.path.basename(self.source).split(".")[0]
+            case["Component"] = name.rsplit("#", 1)[0].strip().split("-")[0]
+        return case
+
+    def iter_records(self):
+        from .generate_failed_case_report import iter_json_cases, open_cases_file
+        with open_cases_file(self.source) as f:
+            yield from iter_json_cases(f)
+
+
+# Checked in order; the first provider whose matches() accepts the source wins.
+PROVIDERS = [JsonlFileSource, ReportPortalSource, JenkinsJsonSource, JenkinsHtmlSource]
+
+
+def register_provider(provider, first: bool = True):
+    """Add a FailureSource subclass, by default ahead of the built-in ones."""
+    if first:
+        PROVIDERS.insert(0, provider)
+    else:
+        PROVIDERS.append(provider)
+
+
+def open_source(source: str, **options) -> FailureSource:
+    """Return the provider for a source string. Raises ValueError for unknown shapes."""
+    source = source.strip()
+    for provider in PROVIDERS:
+        if provider.matches(source):
+            return provider(source, **options)
+    raise ValueError(f"Unrecognised failure source: {source}")
+
+
+def find_source(text: str) -> Optional[str]:
+    """Return the first substring of a chat message that a provider accepts."""
+    candidates = re.findall(r"https?://\S+|rp:[^\n]*?#\s*\d+|\S+\.jsonl(?:\.gz|\.zst)?\b", text)
+    for candidate in candidates:
+        candidate = candidate.rstrip(".,;)")
+        if any(provider.matches(candidate) for provider in PROVIDERS):
+            return candidate
+    return None
+
+
+async def collect(source: FailureSource) -> List[Dict]:
+    return [case async for case in source.cases()]
+
+
+async def gather_cases(sources: Iterable[str], **options) -> Dict[str, List[Dict]]:
+    """Collect several sources concurrently: {source: cases}."""
+    sources = list(sources)
+    results = await asyncio.gather(*(collect(open_source(s, **options)) for s in sources))
+    return dict(zip(sources, results))
+
+
+def collect_cases(source, **options) -> List[Dict]:
+    """Blocking helper for synchronous callers: all normalized cases of a source (string or FailureSource)."""
+    if isinstance(source, str):
+        source = open_source(source, **options)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(collect(source))
+    # Called from inside an event loop: run on a separate thread with its own loop.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(tracing.bind(asyncio.run), collect(source)).result()
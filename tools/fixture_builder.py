@@ -0,0 +1,259 @@
+"""
+Schema-driven fixture synthesis for Polarion test cases.
+
+The sample fixtures under sample/fixtures define the shape of a profile
+(day1-profile/day2-profile). build_fixture() pulls the quoted input values
+out of the Polarion steps together with the words around them, maps each
+value to a profile field with rules (region and zone codes, CIDRs, host
+prefix, instance types, cluster and machine pool names, and any field whose
+name appears next to the value) and fills a copy of the sample profile
+locally. Only values that match no rule are sent to the model, and then
+only as a short field-mapping question, not the whole fixture.
+"""
+import copy
+import glob
+import html
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import tracing
+
+SAMPLE_FIXTURE_DIR = "sample/fixtures"
+
+REGION_RE = r"^(?:us|eu|ap|ca|sa|me|af|il)-[a-z]+-\d$"
+ZONE_RE = r"^(?:us|eu|ap|ca|sa|me|af|il)-[a-z]+-\d[a-z]$"
+CIDR_RE = r"^\d{1,3}(?:\.\d{1,3}){3}/\d{1,2}$"
+INSTANCE_RE = r"^[a-z][a-z0-9-]*\d[a-z0-9-]*\.(?:\d*x?large|medium|small|micro|nano|metal)$"
+NAME_RE = r"^[a-z0-9]([-a-z0-9]*[a-z0-9])?$"
+
+# (field path, value pattern, context pattern); the first rule whose patterns match wins.
+FIELD_RULES = [
+    ("Region", REGION_RE, None),
+    ("MachinePools.0.AvailabilityZones", ZONE_RE, None),
+    ("MachineCIDR", CIDR_RE, r"machine"),
+    ("ServiceCIDR", CIDR_RE, r"service"),
+    ("PodCIDR", CIDR_RE, r"\bpod"),
+    ("HostPrefix", r"^/?\d{1,2}$", r"host ?prefix"),
+    ("MachinePools.0.InstanceType", INSTANCE_RE, None),
+    ("MachinePools.0.Name", NAME_RE, r"machine ?pool"),
+    ("MachinePools.0.NodeCount", r"^\d+$", r"node ?count|compute nodes|replicas"),
+    ("ClusterName", NAME_RE, r"cluster ?name|name of the cluster"),
+    ("Description", None, r"description"),
+]
+# CIDRs without a hint are taken in this order.
+CIDR_FIELDS = ["MachineCIDR", "ServiceCIDR", "PodCIDR"]
+
+AWS_REGIONS = {
+    "us-east-1": "US East, N. Virginia",
+    "us-east-2": "US East, Ohio",
+    "us-west-1": "US West, N. California",
+    "us-west-2": "US West, Oregon",
+    "ca-central-1": "Canada, Central",
+    "eu-west-1": "EU, Ireland",
+    "eu-west-2": "EU, London",
+    "eu-west-3": "EU, Paris",
+    "eu-central-1": "EU, Frankfurt",
+    "eu-north-1": "EU, Stockholm",
+    "ap-south-1": "Asia Pacific, Mumbai",
+    "ap-northeast-1": "Asia Pacific, Tokyo",
+    "ap-northeast-2": "Asia Pacific, Seoul",
+    "ap-southeast-1": "Asia Pacific, Singapore",
+    "ap-southeast-2": "Asia Pacific, Sydney",
+    "sa-east-1": "South America, Sao Paulo",
+}
+
+
+def _strip_html(text: str) -> str:
+    return " ".join(html.unescape(re.sub(r"<[^>]+>", " ", text)).split())
+
+
+def _step_text(step) -> str:
+    if isinstance(step, dict):
+        return step.get('step', '') or step.get('description', '') or str(step)
+    return str(step)
+
+
+def extract_inputs_with_context(polarion_steps: List) -> List[Tuple[str, str]]:
+    """
+    Return (value, context) for every quoted value in the steps. The context
+    is the clause before the value and the clause after it, lower-cased.
+    """
+    inputs = []
+    for step in polarion_steps or []:
+        text = _strip_html(_step_text(step))
+        matches = list(re.finditer(r'"([^"]+)"', text))
+        for n, match in enumerate(matches):
+            start = matches[n - 1].end() if n else 0
+            end = matches[n + 1].start() if n + 1 < len(matches) else len(text)
+            before = re.split(r"[,.;]", text[start:match.start()])[-1]
+            after = re.split(r"[,.;]", text[match.end():end])[0]
+            inputs.append((match.group(1).strip(), f"{before} {after}".lower()))
+    return inputs
+
+
+def load_sample_fixtures(directory: str = SAMPLE_FIXTURE_DIR) -> List[Dict]:
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                samples.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error loading sample fixture {path}: {e}")
+    return samples
+
+
+def profile_template(samples: List[Dict]) -> Optional[Dict]:
+    """The first profile of the first sample: {"day1-profile": ..., "day2-profile": ...}."""
+    for sample in samples:
+        for profile in sample.values():
+            if isinstance(profile, dict) and "day1-profile" in profile:
+                return copy.deepcopy(profile)
+    return None
+
+
+def field_paths(node: Any, prefix: str = "") -> List[str]:
+    """Dotted paths of the scalar fields of a profile section (list items by index)."""
+    if isinstance(node, dict):
+        items = node.items()
+    elif isinstance(node, list) and node and isinstance(node[0], dict):
+        items = enumerate(node[:1])
+    else:
+        return [prefix] if prefix else []
+    paths = []
+    for key, value in items:
+        paths += field_paths(value, f"{prefix}.{key}" if prefix else str(key))
+    return paths
+
+
+def _split_path(path: str) -> List:
+    return [int(part) if part.isdigit() else part for part in path.split(".")]
+
+
+def has_path(node: Any, path: str) -> bool:
+    for part in _split_path(path):
+        try:
+            node = node[part]
+        except (KeyError, IndexError, TypeError):
+            return False
+    return True
+
+
+def set_path(node: Any, path: str, value: Any):
+    parts = _split_path(path)
+    for part in parts[:-1]:
+        node = node[part]
+    node[parts[-1]] = value
+
+
+def _field_words(path: str) -> str:
+    """'MachinePools.0.InstanceType' -> 'instance type'."""
+    name = _split_path(path)[-1]
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", str(name)).lower()
+
+
+def match_field(value: str, context: str, paths: List[str], filled: Dict[str, Any]) -> Optional[str]:
+    """Return the profile field a value belongs to, or None if no rule applies."""
+    for path, value_re, context_re in FIELD_RULES:
+        if path not in paths:
+            continue
+        if value_re and not re.match(value_re, value, re.IGNORECASE):
+            continue
+        if context_re and not re.search(context_re, context):
+            continue
+        return path
+    if re.match(CIDR_RE, value):
+        return next((path for path in CIDR_FIELDS if path in paths and path not in filled), None)
+    # A field named right next to the value ("update strategy", "node draining").
+    for path in sorted(paths, key=lambda p: -len(_field_words(p))):
+        words = _field_words(path)
+        if len(words) > 3 and words in context:
+            return path
+    return None
+
+
+def _format_value(path: str, value: str, sample_value: Any) -> Any:
+    if path == "Region" and "," in str(sample_value) and value in AWS_REGIONS:
+        return f"{value}, {AWS_REGIONS[value]}"
+    if path == "HostPrefix" and not value.startswith("/"):
+        return "/" + value
+    return value
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _ask_model(ai_client, unresolved: List[Tuple[str, str]], paths: List[str]) -> Dict[str, str]:
+    """Ask the model to map the values no rule matched; returns {field path: value} for known paths."""
+    lines = "\n".join(f"- {json.dumps(value)} (context: {context.strip()})" for value, context in unresolved)
+    prompt = (
+        "Map each test input value to one field of a cluster test fixture.\n"
+        f"Fields:\n{', '.join(paths)}\n\nValues:\n{lines}\n\n"
+        "Return only a JSON object {\"field\": \"value\"} for the values that clearly belong to a field."
+    )
+    response = ai_client.chat([{"role": "user", "content": prompt}], task="fixture_mapping",
+                              validate=lambda r: isinstance(r, str) and re.search(r"\{.*\}", r, re.DOTALL) is not None)
+    match = re.search(r"\{.*\}", response if isinstance(response, str) else "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        mapping = json.loads(match.group())
+    except ValueError:
+        return {}
+    return {path: str(value) for path, value in mapping.items() if path in paths}
+
+
+def build_fixture(polarion_steps: List, test_case_title: str = "", ai_client=None,
+                  samples: Optional[List[Dict]] = None) -> Optional[Dict]:
+    """
+    Build a fixture from the Polarion steps. Returns {"fixture", "mapped",
+    "unresolved", "used_model"}, or None when there is no sample fixture.
+    """
+    with tracing.span("fixture.build") as span:
+        template = profile_template(samples if samples is not None else load_sample_fixtures())
+        if template is None:
+            return None
+        day1 = template["day1-profile"]
+        paths = field_paths(day1)
+        filled = {}
+        unresolved = []
+        zones = []
+        for value, context in extract_inputs_with_context(polarion_steps):
+            path = match_field(value, context, paths, filled)
+            if path == "MachinePools.0.AvailabilityZones":
+                if value not in zones:
+                    zones.append(value)
+            elif path and path not in filled:
+                filled[path] = value
+            elif not path:
+                unresolved.append((value, context))
+        if unresolved and ai_client is not None:
+            for path, value in _ask_model(ai_client, unresolved, paths).items():
+                filled.setdefault(path, value)
+        for path, value in filled.items():
+            if has_path(day1, path):
+                sample_value = day1
+                for part in _split_path(path):
+                    sample_value = sample_value[part]
+                set_path(day1, path, _format_value(path, value, sample_value))
+        if zones and has_path(day1, "MachinePools.0.AvailabilityZones"):
+            set_path(day1, "MachinePools.0.AvailabilityZones", zones[0] if len(zones) == 1 else zones)
+            if len(zones) > 1:
+                day1["Availability"] = "Multi-zone"
+        if test_case_title:
+            day1["Description"] = filled.get("Description", test_case_title)
+            if "ClusterName" not in filled and "ClusterName" in day1:
+                day1["ClusterName"] = ("cyp-" + _slug(test_case_title))[:54].rstrip("-")
+        if zones:
+            filled["MachinePools.0.AvailabilityZones"] = zones
+        profile_name = _slug(test_case_title)[:60].rstrip("-") or "generated-profile"
+        span.set("fields", len(filled))
+        span.set("unresolved", len(unresolved))
+        return {
+            "fixture": {profile_name: template},
+            "mapped": filled,
+            "unresolved": [value for value, _ in unresolved],
+            "used_model": bool(unresolved and ai_client is not None),
+        }
@@ -1,71 +1,223 @@
 import webbrowser
 import os
+import sys
 import argparse
+import gzip
+import io
 import json
+from html import escape
+from typing import Dict, Iterable, Iterator, TextIO
 
-# --- Main execution ---
-def main():
-    parser = argparse.ArgumentParser(description='Generate an HTML report for failed test cases.')
-    parser.add_argument('--data', type=str, required=True, help='A JSON string of the failed cases data.')
-    args = parser.parse_args()
+# Stacktraces longer than this are collapsed behind a <details> toggle.
+STACKTRACE_PREVIEW_LINES = 5
+READ_CHUNK_SIZE = 64 * 1024
 
-    try:
-        failed_cases = json.loads(args.data)
-    except json.JSONDecodeError:
-        print("Error: Invalid JSON data provided.")
-        return
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ font-family: sans-serif; }}
+  table {{ border-collapse: collapse; width: 100%; }}
+  th, td {{ border: 1px solid #dddddd; text-align: left; padding: 8px; vertical-align: top; }}
+  th {{ background-color: #f2f2f2; }}
+  pre {{ white-space: pre-wrap; word-break: break-word; margin: 0; }}
+  #controls {{ margin-bottom: 12px; }}
+  #controls input {{ width: 300px; }}
+</style>
+</head>
+<body>
 
-    # HTML template
-    html_content = """
-    <html>
-    <head>
-    <title>Test Failure Analysis Report</title>
-    <style>
-      body { font-family: sans-serif; }
-      table { border-collapse: collapse; width: 100%; }
-      th, td { border: 1px solid #dddddd; text-align: left; padding: 8px; }
-      th { background-color: #f2f2f2; }
-    </style>
-    </head>
-    <body>
-
-    <h2>Test Failure Analysis Report</h2>
-
-    <table>
-      <tr>
-        <th>ID</th>
-        <th>Title</th>
-        <th>Error Message</th>
-        <th>Analysis</th>
-      </tr>
-    """
+<h2>{title}</h2>
+
+<div id="controls">
+  <input id="filter" type="search" placeholder="Filter by ID, title, error or analysis">
+  <button id="prev">&laquo; Prev</button>
+  <span id="page-info"></span>
+  <button id="next">Next &raquo;</button>
+</div>
 
-    # Populate the table with data
-    for case in failed_cases:
-        html_content += f"""
-      <tr>
-        <td>{case.get('ID', 'N/A')}</td>
-        <td>{case.get('Title', 'N/A')}</td>
-        <td>{case.get('Error Message', 'N/A')}</td>
-        <td>{case.get('Analysis', 'N/A')}</td>
-      </tr>
+<table>
+  <thead>
+  <tr>
+    <th>ID</th>
+    <th>Title</th>
+    <th>Error Message</th>
+    <th>Stacktrace</th>
+    <th>Analysis</th>
+  </tr>
+  </thead>
+  <tbody id="cases">
+"""
+
+# Rows are all in the DOM; paging only toggles their visibility, so the page
+# stays a single static file that can be written as a stream.
+HTML_FOOTER = """  </tbody>
+</table>
+
+<script>
+(function () {{
+  var pageSize = {page_size};
+  var rows = Array.prototype.slice.call(document.querySelectorAll("#cases tr"));
+  var filtered = rows;
+  var page = 0;
+  function render() {{
+    var pages = Math.max(1, Math.ceil(filtered.length / pageSize));
+    page = Math.min(page, pages - 1);
+    rows.forEach(function (row) {{ row.style.display = "none"; }});
+    filtered.slice(page * pageSize, (page + 1) * pageSize).forEach(function (row) {{ row.style.display = ""; }});
+    document.getElementById("page-info").textContent =
+      "Page " + (page + 1) + " of " + pages + " (" + filtered.length + " of " + rows.length + " cases)";
+  }}
+  document.getElementById("filter").addEventListener("input", function (e) {{
+    var needle = e.target.value.toLowerCase();
+    filtered = rows.filter(function (row) {{ return row.textContent.toLowerCase().indexOf(needle) !== -1; }});
+    page = 0;
+    render();
+  }});
+  document.getElementById("prev").addEventListener("click", function () {{ if (page > 0) {{ page--; render(); }} }});
+  document.getElementById("next").addEventListener("click", function () {{ page++; render(); }});
+  render();
+}})();
+</script>
+
+</body>
+</html>
+"""
+
+
+def open_cases_file(path: str, mode: str = "r") -> TextIO:
+    """
+    Open a JSON or JSON lines cases file as text. Files ending in .gz or .zst
+    are compressed or decompressed on the fly (.zst needs zstandard).
     """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstandard is required for .zst files: pip install zstandard")
+        raw = open(path, mode + "b")
+        if "r" in mode:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
 
-    # Close the HTML tags
-    html_content += """
-    </table>
 
-    </body>
-    </html>
+def iter_json_cases(stream: TextIO) -> Iterator[Dict]:
     """
+    Yield case dicts from a JSON array or JSON lines stream without reading
+    the whole input into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        # JSON lines
+        for line in (buffer + stream.readline()).splitlines() if buffer else []:
+            if line.strip():
+                yield json.loads(line)
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            case, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield case
+        buffer = buffer[end:]
+
+
+def _stacktrace_cell(stacktrace: str) -> str:
+    if not stacktrace:
+        return ""
+    lines = stacktrace.splitlines()
+    if len(lines) <= STACKTRACE_PREVIEW_LINES:
+        return f"<pre>{escape(stacktrace)}</pre>"
+    preview = "\n".join(lines[:STACKTRACE_PREVIEW_LINES])
+    return (f"<details><summary><pre>{escape(preview)}</pre>"
+            f"({len(lines) - STACKTRACE_PREVIEW_LINES} more lines)</summary>"
+            f"<pre>{escape(stacktrace)}</pre></details>")
+
+
+def render_row(case: Dict) -> str:
+    return (
+        "  <tr>"
+        f"<td>{escape(str(case.get('ID', 'N/A')))}</td>"
+        f"<td>{escape(str(case.get('Title', 'N/A')))}</td>"
+        f"<td><pre>{escape(str(case.get('Error Message', 'N/A')))}</pre></td>"
+        f"<td>{_stacktrace_cell(str(case.get('Stacktrace Message') or ''))}</td>"
+        f"<td><pre>{escape(str(case.get('Analysis', 'N/A')))}</pre></td>"
+        "</tr>\n"
+    )
+
+
+def write_report(cases: Iterable[Dict], out: TextIO, title: str = "Test Failure Analysis Report",
+                 page_size: int = 50) -> int:
+    """Write the HTML report row by row and return the number of cases written."""
+    out.write(HTML_HEADER.format(title=escape(title)))
+    count = 0
+    for case in cases:
+        out.write(render_row(case))
+        count += 1
+    out.write(HTML_FOOTER.format(page_size=int(page_size)))
+    return count
+
+
+# --- Main execution ---
+def main():
+    parser = argparse.ArgumentParser(description='Generate an HTML report for failed test cases.')
+    parser.add_argument('input', nargs='?', default='-', help='JSON array or JSON lines file (.gz/.zst too) with the failed cases, "-" for stdin.')
+    parser.add_argument('--data', type=str, help='A JSON string of the failed cases data (small runs only, prefer a file).')
+    parser.add_argument('--output', default='failure_analysis_report.html', help='Path of the HTML report.')
+    parser.add_argument('--title', default='Test Failure Analysis Report', help='Report title.')
+    parser.add_argument('--page-size', type=int, default=50, help='Rows per page in the report.')
+    parser.add_argument('--open', action='store_true', help='Open the report in a web browser when done.')
+    args = parser.parse_args()
+
+    if args.data is not None:
+        try:
+            cases = json.loads(args.data)
+        except json.JSONDecodeError:
+            print("Error: Invalid JSON data provided.")
+            return 1
+        source = None
+    else:
+        source = sys.stdin if args.input == '-' else open_cases_file(args.input)
+        cases = iter_json_cases(source)
 
     # Write the HTML content to a file
-    file_path = "failure_analysis_report.html"
-    with open(file_path, "w") as f:
-        f.write(html_content)
+    try:
+        with open(args.output, "w", encoding="utf-8") as f:
+            count = write_report(cases, f, title=args.title, page_size=args.page_size)
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON data provided: {e}")
+        return 1
+    finally:
+        if source not in (None, sys.stdin):
+            source.close()
+    print(f"Wrote {count} cases to {args.output}")
 
     # Open the HTML file in a web browser
-    webbrowser.open('file://' + os.path.realpath(file_path))
+    if args.open:
+        webbrowser.open('file://' + os.path.realpath(args.output))
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Incremental regeneration of test scripts.
+
+Every generated script and fixture is stored under GENERATION_STORE_DIR with
+a fingerprint of the steps (and code context) it was generated from. When a
+case is generated again:
+
+    same fingerprint          the stored result is returned, no model call
+    a few steps changed       the model gets the previous script and only the
+                              changed steps, answers with a unified diff, and
+                              the diff is applied locally
+    most steps changed, or    full generation, as before
+    the patch doesn't apply
+"""
+import difflib
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from . import tracing
+from .polarion_steps import normalize_steps as normalize_polarion_steps
+
+GENERATION_STORE_DIR = os.getenv("GENERATION_STORE_DIR", "output/generations")
+# Above this share of changed steps a patch costs about as much as a rewrite.
+MAX_CHANGED_RATIO = 0.5
+
+_CODE_BLOCK_RE = re.compile(r"```[a-zA-Z]*\n(.*?)```", re.DOTALL)
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class PatchError(ValueError):
+    pass
+
+
+def normalize_steps(steps) -> List[str]:
+    """Polarion steps (rich text dicts) or a text description as a list of plain step strings."""
+    if isinstance(steps, str):
+        return [line.strip() for line in steps.splitlines() if line.strip()]
+    return [" | ".join(filter(None, [step["step"], step["expectedResult"]])).replace("\n", " ")
+            for step in normalize_polarion_steps(steps)]
+
+
+def fingerprint(steps: List[str], code_file_content: Optional[str] = None, options: Optional[Dict] = None) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps([steps, code_file_content or "", options or {}], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GenerationStore:
+    """One JSON file per case key with the last generated script, fixture and the steps behind them."""
+
+    def __init__(self, directory: str = GENERATION_STORE_DIR):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^\w\-]+", "_", key)[:100] + ".json")
+
+    def load(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading stored generation {path}: {e}")
+            return None
+
+    def save(self, key: str, record: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+def diff_steps(old: List[str], new: List[str]) -> List[Dict]:
+    """The changed step ranges: [{"op", "old": [(n, text)], "new": [(n, text)]}], numbered from 1."""
+    changes = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(a=old, b=new, autojunk=False).get_opcodes():
+        if op == "equal":
+            continue
+        changes.append({
+            "op": op,
+            "old": [(n + 1, old[n]) for n in range(i1, i2)],
+            "new": [(n + 1, new[n]) for n in range(j1, j2)],
+        })
+    return changes
+
+
+def changed_ratio(old: List[str], new: List[str]) -> float:
+    return 1.0 - difflib.SequenceMatcher(a=old, b=new, autojunk=False).ratio()
+
+
+def extract_code(response: str) -> str:
+    """The first fenced code block of a model response, or the whole response."""
+    match = _CODE_BLOCK_RE.search(response or "")
+    return match.group(1) if match else (response or "")
+
+
+def replace_code(response: str, code: str) -> str:
+    """Put new code into the first fenced block of a stored response, keeping the text around it."""
+    match = _CODE_BLOCK_RE.search(response or "")
+    if not match:
+        return code
+    return response[:match.start(1)] + code + response[match.end(1):]
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+    Apply a unified diff to a text. Hunks are located by their context, so
+    wrong line numbers in the header are tolerated. Raises PatchError when a
+    hunk's context is not found.
+    """
+    lines = original.split("\n")
+    hunks = []
+    current = None
+    for line in diff.split("\n"):
+        header = _HUNK_RE.match(line)
+        if header:
+            current = {"start": int(header.group(1)) - 1, "old": [], "new": []}
+            hunks.append(current)
+        elif current is None or line.startswith(("---", "+++", "\\")):
+            continue
+        elif line.startswith("-"):
+            current["old"].append(line[1:])
+        elif line.startswith("+"):
+            current["new"].append(line[1:])
+        else:
+            # Context line; models often drop the leading space on blank lines.
+            current["old"].append(line[1:] if line.startswith(" ") else line)
+            current["new"].append(line[1:] if line.startswith(" ") else line)
+    if not hunks:
+        raise PatchError("no hunks in the patch")
+    offset = 0
+    for hunk in hunks:
+        old = hunk["old"]
+        while old and not old[-1].strip() and hunk["new"] and not hunk["new"][-1].strip():
+            old, hunk["new"] = old[:-1], hunk["new"][:-1]
+        position = _find_block(lines, old, hunk["start"] + offset)
+        if position is None:
+            raise PatchError(f"hunk at line {hunk['start'] + 1} does not match the script")
+        lines[position:position + len(old)] = hunk["new"]
+        offset += len(hunk["new"]) - len(old)
+    return "\n".join(lines)
+
+
+def _find_block(lines: List[str], block: List[str], expected: int) -> Optional[int]:
+    if not block:
+        return min(max(expected, 0), len(lines))
+    wanted = [line.rstrip() for line in block]
+    candidates = [n for n in range(len(lines) - len(block) + 1)
+                  if [line.rstrip() for line in lines[n:n + len(block)]] == wanted]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda n: abs(n - expected))
+
+
+def _applies(code: str, response) -> bool:
+    try:
+        apply_unified_diff(code, extract_code(response if isinstance(response, str) else ""))
+        return True
+    except PatchError:
+        return False
+
+
+def _patch_prompt(previous_code: str, changes: List[Dict]) -> str:
+    described = []
+    for change in changes:
+        if change["old"]:
+            described += [f"- old step {n}: {text}" for n, text in change["old"]]
+        if change["new"]:
+            described += [f"+ new step {n}: {text}" for n, text in change["new"]]
+    return f"""The test steps of a test case changed. Update the existing test script to match the new steps.
+
+### Changed steps
+{chr(10).join(described)}
+
+### Existing test script
+```
+{previous_code}
+```
+
+### Output
+- Return only a unified diff of the test script inside a ```diff code block.
+- Use @@ hunk headers with three lines of unchanged context around every change.
+- Do not repeat unchanged parts of the script.
+"""
+
+
+def generate_or_update(ai_client, key: str, steps, generate_full: Callable[[], Dict],
+                       generate_fixture: Optional[Callable[[], str]] = None, code_file_content: Optional[str] = None,
+                       options: Optional[Dict] = None, store: Optional[GenerationStore] = None,
+                       force: bool = False) -> Dict:
+    """
+    Return {"test_script", "fixture_content", "mode", "fingerprint"} for a case,
+    where mode is "cached", "patched" or "full" and fingerprint is the hash of
+    the inputs. generate_full() runs the full generation;
+    generate_fixture() rebuilds the fixture after a patch (the previous fixture
+    is kept without it). force skips the stored result and the patch and
+    always generates from scratch, for an explicit re-generate.
+    """
+    store = store or GenerationStore()
+    new_steps = normalize_steps(steps)
+    new_fingerprint = fingerprint(new_steps, code_file_content, options)
+    previous = store.load(key)
+    result = None
+    if force:
+        previous = None
+    if previous and previous.get("fingerprint") == new_fingerprint:
+        return {"test_script": previous["test_script"], "fixture_content": previous["fixture_content"],
+                "mode": "cached", "fingerprint": new_fingerprint}
+    same_context = previous and previous.get("context") == fingerprint([], code_file_content, options)
+    if same_context and changed_ratio(previous["steps"], new_steps) <= MAX_CHANGED_RATIO:
+        with tracing.span("generation.patch", key=key) as span:
+            changes = diff_steps(previous["steps"], new_steps)
+            span.set("changed_steps", sum(max(len(c["old"]), len(c["new"])) for c in changes))
+            previous_code = extract_code(previous["test_script"])
+            # One patch attempt on the patch tier: a patch that doesn't apply goes
+            # straight to the full generation instead of being retried on the strong model.
+            try:
+                response = ai_client.chat([{"role": "user", "content": _patch_prompt(previous_code, changes)}],
+                                          task="patch_test_script", validate=lambda r: _applies(previous_code, r),
+                                          escalate=False)
+                code = apply_unified_diff(previous_code, extract_code(response if isinstance(response, str) else ""))
+            except Exception as e:
+                print(f"Patch for {key} failed, regenerating the whole script: {e}")
+                span.set("failed", 1)
+            else:
+                result = {
+                    "test_script": replace_code(previous["test_script"], code),
+                    "fixture_content": generate_fixture() if generate_fixture else previous["fixture_content"],
+                    "mode": "patched",
+                }
+    if result is None:
+        generated = generate_full()
+        result = {"test_script": generated["test_script"], "fixture_content": generated["fixture_content"], "mode": "full"}
+    store.save(key, {
+        "key": key,
+        "fingerprint": new_fingerprint,
+        "context": fingerprint([], code_file_content, options),
+        "steps": new_steps,
+        "test_script": result["test_script"],
+        "fixture_content": result["fixture_content"],
+        "mode": result["mode"],
+        "updated": time.time(),
+    })
+    result["fingerprint"] = new_fingerprint
+    return result
@@ -1,7 +1,27 @@
+import os
 import re
+from html import unescape
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from bs4 import BeautifulSoup
 
+try:
+    from . import parse_pool, tracing
+except ImportError:
+    import parse_pool
+    import tracing
+
+# "stream" scans pages for just the elements we extract (failure-summary divs,
+# -error/-stacktrace <pre> blocks) and reads their attributes directly; "bs4"
+# builds the full BeautifulSoup tree like older versions did.
+PARSER_BACKEND = os.getenv("JENKINS_HTML_PARSER", "stream")
+# Case pages downloaded at the same time for one build.
+FETCH_WORKERS = int(os.getenv("JENKINS_FETCH_WORKERS") or 8)
+# (connect, read) timeouts in seconds for every Jenkins request, so a stalled
+# server fails the fetch instead of holding a worker forever.
+REQUEST_TIMEOUT = (float(os.getenv("JENKINS_CONNECT_TIMEOUT") or 10), float(os.getenv("JENKINS_READ_TIMEOUT") or 60))
+
 
 def fetch_webpage(url):
     """
@@ -11,117 +31,318 @@ def fetch_webpage(url):
     :return: The content of the webpage as a string.
     """
     try:
-        # Send a GET request to the specified URL
-        response = requests.get(url, verify=False)
-        # Check if the request was successful (status code 200)
-        response.raise_for_status()
-        # Get the content of the webpage
-        webpage_content = response.text
+        with tracing.span("jenkins.fetch", url=url) as span:
+            # Send a GET request to the specified URL
+            response = requests.get(url, verify=False, timeout=REQUEST_TIMEOUT)
+            span.set("bytes", len(response.content))
+            # Check if the request was successful (status code 200)
+            response.raise_for_status()
+            # Get the content of the webpage
+            webpage_content = response.text
         return webpage_content
     except requests.RequestException as e:
         print(f"Error fetching the webpage: {e}")
         return None
 
 
+def fetch_page_bytes(url):
+    """
+    Fetch a page as raw bytes, for handing to the parse pool without decoding
+    it in this process.
+
+    :param url: The URL of the webpage to fetch.
+    :return: The raw content of the webpage, or None on error.
+    """
+    try:
+        with tracing.span("jenkins.fetch", url=url) as span:
+            response = requests.get(url, verify=False, timeout=REQUEST_TIMEOUT)
+            span.set("bytes", len(response.content))
+            response.raise_for_status()
+            return response.content
+    except requests.RequestException as e:
+        print(f"Error fetching the webpage: {e}")
+        return None
+
+
+def fetch_json(url, params=None):
+    """
+    Fetch a Jenkins JSON API document.
+
+    :param url: The URL of the api/json endpoint.
+    :return: The decoded JSON document, or None on error.
+    """
+    try:
+        with tracing.span("jenkins.fetch", url=url) as span:
+            response = requests.get(url, params=params, verify=False, timeout=REQUEST_TIMEOUT)
+            span.set("bytes", len(response.content))
+            response.raise_for_status()
+            return response.json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching the json document: {e}")
+        return None
+
+
+def test_report_exists(url):
+    """
+    False only when Jenkins answers 404 for the build's test report, i.e. no
+    JUnit results were published (the build crashed before that step).
+    """
+    report_url = get_report_url(url).rstrip("/") + "/testReport/api/json"
+    try:
+        with tracing.span("jenkins.fetch", url=report_url):
+            response = requests.get(report_url, params={"tree": "failCount"}, verify=False, timeout=REQUEST_TIMEOUT)
+        return response.status_code != 404
+    except requests.RequestException as e:
+        print(f"Error checking the test report: {e}")
+        return True
+
+
 def parse_webpage(content):
     soup = BeautifulSoup(content, "html.parser")
     return soup
 
 
-def get_error_message(url):
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+_FAILURE_SUMMARY_TAG_RE = re.compile(r"<div\b[^>]*failure-summary[^>]*>", re.IGNORECASE)
+_PRE_RE = re.compile(r"<pre\b([^>]*)>(.*?)</pre\s*>", re.IGNORECASE | re.DOTALL)
+_ATTR_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _tag_attributes(tag_text):
+    return {
+        m.group(1).lower(): unescape(m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4))
+        for m in _ATTR_RE.finditer(tag_text)
+    }
+
+
+def _text_content(fragment):
+    """Same result as BeautifulSoup's get_text(strip=True) on a fragment without nested markup structure."""
+    return "".join(unescape(piece).strip() for piece in _TAG_RE.split(fragment))
+
+
+class _DivBodyParser(HTMLParser):
+    """Reads the body of one div, stopping at its closing tag, to look for a keyword."""
+
+    def __init__(self, keyword):
+        super().__init__(convert_charrefs=True)
+        self.keyword = keyword
+        self.found = False
+        self.done = False
+        self._depth = 1
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            self._depth -= 1
+            self.done = self._depth == 0
+
+    def handle_data(self, data):
+        if not self.done and self.keyword in data:
+            self.found = True
+            self.done = True
+
+
+def _div_body_contains(content, start, keyword, chunk_size=8192):
+    parser = _DivBodyParser(keyword)
+    while not parser.done and start < len(content):
+        parser.feed(content[start:start + chunk_size])
+        start += chunk_size
+    return parser.found
+
+
+def _parse_failed_case_ids_bs4(content):
+    soup = parse_webpage(content)
+    title = soup.title.string if soup.title else None
+    ids = [
+        div.get("id") for div in soup.find_all("div", class_="failure-summary")
+        if div.get("id") and "RHACM4K" in str(div)
+    ]
+    return title, ids
+
+
+def _parse_failed_case_ids_stream(content):
+    title_match = _TITLE_RE.search(content)
+    title = unescape(title_match.group(1)).strip() if title_match else None
+    ids = []
+    for match in _FAILURE_SUMMARY_TAG_RE.finditer(content):
+        attrs = _tag_attributes(match.group(0))
+        div_id = attrs.get("id")
+        if not div_id or "failure-summary" not in (attrs.get("class") or "").split():
+            continue
+        # The id of a case div carries the case path, so the body rarely needs reading.
+        if "RHACM4K" in div_id or _div_body_contains(content, match.end(), "RHACM4K"):
+            ids.append(div_id)
+    return title, ids
+
+
+def _parse_case_page_bs4(content):
+    error_soup = parse_webpage(content)
+    error_text = None
+    stack_text = None
+    for pre_tag in error_soup.find_all("pre", style="display: ", id=lambda x: x and "-error" in x):
+        error_text = pre_tag.get_text(strip=True)
+    for pre_tag in error_soup.find_all("pre", id=lambda x: x and "-stacktrace" in x):
+        stack_text = pre_tag.get_text(strip=True)
+    return error_text, stack_text
+
+
+def _parse_case_page_stream(content):
+    error_text = None
+    stack_text = None
+    for match in _PRE_RE.finditer(content):
+        attrs = _tag_attributes(match.group(1))
+        pre_id = attrs.get("id") or ""
+        if "-error" in pre_id and attrs.get("style") == "display: ":
+            error_text = _text_content(match.group(2))
+        elif "-stacktrace" in pre_id:
+            stack_text = _text_content(match.group(2))
+    return error_text, stack_text
+
+
+def get_report_url(url):
+    """Return the build URL (up to the build number) for any URL inside a Jenkins build."""
+    return re.match(r"(.*?/\d+)(?:/|$)", url).group(0)
+
+
+def parse_failed_case_ids(content):
+    """
+    Parse a testReport page and return the ids of the failure-summary divs
+    that belong to RHACM4K cases.
+    """
+    with tracing.span("jenkins.parse", page="testReport", bytes=len(content), backend=PARSER_BACKEND):
+        if PARSER_BACKEND == "bs4":
+            title, ids = _parse_failed_case_ids_bs4(content)
+        else:
+            title, ids = _parse_failed_case_ids_stream(content)
+        print(f"Title of the webpage: {title or 'No title found'}")
+        return ids
+
+
+def get_case_summary_url(real_url, id_):
+    """Return (case path, summary page URL) for a failure-summary div id."""
+    real_id = re.sub(r"^test-", "", id_)
+    real_id_con = real_id.replace("&amp;quot;", '"').replace("&quot;", '"')
+    return real_id_con, real_url + "/testReport/" + real_id_con + "/summary"
+
+
+def parse_case_page(content):
+    """
+    Parse a case summary page and return (error_text, stacktrace_text).
+    Either value is None when the page has no such element.
+    """
+    with tracing.span("jenkins.parse", page="summary", bytes=len(content), backend=PARSER_BACKEND):
+        if PARSER_BACKEND == "bs4":
+            return _parse_case_page_bs4(content)
+        return _parse_case_page_stream(content)
+
+
+def build_case_record(real_id_con, error_text, stack_text):
+    """Turn a parsed case page into a failed case record, or None if it is not a RHACM4K case."""
+    match = re.search(r"RHACM4K_\d+", real_id_con)
+    if not match or (error_text is None and stack_text is None):
+        return None
+    real_id = match.group()
+    case_id = re.sub(r"_", "-", real_id)
+    index = real_id_con.find(real_id)
+    substring = real_id_con[index + len(real_id):]
+    substring = substring[substring.find("__", substring.find("__") + 2) + 2:]
+    substring = substring.replace("_", " ").replace("/", " ")
+    title = " ".join(substring.split())
+    return {
+        "ID": case_id,
+        "Title": title,
+        "Error Message": error_text or "",
+        "Stacktrace Message": stack_text or ""
+    }
+
+
+def parse_case_page_bytes(item):
+    """
+    Parse-pool worker: take (case path, raw page bytes) and return the compact
+    (case path, error_text, stacktrace_text) tuple.
+    """
+    real_id_con, content = item
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    return (real_id_con, *parse_case_page(content))
+
+
+def parse_case_pages(pages):
+    """Parse [(case path, raw page bytes)] in the parse pool."""
+    with tracing.span("jenkins.parse_pool", pages=len(pages)):
+        return parse_pool.parse_map(parse_case_page_bytes, pages)
+
+
+def collect_case_records(pages):
+    """
+    Build the failed case records from (case path, error_text, stacktrace_text)
+    tuples, keeping one record per case path in first-seen order.
+    """
+    error_dict = {}
+    for real_id_con, error_text, stack_text in pages:
+        record = build_case_record(real_id_con, error_text, stack_text)
+        if record:
+            error_dict[real_id_con] = record
+    final_results = list(error_dict.values())
+    for record in final_results:
+        print(f"ID: {record['ID']}\nTitle: {record['Title']}\nError Message: \n{record['Error Message']}\nStacktrace Message: \n{record['Stacktrace Message']}\n")
+    return final_results
+
+
+def get_error_message(url, fetch_workers=None):
     """
     Retrieves error messages from a given URL and extracts case IDs along with their corresponding error messages.
 
+    Case pages are downloaded concurrently and parsed in the parse pool.
+
     Args:
         url (str): The URL of the webpage from which to fetch and extract error messages.
+        fetch_workers (int): How many case pages to download at the same time.
 
     Returns:
-        list: A list of tuples containing case IDs and their associated error messages.
-              Each tuple is in the format (error_id, error_text).
+        list: A list of dicts with the keys "ID", "Title", "Error Message" and "Stacktrace Message".
     """
 
+    final_results = []
     # Fetch the webpage content
-    real_url = re.match(r"(.*?/\d+)(?:/|$)", url).group(0)
+    real_url = get_report_url(url)
     webpage_content = fetch_webpage(real_url+"/testReport/")
     if webpage_content:
-        # Parse the webpage content
-        soup = parse_webpage(webpage_content)
-        # Example: Print the title of the webpage
-        title = soup.title.string if soup.title else "No title found"
-        print(f"Title of the webpage: {title}")
-        # Search all hidden contents
-        hidden_content = soup.find_all("div", class_="failure-summary")
-        contains_text = [div for div in hidden_content if "RHACM4K" in str(div)]
-        results = []
-        matching_ids = [
-            re.search(r'id="([^"]+)"', str(div)).group(1) for div in contains_text
-        ]
+        matching_ids = parse_failed_case_ids(webpage_content)
         # Find all hidden link contents
-        error_dict = {}
-        for id_ in matching_ids:
-            real_id = re.sub(r"^test-", "", id_)
-            real_id_con = real_id.replace("&amp;quot;", '"')
-            error_msg_url = real_url + "/testReport/" + real_id_con + "/summary"
-            error_content = fetch_webpage(error_msg_url)
-            if error_content:
-                error_soup = parse_webpage(error_content)
-                error_elements = error_soup.find_all(
-                    "pre", style="display: ", id=lambda x: x and "-error" in x
-                )
-                if error_elements:
-                    for pre_tag in error_elements:
-                        error_text = pre_tag.get_text(strip=True)
-                        pattern = r"RHACM4K_\d+"
-                        match = re.search(pattern, real_id)
-                        if match:
-                            key = (match.group(), real_id_con)
-                            if key not in error_dict:
-                               error_dict[key] = {"error_text": "", "stacktrace_text": ""}
-                            error_dict[key]["error_text"] = error_text
-                 
-               
-                stacktrace_elements = error_soup.find_all(
-                        "pre", id=lambda x: x and "-stacktrace" in x
-                    )
-                if stacktrace_elements:
-                    for pre_tag in stacktrace_elements:
-                        stack_text = pre_tag.get_text(strip=True)
-                        pattern = r"RHACM4K_\d+"
-                        match = re.search(pattern, real_id)
-                        if match:
-                            key = (match.group(), real_id_con)
-                            if key not in error_dict:
-                               error_dict[key] = {"error_text": "", "stacktrace_text": ""}
-                            error_dict[key]["stacktrace_text"] = stack_text
-        # print and return results
-        final_results = []
-        #for item in results:
-        #  if len(item) == 4:
-        #    real_id, error_text, stack_text, real_id_con=item
-        #  elif len(item) == 3:
-        #    real_id, error_text, real_id_con=item
-        #    stack_text = ""
-        #  else:
-        #    continue
-        for (real_id, real_id_con), texts in error_dict.items():  
-          case_id = re.sub(r"_", "-", real_id)
-          index = real_id_con.find(real_id) 
-          substring = real_id_con[index + len(real_id):] 
-          substring=substring[substring.find("__", substring.find("__") + 2) + 2:]
-          substring = substring.replace("_", " ").replace("/", " ")
-          title =  " ".join(substring.split())
-          error_text = texts.get("error_text", "")
-          stack_text = texts.get("stacktrace_text", "")
-          final_results.append({
-            "ID": case_id,
-            "Title": title,
-            "Error Message": error_text,
-            "Stacktrace Message": stack_text
-        })
-          print(f"ID: {case_id}\nTitle: {title}\nError Message: \n{error_text}\nStacktrace Message: \n{stack_text}\n")
+        targets = [get_case_summary_url(real_url, id_) for id_ in matching_ids]
+        if not targets:
+            return final_results
+        with ThreadPoolExecutor(max_workers=min(fetch_workers or FETCH_WORKERS, len(targets))) as pool:
+            contents = list(pool.map(tracing.bind(fetch_page_bytes), [summary_url for _, summary_url in targets]))
+        pages = [(real_id_con, content) for (real_id_con, _), content in zip(targets, contents) if content]
+        final_results = collect_case_records(parse_case_pages(pages))
     return final_results
 
 
+REPORT_JSON_TREE = "suites[cases[className,name,status,errorDetails,errorStackTrace]]"
+
+
+def get_error_message_from_json(url):
+    """
+    Same records as get_error_message, read from the testReport JSON API in
+    a single request instead of one page per failed case.
+    """
+    data = fetch_json(get_report_url(url).rstrip("/") + "/testReport/api/json", params={"tree": REPORT_JSON_TREE})
+    if not data:
+        return []
+    pages = [
+        (f"{case.get('className', '')}/{case.get('name', '')}", case.get("errorDetails"), case.get("errorStackTrace"))
+        for suite in data.get("suites") or []
+        for case in suite.get("cases") or []
+        if case.get("status") in ("FAILED", "REGRESSION")
+    ]
+    return collect_case_records(pages)
+
 
 if __name__ == "__main__":
    url = "https://jenkins-csb-rhacm-tests.dno.corp.redhat.com/job/qe-acm-automation-poc/job/grc-e2e-test-execution/2737/console"
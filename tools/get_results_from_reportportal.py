@@ -1,8 +1,23 @@
+import json
 import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import certifi
 from dotenv import load_dotenv
 import requests
+
+try:
+    from . import tracing
+    from .generate_failed_case_report import open_cases_file
+    from .stacktrace import compact_case
+except ImportError:
+    import tracing
+    from generate_failed_case_report import open_cases_file
+    from stacktrace import compact_case
+
 load_dotenv()
 
 #LOG_FORMAT = '%(asctime)s | %(levelname)7s | %(name)s | line:%(lineno)4s | %(message)s)'
@@ -30,97 +45,263 @@ except Exception:
         outfile.write(customca)
        logging.info('That might have worked.')
 
-def get_launch_id_by_name(launch):
-    url = f"{base_url}/api/v1/{project}/launch"
-    page = 1
-    page_size = 50
+LAUNCH_PAGE_SIZE = 300
+# Pages read when the launch index is filled for the first time (newest launches first).
+LAUNCH_SYNC_MAX_PAGES = int(os.getenv("RP_LAUNCH_SYNC_PAGES") or 10)
+# Seconds between two syncs triggered by unknown launches; misses in between are queried directly.
+LAUNCH_SYNC_INTERVAL = float(os.getenv("RP_LAUNCH_SYNC_INTERVAL") or 60)
 
-    if '#' in launch:
-       launch_name, launch_number = launch.rsplit('#', 1)
-       launch_name = launch_name.strip()
-       launch_number = int(launch_number.strip())
-    else:
-      raise ValueError("launch format is 'name #number'")
 
+def iter_pages(url, params, page_size=100):
+    """Yield the content of every page of a ReportPortal listing, one page at a time."""
+    page = 1
     while True:
-        params = {
-            "filter.eq.name": launch_name,
-            "filter.eq.number": launch_number,
-            "page.page": page,
-            "page.size": page_size
-        }
-        response = requests.get(url, headers=headers, params=params)
-        data = response.json()
-
-        launches = data.get('content', [])
-        for launch in launches:
-            return launch['id']
-
-        if data['page']['number'] + 1 >= data['page']['totalPages']:
+        with tracing.span("reportportal.fetch", url=url) as span:
+            response = requests.get(url, headers=headers, params={**params, "page.page": page, "page.size": page_size})
+            span.set("bytes", len(response.content))
+            data = response.json()
+        content = data.get('content', [])
+        yield content
+        # ReportPortal pages are 1-based: the last page has number == totalPages.
+        info = data.get('page') or {}
+        if not content or info.get('number', page) >= info.get('totalPages', 0):
             break
         page += 1
 
-    print(f"Launch is not found: {launch}")
+
+def parse_launch(launch):
+    """Split 'name #number' into (name, number)."""
+    if '#' not in launch:
+        raise ValueError("launch format is 'name #number'")
+    launch_name, launch_number = launch.rsplit('#', 1)
+    return launch_name.strip(), int(launch_number.strip())
+
+
+def launch_key(name, number):
+    return f"{name} #{number}"
+
+
+def query_launch_id(launch_name, launch_number):
+    """Look a single launch up by name and number. Returns None if it does not exist."""
+    url = f"{base_url}/api/v1/{project}/launch"
+    params = {"filter.eq.name": launch_name, "filter.eq.number": launch_number}
+    for launches in iter_pages(url, params, page_size=1):
+        for launch in launches:
+            return launch['id']
     return None
 
+
+class LaunchIndex:
+    """
+    Local 'name #number' -> launch id index. It is filled from bulk launch
+    listings (newest first) and synced incrementally: a sync stops at the
+    first page whose launches are all known. Known launches resolve without
+    a network call. Persisted as JSON when a path is given.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.ids = {}
+        self.lock = threading.Lock()
+        self.synced_at = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.ids = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading launch index {path}: {e}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, launch):
+        return self.ids.get(launch_key(*parse_launch(launch)))
+
+    def add(self, name, number, launch_id):
+        with self.lock:
+            self.ids[launch_key(name, number)] = launch_id
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.ids, f)
+            os.replace(self.path + ".tmp", self.path)
+
+    def sync(self, max_pages=LAUNCH_SYNC_MAX_PAGES):
+        """Add launches newer than the ones already indexed. Returns the number added."""
+        url = f"{base_url}/api/v1/{project}/launch"
+        with self.lock:
+            known = set(self.ids.values())
+            self.synced_at = time.monotonic()
+        added = 0
+        for pages, launches in enumerate(iter_pages(url, {"page.sort": "startTime,DESC"}, LAUNCH_PAGE_SIZE), 1):
+            new = [launch for launch in launches if launch['id'] not in known]
+            for launch in new:
+                self.add(launch['name'], launch['number'], launch['id'])
+            added += len(new)
+            if not new or pages >= max_pages:
+                break
+        if added:
+            self.save()
+        return added
+
+    def resolve(self, launches):
+        """
+        Resolve many 'name #number' launches at once: {launch: id or None}.
+        Misses trigger one incremental sync (at most one per
+        LAUNCH_SYNC_INTERVAL), then a direct query for each launch the sync
+        did not find.
+        """
+        keys = {launch: launch_key(*parse_launch(launch)) for launch in launches}
+        if any(key not in self.ids for key in keys.values()):
+            with self.lock:
+                due = self.synced_at is None or time.monotonic() - self.synced_at >= LAUNCH_SYNC_INTERVAL
+                if due:
+                    # Claim the sync so concurrent resolves don't start one too.
+                    self.synced_at = time.monotonic()
+            if due:
+                self.sync()
+        missing = sorted({key for key in keys.values() if key not in self.ids})
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+                found = list(pool.map(tracing.bind(lambda key: query_launch_id(*parse_launch(key))), missing))
+            for key, launch_id in zip(missing, found):
+                if launch_id is not None:
+                    self.add(*parse_launch(key), launch_id)
+            self.save()
+        return {launch: self.ids.get(key) for launch, key in keys.items()}
+
+
+launch_index = LaunchIndex(os.getenv("RP_LAUNCH_INDEX", "output/rp_launch_index.json"))
+
+
+def get_launch_id_by_name(launch):
+    launch_id = launch_index.get(launch)
+    if launch_id is None:
+        launch_id = launch_index.resolve([launch])[launch]
+    if launch_id is None:
+        print(f"Launch is not found: {launch}")
+    return launch_id
+
+
+def resolve_launch_ids(launches):
+    """Batch form of get_launch_id_by_name: {launch: id or None}."""
+    return launch_index.resolve(launches)
+
+
+def get_launch(launch_id):
+    """Return the launch document ({"id", "name", "number", ...}) or None."""
+    url = f"{base_url}/api/v1/{project}/launch/{launch_id}"
+    with tracing.span("reportportal.fetch", url=url) as span:
+        response = requests.get(url, headers=headers)
+        span.set("bytes", len(response.content))
+    if response.status_code != 200:
+        print(f"Launch is not found: {launch_id}")
+        return None
+    launch = response.json()
+    launch_index.add(launch['name'], launch['number'], launch['id'])
+    return launch
+
+
+def failed_items_params(launch_id):
+    return {
+        "filter.eq.launchId": launch_id,
+        "filter.eq.hasChildren": "false",
+        "filter.eq.status": "FAILED",
+    }
+
+
 def get_failed_test_items(launch_id):
     url = f"{base_url}/api/v1/{project}/item"
-    page = 1
-    page_size = 100
     failed_items = []
-
-    while True:
-        params = {
-            "filter.eq.launchId": launch_id,
-            "filter.eq.hasChildren": "false",
-            "filter.eq.status": "FAILED",
-            "page.page": page,
-            "page.size": page_size
-        }
-        response = requests.get(url, headers=headers, params=params)
-        data = response.json()
-        items = data.get('content', [])
+    for items in iter_pages(url, failed_items_params(launch_id)):
         for item in items:
-             failed_items.append({
+            failed_items.append({
                 "id": item["id"],
                 "name": item["name"],
             })
-        if data['page']['number'] + 1 >= data['page']['totalPages']:
-            break
-        page += 1
-
     return failed_items
 
 
 def get_logs_for_test_item(item_id):
     url = f"{base_url}/api/v1/{project}/log"
+    params = {
+        "filter.eq.item": item_id,
+        "filter.eq.level": "ERROR",
+    }
     logs = []
-    page = 1
-    page_size = 100
-    while True:
-        params = {
-            "filter.eq.item": item_id,
-            "filter.eq.level": "ERROR",
-            "page.page": page,
-            "page.size": page_size
-        }
-        response = requests.get(url, headers=headers, params=params)
-        data = response.json()
-        entries = data.get('content', [])
-
+    for entries in iter_pages(url, params):
         for entry in entries:
             logs.append({
                 "time": entry['time'],
                 "level": entry['level'],
                 "message": entry['message']
             })
-        if data['page']['number'] + 1 >= data['page']['totalPages']:
-            break
-        page += 1
-
     return logs
 
 
+def build_case_record(item, logs):
+    """Normalize a failed test item and its ERROR logs into the failed case record used by the analysis."""
+    match = re.search(r"RHACM4K[-_]\d+", item["name"])
+    messages = [line["message"] for line in logs]
+    return {
+        "ID": match.group().replace("_", "-") if match else str(item["id"]),
+        "Title": item["name"],
+        "Error Message": messages[0] if messages else "",
+        "Stacktrace Message": "\n".join(messages[1:])
+    }
+
+
+def iter_failed_cases(launch_id, log_workers=8):
+    """
+    Yield the failed case record of every failed item of a launch, one page
+    of items at a time. The logs of a page are fetched concurrently, so only
+    one page of items and their logs is held in memory.
+    """
+    url = f"{base_url}/api/v1/{project}/item"
+    with ThreadPoolExecutor(max_workers=log_workers) as pool:
+        for items in iter_pages(url, failed_items_params(launch_id)):
+            logs = pool.map(tracing.bind(lambda item: get_logs_for_test_item(item["id"])), items)
+            for item, item_logs in zip(items, logs):
+                yield build_case_record(item, item_logs)
+
+
+def get_failed_cases_from_launch(launch):
+    """Return the failed case records of a launch given as 'name #number'."""
+    launch_id = get_launch_id_by_name(launch)
+    if launch_id is None:
+        return []
+    return list(iter_failed_cases(launch_id))
+
+
+def export_failed_cases(launch, path, log_workers=8, compact=True):
+    """
+    Stream the failed cases of a launch to a JSON lines file (.gz/.zst to
+    compress) as the pages arrive. Each line is a failed case record, the same
+    shape as get_error_message returns, plus the launch. Stack traces are
+    compacted unless compact is False. Returns the count.
+    """
+    component = launch.rsplit("#", 1)[0].strip().split("-")[0]
+    launch_id = get_launch_id_by_name(launch)
+    if launch_id is None:
+        return 0
+    count = 0
+    with tracing.span("file.write", task="reportportal_export") as span:
+        with open_cases_file(path, "w") as f:
+            for record in iter_failed_cases(launch_id, log_workers):
+                if compact:
+                    record = compact_case(record, component)
+                record["Launch"] = launch
+                f.write(json.dumps(record) + "\n")
+                count += 1
+        span.set("bytes", os.path.getsize(path))
+    return count
+
+
 def main(launch):
     launch_id=get_launch_id_by_name(launch)
     failed_items=get_failed_test_items(launch_id)
@@ -146,6 +327,13 @@ import argparse
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Get failed test cases from Report Portal.')
     parser.add_argument('launch')
+    parser.add_argument('--export', help='Write the failed cases to this JSON lines file (.gz/.zst to compress) instead of printing them')
+    parser.add_argument('--log-workers', type=int, default=8, help='Items whose logs are fetched at the same time')
+    parser.add_argument('--raw', action='store_true', help='Export the full stack traces instead of compacted ones')
     args = parser.parse_args()
-    main(args.launch)
+    if args.export:
+        count = export_failed_cases(args.launch, args.export, args.log_workers, compact=not args.raw)
+        print(f"Exported {count} failed cases to {args.export}")
+    else:
+        main(args.launch)
     
\ No newline at end of file
@@ -4,6 +4,11 @@ from polarion import polarion
 from polarion.record import Record
 import logging
 
+try:
+    from . import tracing
+except ImportError:
+    import tracing
+
 LOG_FORMAT = '%(asctime)s | %(levelname)7s | %(name)s | line:%(lineno)4s | %(message)s)'
 logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
 
@@ -75,14 +80,15 @@ def get_test_case_by_id(polarion_client, project_id, case_id):
     case_id: test case ID (ex: RHACM4K-xxx)
     return: tuple: (test_case, test_steps)
     """
-    project = polarion_client.getProject(project_id)
-    target_case=project.getWorkitem(case_id)
-    
-    if not target_case:
-        print(f"Not find the test case {case_id}")
-        return None, []
-    test_steps = target_case.getTestSteps()
-    test_component = target_case.getCustomField('casecomponent')
+    with tracing.span("polarion.fetch", case_id=case_id):
+        project = polarion_client.getProject(project_id)
+        target_case=project.getWorkitem(case_id)
+        
+        if not target_case:
+            print(f"Not find the test case {case_id}")
+            return None, [], None
+        test_steps = target_case.getTestSteps()
+        test_component = target_case.getCustomField('casecomponent')
     print(f"Test case: \n{target_case.title}")
     print(f"\nTest steps: \n{test_steps}")
     print(f"\nTest component: \n{test_component}")
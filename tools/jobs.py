@@ -0,0 +1,160 @@
+"""
+Background jobs for long analyses and generations.
+
+JobManager runs functions on a thread pool and keeps their state, so the
+Streamlit script thread only submits work and polls it; a job outlives the
+rerun (and the browser tab) that started it. The function gets the Job as
+its first argument to report progress and to stop early:
+
+    def work(job, url):
+        job.update(0.1, "Collecting failed cases")
+        ...
+        job.check_cancelled()          # raises JobCancelled once cancel() was called
+        return result
+
+    job_id = manager.submit("analysis", work, url)
+    manager.get(job_id).status         # queued, running, done, failed, cancelled
+
+Jobs submitted with the same key while one is still unfinished share that
+job (two pipelines asking for the same build get one triage). With
+max_pending, submit() raises JobQueueFull once that many jobs are waiting
+or running, so callers can push back instead of queueing without bound.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from . import tracing
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS") or 4)
+# Finished jobs kept for polling, oldest dropped first.
+MAX_FINISHED_JOBS = 200
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, description: str = "", owner: Optional[str] = None, key: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.description = description
+        self.owner = owner
+        self.key = key
+        # Trace of the request that submitted the job; the job's spans are added to it.
+        self.trace_id = tracing.current_trace_id()
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = "Waiting for a worker"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None):
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.id)
+
+
+class JobManager:
+    """Thread pool plus the state of its jobs; one per process (the app holds it in st.cache_resource)."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs: Dict[str, Job] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable, *args, description: str = "", owner: Optional[str] = None,
+               key: Optional[str] = None, **kwargs) -> str:
+        """Start a job and return its id, or the id of the unfinished job with the same key."""
+        with self.lock:
+            if key is not None:
+                for existing in self.jobs.values():
+                    if existing.key == key and not existing.done and not existing.cancelled:
+                        return existing.id
+            if self.max_pending is not None and self.pending() >= self.max_pending:
+                raise JobQueueFull(f"{self.max_pending} jobs are already waiting or running")
+            job = Job(kind, description, owner, key)
+            self.jobs[job.id] = job
+            self._prune()
+            job._future = self.pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def pending(self) -> int:
+        """Jobs waiting for a worker or running."""
+        return sum(1 for job in self.jobs.values() if not job.done)
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        if job.cancelled:
+            job.status, job.finished = "cancelled", time.time()
+            return
+        job.status, job.started = "running", time.time()
+        job.update(message="Running")
+        try:
+            with tracing.trace(f"job.{job.kind}", trace_id=job.trace_id, job=job.id) as span:
+                job.trace_id = getattr(span, "trace_id", None)
+                job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+            job.update(1.0, "Finished")
+        except JobCancelled:
+            job.status = "cancelled"
+            job.update(message="Cancelled")
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.status, job.error = "failed", str(e)
+            job.update(message=f"Failed: {e}")
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def list(self, owner: Optional[str] = None) -> List[Job]:
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job for job in jobs if owner is None or job.owner == owner]
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a job to stop: a queued job never starts, a running one stops at its next check."""
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status, job.finished = "cancelled", time.time()
+            job.update(message="Cancelled")
+        else:
+            job.update(message="Cancelling")
+        return True
+
+    def _prune(self):
+        finished = sorted((job for job in self.jobs.values() if job.done), key=lambda job: job.finished or 0)
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.id]
@@ -0,0 +1,128 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urljoin, urlparse
+
+from . import tracing
+from .failure_sources import collect_cases
+from .get_result_from_jenkins import fetch_json
+from .utils import analyze_failed_case, extract_component_from_url
+
+DEFAULT_MAX_WORKERS = 12
+
+# subBuilds is filled by the pipeline build step and the parameterized trigger
+# plugin; older freestyle triggers report their builds under actions instead.
+DOWNSTREAM_TREE = "subBuilds[jobName,buildNumber,url,result],actions[triggeredBuilds[url,number,result]]"
+
+
+def normalize_build_url(url: str) -> str | None:
+    """Strip anything after the build number (console, testReport, ...) and keep a trailing slash."""
+    match = re.match(r"^(.*?/job/[^?#]*?/\d+)(?:/|$|\?|#)", url.strip())
+    return match.group(1) + "/" if match else None
+
+
+def jenkins_root(url: str) -> str:
+    """Return the Jenkins root URL, keeping any context path in front of /job/ or /view/."""
+    parsed = urlparse(url)
+    path = re.split(r"/(?:job|view)/", parsed.path, maxsplit=1)[0]
+    return f"{parsed.scheme}://{parsed.netloc}{path.rstrip('/')}/"
+
+
+def discover_downstream_builds(upstream_url: str) -> List[str]:
+    """Return the build URLs triggered by an upstream build, in trigger order."""
+    build = normalize_build_url(upstream_url)
+    if not build:
+        return []
+    data = fetch_json(build + "api/json", params={"tree": DOWNSTREAM_TREE})
+    if not data:
+        return []
+    root = jenkins_root(build)
+    found = []
+    for sub in data.get("subBuilds") or []:
+        if sub.get("url"):
+            found.append(urljoin(root, sub["url"]))
+    for action in data.get("actions") or []:
+        for triggered in (action or {}).get("triggeredBuilds") or []:
+            if triggered.get("url"):
+                found.append(urljoin(root, triggered["url"]))
+    urls = []
+    for url in found:
+        url = normalize_build_url(url)
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def expand_build_urls(urls: List[str], max_workers: int = DEFAULT_MAX_WORKERS) -> List[str]:
+    """
+    Replace every upstream build with its downstream builds. Builds that did
+    not trigger anything are component jobs already and are kept as they are.
+    """
+    builds = []
+    for url in urls:
+        build = normalize_build_url(url)
+        if build and build not in builds:
+            builds.append(build)
+    if not builds:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(builds))) as pool:
+        downstream = list(pool.map(tracing.bind(discover_downstream_builds), builds))
+    expanded = []
+    for build, children in zip(builds, downstream):
+        for url in children or [build]:
+            if url not in expanded:
+                expanded.append(url)
+    return expanded
+
+
+def analyze_build(ai_client, url: str, guidelines_dict: Dict) -> Dict:
+    """Fetch and classify the failures of a single build against its own runbook section."""
+    result = {"url": url, "component": extract_component_from_url(url), "failed_cases": [], "analysis": "", "error": ""}
+    try:
+        result["failed_cases"] = collect_cases(url)
+        if result["failed_cases"]:
+            result["analysis"] = analyze_failed_case(ai_client, result["component"], result["failed_cases"], guidelines_dict)
+    except Exception as e:
+        print(f"Error analysing build {url}: {e}")
+        result["error"] = str(e)
+    return result
+
+
+def analyze_builds(ai_client, urls: List[str], guidelines_dict: Dict, discover: bool = True,
+                   max_workers: int = DEFAULT_MAX_WORKERS) -> List[Dict]:
+    """
+    Analyse several builds at once. Upstream builds are expanded to their
+    downstream component jobs, then every build is fetched and classified in
+    its own thread, so the whole run takes about as long as the slowest job.
+    """
+    builds = expand_build_urls(urls, max_workers) if discover else [u for u in map(normalize_build_url, urls) if u]
+    if not builds:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(builds))) as pool:
+        return list(pool.map(tracing.bind(lambda url: analyze_build(ai_client, url, guidelines_dict)), builds))
+
+
+def build_consolidated_report(results: List[Dict]) -> str:
+    """Merge per-build analyses into a single markdown report."""
+    total = sum(len(r["failed_cases"]) for r in results)
+    lines = [
+        "#### Consolidated test failure analysis report",
+        "",
+        f"- Builds analysed: {len(results)}",
+        f"- Total failed cases: {total}",
+        "",
+        "| Component | Build | Failed cases | Status |",
+        "|-----------|-------|--------------|--------|",
+    ]
+    for r in results:
+        if r["error"]:
+            status = f"Error: {r['error']}"
+        elif r["failed_cases"]:
+            status = "Analysed"
+        else:
+            status = "No failed cases"
+        lines.append(f"| {r['component'] or 'unknown'} | [{r['url']}]({r['url']}) | {len(r['failed_cases'])} | {status} |")
+    for r in results:
+        if r["analysis"]:
+            lines += ["", "---", "", f"### {r['component'] or 'unknown'}: {r['url']}", "", r["analysis"]]
+    return "\n".join(lines)
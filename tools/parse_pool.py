@@ -0,0 +1,81 @@
+"""
+Process pool for CPU-bound page parsing.
+
+HTML parsing is pure Python and holds the GIL, so parsing hundreds of case
+pages on threads still uses one core. parse_map() sends the raw page bytes to
+a process-wide ProcessPoolExecutor and gets compact records back. The pool is
+created on first use and shared by the CLI, the batch triage and the
+Streamlit app.
+
+Tuning (environment or configure()):
+    PARSE_WORKERS     worker processes (default: CPU count, 0 or 1 parses inline)
+    PARSE_CHUNKSIZE   items sent to a worker per task (default: spread evenly)
+    PARSE_MIN_ITEMS   below this many items parse inline, a pool round trip
+                      costs more than it saves (default: 16)
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_lock = threading.Lock()
+_pool = None
+_settings = {
+    "workers": int(os.getenv("PARSE_WORKERS") or os.cpu_count() or 1),
+    "chunksize": int(os.getenv("PARSE_CHUNKSIZE") or 0),
+    "min_items": int(os.getenv("PARSE_MIN_ITEMS") or 16),
+}
+
+
+def configure(workers=None, chunksize=None, min_items=None):
+    """Change the pool settings; a running pool is replaced on next use."""
+    global _pool
+    with _lock:
+        if workers is not None:
+            _settings["workers"] = workers
+        if chunksize is not None:
+            _settings["chunksize"] = chunksize
+        if min_items is not None:
+            _settings["min_items"] = min_items
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_settings["workers"])
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+def parse_map(fn, items):
+    """
+    Return [fn(item) for item in items], computed in the process pool when
+    there is enough work. fn must be a module level function.
+    """
+    items = list(items)
+    workers = _settings["workers"]
+    if workers <= 1 or len(items) < _settings["min_items"]:
+        return [fn(item) for item in items]
+    chunksize = _settings["chunksize"] or max(1, len(items) // (workers * 4))
+    try:
+        return list(_get_pool().map(fn, items, chunksize=chunksize))
+    except BrokenProcessPool as e:
+        # A worker was killed (OOM, signal); drop the pool and finish inline.
+        print(f"Parse pool failed, parsing inline: {e}")
+        shutdown()
+        return [fn(item) for item in items]
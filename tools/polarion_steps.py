@@ -0,0 +1,135 @@
+"""
+Normalization of Polarion test steps before they go into prompts.
+
+getTestSteps() returns rich text: <p>/<span style=...> wrappers, entities,
+<br> and list markup, and expected results that repeat the step or say
+"N/A". normalize_steps() turns them into plain {"step", "expectedResult"}
+dicts (the shape the generators already use), and steps_markdown() renders
+them as a numbered list with the leading sentence shared by most steps
+pulled out once as a precondition. prepare_steps() caches both per work item
+under POLARION_STEP_CACHE_DIR, keyed by a hash of the raw steps.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from . import tracing
+except ImportError:
+    import tracing
+
+POLARION_STEP_CACHE_DIR = os.getenv("POLARION_STEP_CACHE_DIR", "output/polarion")
+# Part of the cache key; bump it when the normalization changes so cached steps are rebuilt.
+NORMALIZE_VERSION = 2
+BOILERPLATE = {"", "-", "--", "n/a", "na", "none", "null", "tbd", "same as above", "as expected", "see above"}
+
+_BLOCK_RE = re.compile(r"<\s*(?:br|/p|/div|/li|/tr|/h\d)\s*/?>", re.IGNORECASE)
+_ITEM_RE = re.compile(r"<\s*li[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_STEP_PREFIX_RE = re.compile(r"^\s*(?:step\s*\d+\s*[:.)-]|\d+\s*[.)])\s*", re.IGNORECASE)
+
+
+def clean_html(text) -> str:
+    """Plain text of a rich-text field: line breaks kept, list items as '- ', markup and entities removed."""
+    if text is None:
+        return ""
+    text = _ITEM_RE.sub("\n- ", str(text))
+    text = _TAG_RE.sub(" ", _BLOCK_RE.sub("\n", text))
+    text = html.unescape(text).replace(" ", " ")
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def _field(step, *names) -> str:
+    if isinstance(step, dict):
+        return next((step[name] for name in names if step.get(name)), "")
+    return str(step) if names[0] == "step" else ""
+
+
+def normalize_steps(steps) -> List[Dict[str, str]]:
+    """Plain-text {"step", "expectedResult"} dicts; empty steps and boilerplate expected results dropped."""
+    normalized = []
+    for step in steps or []:
+        text = _STEP_PREFIX_RE.sub("", clean_html(_field(step, "step", "description")))
+        expected = clean_html(_field(step, "expectedResult", "expected_result"))
+        if expected.lower().strip(" .") in BOILERPLATE or expected == text:
+            expected = ""
+        if text or expected:
+            normalized.append({"step": text, "expectedResult": expected})
+    return normalized
+
+
+def _leading_sentence(text: str) -> str:
+    return re.split(r"(?<=[.!?])\s+|\n", text, maxsplit=1)[0]
+
+
+def shared_preconditions(steps: List[Dict[str, str]]) -> Tuple[List[str], List[Dict[str, str]]]:
+    """
+    Leading sentences repeated by at least three steps and half of all steps,
+    and the steps without them. Expected results that only repeat the
+    remaining step are dropped, and so are steps left with nothing.
+    """
+    counts = {}
+    for step in steps:
+        sentence = _leading_sentence(step["step"])
+        if sentence and sentence != step["step"]:
+            counts[sentence] = counts.get(sentence, 0) + 1
+    shared = [s for s, count in counts.items() if count >= 3 and count * 2 >= len(steps)]
+    if not shared:
+        return [], steps
+    stripped = []
+    for step in steps:
+        sentence = _leading_sentence(step["step"])
+        text = step["step"][len(sentence):].strip() if sentence in shared else step["step"]
+        expected = "" if step["expectedResult"] == text else step["expectedResult"]
+        if text or expected:
+            stripped.append({"step": text, "expectedResult": expected})
+    return shared, stripped
+
+
+def steps_markdown(steps) -> str:
+    """Numbered markdown list of the (raw or normalized) steps, shared preconditions stated once."""
+    preconditions, steps = shared_preconditions(normalize_steps(steps))
+    lines = [f"Preconditions: {' '.join(preconditions)}", ""] if preconditions else []
+    for n, step in enumerate(steps, 1):
+        if not step["step"]:
+            lines.append(f"{n}. Expected: " + step["expectedResult"].replace("\n", "\n   "))
+            continue
+        lines.append(f"{n}. " + step["step"].replace("\n", "\n   "))
+        if step["expectedResult"]:
+            lines.append("   Expected: " + step["expectedResult"].replace("\n", "\n   "))
+    return "\n".join(lines)
+
+
+def prepare_steps(steps, case_id: Optional[str] = None, cache_dir: str = POLARION_STEP_CACHE_DIR) -> Dict:
+    """
+    {"steps": normalized dicts, "markdown": steps_markdown()}, cached in
+    <cache_dir>/<case_id>.json while the raw steps stay the same.
+    """
+    raw_hash = hashlib.sha256(json.dumps([NORMALIZE_VERSION, steps], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, re.sub(r"[^\w\-]+", "_", case_id) + ".json") if case_id else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("raw_hash") == raw_hash:
+                return cached
+        except (OSError, ValueError) as e:
+            print(f"Error reading normalized steps {path}: {e}")
+    with tracing.span("polarion.normalize", case_id=case_id or "") as span:
+        normalized = normalize_steps(steps)
+        prepared = {"case_id": case_id, "raw_hash": raw_hash, "steps": normalized, "markdown": steps_markdown(normalized)}
+        span.set("raw_chars", len(json.dumps(steps, default=str)))
+        span.set("chars", len(prepared["markdown"]))
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(prepared, f, indent=2)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Error caching normalized steps {path}: {e}")
+    return prepared
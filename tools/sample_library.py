@@ -0,0 +1,194 @@
+"""
+Sample test library with similarity-based example selection.
+
+Sample tests live in sample/test (Cypress .js/.ts, Ginkgo _test.go) and
+fixtures in sample/fixtures. A test is paired with the fixture it requires
+("../fixtures/<name>.json"). The index (kept under SAMPLE_INDEX_DIR, outside
+the library, and rebuilt when a file changes) holds per test its describe/it titles, tags, page-object calls and
+selectors. select_examples() ranks the tests against the feature description
+with TF-IDF cosine similarity and returns the best one or two that fit a token
+budget, so the prompt carries only relevant examples however large the
+library grows.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from . import tracing
+
+SAMPLE_LIBRARY_DIR = os.getenv("SAMPLE_LIBRARY_DIR", "sample")
+# Built indexes, one JSON file per library directory.
+SAMPLE_INDEX_DIR = os.getenv("SAMPLE_INDEX_DIR", "output/samples")
+# Tokens (about four characters each) of example code per prompt.
+SAMPLE_TOKEN_BUDGET = int(os.getenv("SAMPLE_TOKEN_BUDGET") or 2500)
+
+TEST_SUFFIXES = {".js": "cypress", ".ts": "cypress", ".go": "ginkgo"}
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "then", "when", "should", "step", "steps",
+    "click", "verify", "check", "const", "let", "var", "function", "return", "true", "false", "null", "undefined",
+    "describe", "before", "after", "each", "expect", "cy", "get", "set", "page", "test", "tests", "is", "be",
+}
+
+_index_cache = {}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case words, camelCase and snake_case split, stop words and short words dropped."""
+    words = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", text or "")
+    return [w for w in re.findall(r"[a-z][a-z0-9]+", words.lower()) if len(w) > 2 and w not in STOPWORDS]
+
+
+def describe_test(path: str, source: str) -> Dict:
+    """Index entry of one sample test."""
+    titles = re.findall(r"""\b(?:describe|context|it|Describe|Context|It|When)\(\s*["'`](.+?)["'`]""", source)
+    calls = sorted(set(re.findall(r"\b([A-Z]\w+\.\w+)\(", source)))
+    selectors = sorted(set(re.findall(r"""cy\.(?:get|contains|find)\(\s*["'`]([^"'`]+)["'`]""", source)))
+    tags = re.findall(r"""tags:\s*\[([^\]]*)\]""", source)
+    fixture = re.search(r"""fixtures/([\w\-.]+\.json)""", source)
+    return {
+        "path": path,
+        "framework": TEST_SUFFIXES.get(os.path.splitext(path)[1], "cypress"),
+        "fixture": fixture.group(1) if fixture else None,
+        "titles": titles,
+        "tags": re.findall(r"[\w-]+", " ".join(tags)),
+        "calls": calls,
+        "selectors": selectors,
+        "chars": len(source),
+    }
+
+
+def _signature(directory: str) -> List:
+    files = []
+    for sub in ("test", "fixtures"):
+        folder = os.path.join(directory, sub)
+        if os.path.isdir(folder):
+            files += [(f"{sub}/{name}", os.path.getmtime(os.path.join(folder, name))) for name in sorted(os.listdir(folder))]
+    return files
+
+
+def _index_path(directory: str) -> str:
+    name = re.sub(r"[^\w\-]+", "_", os.path.normpath(directory)).strip("_") or "sample"
+    return os.path.join(SAMPLE_INDEX_DIR, name[-100:] + ".json")
+
+
+def load_index(directory: str = SAMPLE_LIBRARY_DIR) -> Dict:
+    """The library index, rebuilt (and saved when possible) when a sample file changed."""
+    signature = _signature(directory)
+    cached = _index_cache.get(directory)
+    if cached and cached["signature"] == signature:
+        return cached
+    path = _index_path(directory)
+    index = None
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading sample index {path}: {e}")
+    if not index or [list(item) for item in signature] != index.get("signature"):
+        with tracing.span("samples.index", directory=directory) as span:
+            entries = []
+            for name, _ in signature:
+                if not name.startswith("test/") or os.path.splitext(name)[1] not in TEST_SUFFIXES:
+                    continue
+                try:
+                    with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                        entries.append(describe_test(name, f.read()))
+                except OSError as e:
+                    print(f"Error indexing sample {name}: {e}")
+            index = {"signature": [list(item) for item in signature], "entries": entries}
+            span.set("samples", len(entries))
+            try:
+                os.makedirs(SAMPLE_INDEX_DIR, exist_ok=True)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(index, f, indent=2)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                print(f"Error saving sample index {path}: {e}")
+    index["signature"] = signature
+    _prepare(index)
+    _index_cache[directory] = index
+    return index
+
+
+def _prepare(index: Dict):
+    """Term vectors and inverse document frequencies of the entries."""
+    documents = []
+    for entry in index["entries"]:
+        text = " ".join(entry["titles"] + entry["tags"] + entry["calls"] + entry["selectors"] + [entry["path"]])
+        documents.append(Counter(tokenize(text)))
+    df = Counter(term for doc in documents for term in doc)
+    n = len(documents)
+    index["idf"] = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+    index["vectors"] = [_weigh(doc, index["idf"]) for doc in documents]
+
+
+def _weigh(counts: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+    vector = {term: (1 + math.log(count)) * idf.get(term, 0) for term, count in counts.items()}
+    norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+    return {term: w / norm for term, w in vector.items() if w}
+
+
+def rank(query: str, framework: Optional[str] = None, directory: str = SAMPLE_LIBRARY_DIR) -> List[tuple]:
+    """(score, entry) for the library tests, best first, optionally only one framework."""
+    index = load_index(directory)
+    query_vector = _weigh(Counter(tokenize(query)), index["idf"])
+    ranked = []
+    for entry, vector in zip(index["entries"], index["vectors"]):
+        if framework and entry["framework"] != framework:
+            continue
+        ranked.append((sum(w * vector.get(term, 0) for term, w in query_vector.items()), entry))
+    ranked.sort(key=lambda item: -item[0])
+    return ranked
+
+
+def _read(directory: str, name: str) -> str:
+    try:
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError as e:
+        print(f"Error loading sample {name}: {e}")
+        return ""
+
+
+def select_examples(query: str, framework: Optional[str] = "cypress", k: int = 2,
+                    token_budget: int = SAMPLE_TOKEN_BUDGET, directory: str = SAMPLE_LIBRARY_DIR) -> List[Dict]:
+    """
+    The k most similar sample tests that fit token_budget together, as
+    {"path", "score", "test_case", "fixture_path"}. The best match is always
+    returned, cut at a line boundary if it alone exceeds the budget.
+    """
+    with tracing.span("samples.select", framework=framework or "any") as span:
+        budget = token_budget * 4
+        examples = []
+        for score, entry in rank(query, framework, directory):
+            if len(examples) >= k:
+                break
+            if examples and (score <= 0 or entry["chars"] > budget):
+                continue
+            source = _read(directory, entry["path"])
+            if not source:
+                continue
+            if len(source) > budget:
+                source = source[:source.rfind("\n", 0, budget) + 1 or budget] + "// ... (sample truncated)\n"
+            budget -= len(source)
+            examples.append({
+                "path": entry["path"],
+                "score": round(score, 3),
+                "test_case": source,
+                "fixture_path": f"fixtures/{entry['fixture']}" if entry["fixture"] else None,
+            })
+        span.set("examples", len(examples))
+        span.set("chars", sum(len(example["test_case"]) for example in examples))
+        return examples
+
+
+def best_fixture(query: str, directory: str = SAMPLE_LIBRARY_DIR) -> Optional[str]:
+    """Library path ("fixtures/<name>.json") of the fixture paired with the best matching test."""
+    for _, entry in rank(query, None, directory):
+        if entry["fixture"] and os.path.exists(os.path.join(directory, "fixtures", entry["fixture"])):
+            return f"fixtures/{entry['fixture']}"
+    return None
@@ -0,0 +1,177 @@
+"""
+Stack trace compaction.
+
+Cypress and Go/Ginkgo traces are mostly framework frames (node_modules,
+the Cypress runner, Ginkgo/Gomega, the Go runtime) and panics come with a
+dump of every goroutine. compact_stacktrace() keeps the message lines and
+the first project frames, drops framework frames and all goroutines but the
+first, collapses repeated frames and caps the length. compact_cases() is
+applied before prompting and before failed cases are written to disk.
+
+Limits come from DEFAULT_SETTINGS, overridden per component by
+COMPONENT_SETTINGS (or configure_component()) and by the environment:
+STACKTRACE_MAX_FRAMES, STACKTRACE_MAX_LINES, STACKTRACE_MAX_CHARS.
+STACKTRACE_COMPACT=0 turns compaction off.
+"""
+import os
+import re
+from typing import Dict, List, Optional
+
+DEFAULT_SETTINGS = {
+    "max_frames": int(os.getenv("STACKTRACE_MAX_FRAMES") or 5),
+    "max_lines": int(os.getenv("STACKTRACE_MAX_LINES") or 30),
+    "max_chars": int(os.getenv("STACKTRACE_MAX_CHARS") or 2000),
+    "max_error_chars": 1000,
+    # Frames kept when no project frame is found, so the location isn't lost.
+    "fallback_frames": 2,
+    "framework_patterns": [
+        r"node_modules/", r"__cypress/runner", r"cypress_runner\.js", r"\(internal/", r"node:internal",
+        r"/vendor/", r"onsi/ginkgo", r"onsi/gomega", r"/usr/(?:local/)?go/src/", r"^\s*runtime\.", r"\bruntime/",
+        r"^\s*testing\.", r"\btesting/testing\.go", r"site-packages/", r"<anonymous>\)?$",
+    ],
+}
+
+# Cypress UI suites and Go (Ginkgo) suites; see runbooks/component-keywords.md for the components.
+COMPONENT_SETTINGS = {
+    "grc": {"max_frames": 3},
+    "alc": {"max_frames": 3},
+    "clc": {"max_frames": 3},
+    "search": {"max_frames": 3},
+    "globalhub": {"max_frames": 8},
+    "server": {"max_frames": 8},
+    "obs": {"max_frames": 8},
+    "volsync": {"max_frames": 8},
+}
+
+ENABLED = os.getenv("STACKTRACE_COMPACT", "1") != "0"
+
+_JS_FRAME_RE = re.compile(r"^\s*at\s")
+_PY_FRAME_RE = re.compile(r'^\s*File "[^"]+", line \d+')
+_GO_FILE_RE = re.compile(r"^\s+\S+\.go:\d+")
+_GOROUTINE_RE = re.compile(r"^goroutine \d+ \[")
+
+
+def configure_component(component: str, **settings):
+    """Override the compaction settings of one component."""
+    COMPONENT_SETTINGS.setdefault(component.lower(), {}).update(settings)
+
+
+def settings_for(component: Optional[str] = None) -> Dict:
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(COMPONENT_SETTINGS.get((component or "").lower(), {}))
+    settings["_framework_re"] = re.compile("|".join(settings["framework_patterns"]))
+    return settings
+
+
+def _split_frames(lines: List[str]) -> List[tuple]:
+    """Group lines into ("frame", text) and ("text", text) items. Go and Python frames span two lines."""
+    items = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        following = lines[i + 1] if i + 1 < len(lines) else ""
+        if _GO_FILE_RE.match(following) and not _GO_FILE_RE.match(line) and line.strip():
+            items.append(("frame", line + "\n" + following))
+            i += 2
+            continue
+        if _PY_FRAME_RE.match(line):
+            if following.startswith("    ") and not _PY_FRAME_RE.match(following):
+                items.append(("frame", line + "\n" + following))
+                i += 2
+                continue
+            items.append(("frame", line))
+        elif _JS_FRAME_RE.match(line) or _GO_FILE_RE.match(line):
+            items.append(("frame", line))
+        else:
+            items.append(("text", line))
+        i += 1
+    return items
+
+
+def _drop_extra_goroutines(lines: List[str]) -> tuple:
+    """Keep the first goroutine of a dump (the one that failed); return (lines, note)."""
+    starts = [n for n, line in enumerate(lines) if _GOROUTINE_RE.match(line)]
+    if len(starts) < 2:
+        return lines, None
+    return lines[:starts[1]], f"... {len(starts) - 1} more goroutines omitted"
+
+
+def _cap(text: str, max_chars: int) -> str:
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars].rstrip() + " ... [truncated]"
+    return text
+
+
+def compact_stacktrace(text: str, component: Optional[str] = None, settings: Optional[Dict] = None) -> str:
+    """Return the trace with framework frames, extra goroutines and repeats removed, capped in size."""
+    if not text:
+        return text or ""
+    settings = settings or settings_for(component)
+    framework = settings["_framework_re"]
+    lines, goroutines_note = _drop_extra_goroutines(text.splitlines())
+    out = []
+    project_frames = 0
+    fallback = []
+    omitted = 0
+    previous = None
+    repeats = 0
+
+    def flush_repeats():
+        nonlocal repeats
+        if repeats:
+            out.append(f"    ... previous frame repeated {repeats} more times")
+            repeats = 0
+
+    for kind, item in _split_frames(lines):
+        if kind == "text":
+            flush_repeats()
+            if item.strip() or (out and out[-1].strip()):
+                out.append(item)
+            continue
+        if item == previous:
+            repeats += 1
+            continue
+        flush_repeats()
+        previous = item
+        if framework.search(item):
+            omitted += 1
+            if len(fallback) < settings["fallback_frames"]:
+                fallback.append(item)
+            continue
+        if project_frames >= settings["max_frames"]:
+            omitted += 1
+            continue
+        project_frames += 1
+        out.append(item)
+    flush_repeats()
+    if not project_frames and fallback:
+        out += fallback
+        omitted -= len(fallback)
+    while out and not out[-1].strip():
+        out.pop()
+    if omitted:
+        out.append(f"    ... {omitted} frames omitted")
+    if goroutines_note:
+        out.append(goroutines_note)
+    out = "\n".join(out).split("\n")
+    if len(out) > settings["max_lines"]:
+        out = out[:settings["max_lines"]] + [f"... {len(out) - settings['max_lines']} more lines"]
+    return _cap("\n".join(out).strip("\n"), settings["max_chars"])
+
+
+def compact_case(case: Dict, component: Optional[str] = None, settings: Optional[Dict] = None) -> Dict:
+    """Return a copy of a failed case record with a compacted stacktrace and a capped error message."""
+    if not ENABLED:
+        return case
+    settings = settings or settings_for(component or case.get("Component"))
+    compacted = dict(case)
+    compacted["Error Message"] = _cap(case.get("Error Message") or "", settings["max_error_chars"])
+    compacted["Stacktrace Message"] = compact_stacktrace(case.get("Stacktrace Message") or "", settings=settings)
+    return compacted
+
+
+def compact_cases(cases: List[Dict], component: Optional[str] = None) -> List[Dict]:
+    if not ENABLED:
+        return cases
+    settings = settings_for(component) if component else None
+    return [compact_case(case, component, settings) for case in cases]
@@ -0,0 +1,247 @@
+"""
+Lightweight timing and token-usage tracing.
+
+Tracing is off unless QE_TRACE=1 (or enable() is called). When off, span()
+returns a shared no-op object, so instrumented code pays one global lookup
+and a function call per span.
+
+    with tracing.trace("analyze_failure_url") as root:
+        with tracing.span("jenkins.fetch", url=url) as s:
+            s.set("bytes", len(body))
+
+Finished spans are kept in a bounded in-memory buffer, aggregated per span
+name for prometheus_snapshot(), and appended to QE_TRACE_FILE as JSON lines
+when that variable is set.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+MAX_SPANS = 10000
+# Numeric attributes summed into the per-name aggregates.
+COUNTED_ATTRIBUTES = ("bytes", "prompt_tokens", "completion_tokens")
+
+_enabled = os.getenv("QE_TRACE", "").lower() in ("1", "true", "yes")
+_trace_file = os.getenv("QE_TRACE_FILE")
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_SPANS)
+_totals = defaultdict(lambda: defaultdict(float))
+_span_ids = itertools.count(1)
+_current_trace = contextvars.ContextVar("qe_trace_id", default=None)
+_current_span = contextvars.ContextVar("qe_span", default=None)
+
+
+def enable(trace_file: Optional[str] = None):
+    global _enabled, _trace_file
+    _enabled = True
+    if trace_file:
+        _trace_file = trace_file
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name: str, attributes: Dict, trace_id: Optional[str] = None):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = trace_id
+        self.span_id = next(_span_ids)
+        self.parent_id = None
+        self.start = None
+        self.duration = None
+        self._tokens = []
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, value):
+        self.attributes[key] = self.attributes.get(key, 0) + (value or 0)
+
+    def __enter__(self):
+        if self.trace_id is None:
+            self.trace_id = _current_trace.get()
+        else:
+            self._tokens.append(_current_trace.set(self.trace_id))
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent else None
+        self._tokens.append(_current_span.set(self))
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._perf_start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current_span.reset(self._tokens.pop())
+        if self._tokens:
+            _current_trace.reset(self._tokens.pop())
+        _record(self)
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+def _record(span: Span):
+    line = json.dumps(span.to_dict(), default=str) if _trace_file else None
+    with _lock:
+        _spans.append(span)
+        totals = _totals[span.name]
+        totals["count"] += 1
+        totals["seconds"] += span.duration
+        for key in COUNTED_ATTRIBUTES:
+            value = span.attributes.get(key)
+            if isinstance(value, (int, float)):
+                totals[key] += value
+        if span.attributes.get("cache_hit"):
+            totals["cache_hits"] += 1
+        if "error" in span.attributes:
+            totals["errors"] += 1
+        if line:
+            with open(_trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def span(name: str, **attributes):
+    """Time a block of work. Use the returned span's set()/add() to attach bytes, tokens, cache_hit..."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def trace(name: str, trace_id: Optional[str] = None, **attributes):
+    """
+    Start a new trace (one user request), or continue trace_id (work the
+    request handed to a background job); spans opened inside it share its trace id.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes, trace_id=trace_id or uuid.uuid4().hex)
+
+
+def bind(fn):
+    """
+    Carry the current trace into worker threads:
+    pool.map(tracing.bind(work), items). A copy of the caller's context is
+    entered for every call, so concurrent calls don't share one context.
+    """
+    if not _enabled:
+        return fn
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def current_trace_id() -> Optional[str]:
+    return _current_trace.get()
+
+
+def current_span():
+    """The innermost open span, for attaching attributes from deeper call sites."""
+    if not _enabled:
+        return _NOOP
+    return _current_span.get() or _NOOP
+
+
+def get_spans(trace_id: Optional[str] = None) -> List[Span]:
+    with _lock:
+        spans = list(_spans)
+    if trace_id is None:
+        return spans
+    return [s for s in spans if s.trace_id == trace_id]
+
+
+def breakdown(trace_id: str) -> List[Dict]:
+    """
+    Per span name totals for one trace, slowest first, for display. The
+    trace's own root span comes first and holds the request's total time.
+    """
+    rows = {}
+    for s in get_spans(trace_id):
+        row = rows.setdefault(s.name, {"stage": s.name, "calls": 0, "seconds": 0.0, "bytes": 0,
+                                       "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0})
+        row["calls"] += 1
+        row["seconds"] += s.duration
+        for key in COUNTED_ATTRIBUTES:
+            value = s.attributes.get(key)
+            if isinstance(value, (int, float)):
+                row[key] += value
+        if s.attributes.get("cache_hit"):
+            row["cache_hits"] += 1
+    return sorted(rows.values(), key=lambda r: -r["seconds"])
+
+
+def export_jsonl(path: str, trace_id: Optional[str] = None) -> int:
+    """Write the buffered spans as JSON lines and return how many were written."""
+    spans = get_spans(trace_id)
+    with open(path, "a", encoding="utf-8") as f:
+        for s in spans:
+            f.write(json.dumps(s.to_dict(), default=str) + "\n")
+    return len(spans)
+
+
+def prometheus_snapshot() -> str:
+    """Aggregated counters in the Prometheus text exposition format."""
+    with _lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+    lines = ["# TYPE qe_span_duration_seconds summary"]
+    for name in sorted(totals):
+        lines.append(f'qe_span_duration_seconds_count{{span="{name}"}} {totals[name].get("count", 0):g}')
+        lines.append(f'qe_span_duration_seconds_sum{{span="{name}"}} {totals[name].get("seconds", 0):g}')
+    counters = [
+        ("qe_span_bytes_total", "bytes"),
+        ("qe_llm_prompt_tokens_total", "prompt_tokens"),
+        ("qe_llm_completion_tokens_total", "completion_tokens"),
+        ("qe_cache_hits_total", "cache_hits"),
+        ("qe_span_errors_total", "errors"),
+    ]
+    for metric, key in counters:
+        lines.append(f"# TYPE {metric} counter")
+        for name in sorted(totals):
+            value = totals[name].get(key, 0)
+            lines.append(f'{metric}{{span="{name}"}} {value:g}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _totals.clear()
@@ -1,11 +1,19 @@
 from collections import defaultdict
+from contextlib import nullcontext
 import re
 import os
 import json
+import time
 from typing import Dict, List, Any
 from urllib.parse import urlparse
-from datetime import datetime
-from streamlit import html
+from textwrap import indent
+from . import tracing
+from .artifact_store import ArtifactStore
+from .stacktrace import compact_cases
+from .fixture_builder import build_fixture
+from .generation_store import generate_or_update
+from .polarion_steps import steps_markdown
+from .sample_library import SAMPLE_LIBRARY_DIR, best_fixture, select_examples
 
 def extract_component_from_url(url: str) -> str | None:
     try:
@@ -23,6 +31,18 @@ def extract_component_from_url(url: str) -> str | None:
     except Exception as e:
         print("extract_component_from_url error:", e)
     return None
+
+def extract_build_from_url(url: str) -> tuple[str, int] | None:
+    """Return (job name, build number) for a Jenkins build URL."""
+    try:
+        parts = urlparse(url).path.strip("/").split("/")
+        job_names = [parts[i+1] for i in range(len(parts)-1) if parts[i] == "job"]
+        numbers = [p for p in parts if p.isdigit()]
+        if job_names and numbers:
+            return job_names[-1], int(numbers[-1])
+    except Exception as e:
+        print("extract_build_from_url error:", e)
+    return None
     
 
 def load_rules(md_file: str) -> dict:
@@ -32,11 +52,32 @@ def load_rules(md_file: str) -> dict:
             with open(md_file, 'r', encoding='utf-8') as f:
                 for line in f:
                  if line.startswith("## Component Name "):
-                  current_component = line.replace("## Component Name", "").strip()
+                  current_component = line.replace("## Component Name", "").strip().lstrip("- ").strip()
                  elif current_component:
                    component_guidelines[current_component] += line
         except Exception as e:
             raise ValueError(f"can not load the file: {str(e)}")
+        return dict(component_guidelines)
+
+def find_guideline(guidelines_dict: dict, component: str) -> str:
+    """
+    Find the runbook section for a component name taken from a job URL.
+    Job names are lowercase and unspaced ("globalhub", "server"), so match on
+    a normalized name and fall back to a prefix match ("server" -> "Server Foundation").
+    """
+    if not guidelines_dict or not component:
+        return ""
+    normalize = lambda name: re.sub(r"[^a-z0-9]", "", name.lower())
+    wanted = normalize(component)
+    if not wanted:
+        return ""
+    normalized = {normalize(name): text for name, text in guidelines_dict.items()}
+    if wanted in normalized:
+        return normalized[wanted]
+    for name, text in normalized.items():
+        if name and (name.startswith(wanted) or wanted.startswith(name)):
+            return text
+    return ""
 
 def load_code_file(file_path: str) -> str:
     normalized_path = file_path.strip('/\\').replace('\\', '/')
@@ -51,24 +92,31 @@ def load_code_file(file_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error reading file {full_path}: {e}")
 
-def load_sample_files() -> Dict[str, str]:
-    """Load sample test case and fixture files for context"""
+def feature_text(feature_description) -> str:
+    """Plain text of a feature description or of Polarion steps, for sample lookups."""
+    if isinstance(feature_description, list):
+        return " ".join(
+            f"{step.get('step', '')} {step.get('expectedResult', '')}" if isinstance(step, dict) else str(step)
+            for step in feature_description
+        )
+    return str(feature_description or "")
+
+def load_sample_files(query: str = "", framework: str = "cypress") -> Dict[str, str]:
+    """
+    Load the sample tests most similar to the query (within the sample token
+    budget) and the fixture paired with the best one, for context.
+    """
     sample_context = {}
-    
-    # Load sample test case
-    sample_test_path = "sample/test/OsdAwsCcsPublicClusterCreation.js"
-    if os.path.exists(sample_test_path):
-        try:
-            with open(sample_test_path, 'r', encoding='utf-8') as f:
-                sample_context['test_case'] = f.read()
-        except Exception as e:
-            print(f"Error loading sample test case: {e}")
-    
-    # Load sample fixture
-    sample_fixture_path = "sample/fixtures/OsdAwsCcsCreatePublicCluster.json"
-    if os.path.exists(sample_fixture_path):
+    examples = select_examples(query, framework)
+    if examples:
+        sample_context['test_case'] = "\n\n".join(
+            f"// {example['path']}\n{example['test_case']}" if len(examples) > 1 else example['test_case']
+            for example in examples
+        )
+    fixture_path = (examples[0]['fixture_path'] if examples else None) or best_fixture(query)
+    if fixture_path:
         try:
-            with open(sample_fixture_path, 'r', encoding='utf-8') as f:
+            with open(os.path.join(SAMPLE_LIBRARY_DIR, fixture_path), 'r', encoding='utf-8') as f:
                 sample_context['fixture'] = f.read()
         except Exception as e:
             print(f"Error loading sample fixture: {e}")
@@ -114,23 +162,25 @@ def generate_fixture_from_polarion_data(ai_client, polarion_steps: List[Dict], t
     """
     Generate a fixture file based on Polarion test steps data.
     Extract input parameters from the test steps and use them to populate the fixture.
+    The fixture is built locally from the sample fixture schema; the model is only
+    asked about input values no rule can place, or for the whole fixture when there
+    is no sample fixture.
     """
+    query = f"{test_case_title} {feature_text(polarion_steps)}"
+    sample_context = load_sample_files(query)
+    samples = [json.loads(sample_context['fixture'])] if sample_context.get('fixture') else None
+    built = build_fixture(polarion_steps, test_case_title, ai_client, samples=samples)
+    if built is not None:
+        return f"```json\n{json.dumps(built['fixture'], indent=2)}\n```"
+
     # Extract fixture data from Polarion steps
     extracted_data = extract_fixture_data_from_polarion_steps(polarion_steps)
     
-    # Load sample fixture for structure reference
-    sample_context = load_sample_files()
+    # Sample fixture for structure reference
     sample_fixture = sample_context.get('fixture', '')
     
     # Convert Polarion steps to a readable format for AI
-    steps_text = ""
-    if polarion_steps:
-        for i, step in enumerate(polarion_steps, 1):
-            if isinstance(step, dict):
-                step_text = step.get('step', '') or step.get('description', '') or str(step)
-            else:
-                step_text = str(step)
-            steps_text += f"Step {i}: {step_text}\n"
+    steps_text = steps_markdown(polarion_steps)
     
     # Build the prompt for fixture generation
     prompt = f"""
@@ -183,7 +233,7 @@ You are a QA automation engineer responsible for creating test fixture files for
 ```
 """
 
-    response = ai_client.chat([{"role": "user", "content": prompt}])
+    response = ai_client.chat([{"role": "user", "content": prompt}], task="generate_fixture_file", validate=is_json_block)
     return response
 
 def extract_code_path_from_prompt(prompt: str) -> str:
@@ -205,7 +255,7 @@ def extract_code_path_from_prompt(prompt: str) -> str:
 
 def generate_fixture_file(ai_client, test_description, test_case_content=None):
     """Generate a fixture file based on test description and sample fixture"""
-    sample_context = load_sample_files()
+    sample_context = load_sample_files(feature_text(test_description))
     
     # Build the prompt for fixture generation
     sample_fixture_context = ""
@@ -265,7 +315,7 @@ You are a QA automation engineer responsible for creating test fixture files for
 ```
 """
 
-    response = ai_client.chat([{"role": "user", "content": prompt}])
+    response = ai_client.chat([{"role": "user", "content": prompt}], task="generate_fixture_file", validate=is_json_block)
     return response
 
 def generate_test_script(ai_client, feature_description, force_cypress=False, include_screenshots=False, code_file_content=None, generate_fixture=False):
@@ -290,8 +340,8 @@ def generate_test_script(ai_client, feature_description, force_cypress=False, in
     if force_cypress:
         use_cypress = True
     
-    # Load sample files for context
-    sample_context = load_sample_files()
+    # Load the most relevant sample files for context
+    sample_context = load_sample_files(feature_text(feature_description), "cypress" if use_cypress else "ginkgo")
     
     if use_cypress:
         framework = "cypress"
@@ -338,6 +388,16 @@ Use this as a template for structure, naming conventions, and best practices whe
         style_guide = "Write clean and idiomatic Go code using Ginkgo for BDD-style testing. Use Gomega for assertions."
         additional_requirements = ""
         sample_test_context = ""
+        if sample_context.get('test_case'):
+            sample_test_context = f"""
+
+### Sample Test Case Reference:
+The following is a sample Ginkgo test for reference:
+
+```go
+{sample_context['test_case']}
+```
+"""
     
     # Build the prompt with optional code context
     code_context_section = ""
@@ -361,7 +421,7 @@ Please generate an automated test script using **{framework}** for the following
 {sample_test_context}
 {code_context_section}
 ### Feature Description:
-{feature_description}
+{steps_markdown(feature_description) if isinstance(feature_description, list) else feature_description}
 
 ### Requirements:
 - Use {language} for writing the test script
@@ -388,7 +448,7 @@ describe('Feature Name', () => {{
 """
 
     # Send prompt to AI and return response
-    response = ai_client.chat([{"role": "user", "content": prompt}])
+    response = ai_client.chat([{"role": "user", "content": prompt}], task="generate_test_script")
     return response
 
 def generate_test_script_with_fixture(ai_client, feature_description, force_cypress=False, include_screenshots=False, code_file_content=None):
@@ -429,39 +489,99 @@ def generate_test_script_with_polarion_fixture(ai_client, polarion_steps, test_c
         "fixture_content": fixture_content
     }
 
-def write_test_files_to_output(test_script, fixture_content, test_name=None):
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    if test_name:
-        clean_name = re.sub(r'[^\w\-_]', '_', test_name)[:50]
-        test_filename = f"{clean_name}_{timestamp}.js"
-        fixture_filename = f"{clean_name}_fixture_{timestamp}.json"
+def generate_test_script_incremental(ai_client, case_key, feature_description, test_case_title="", force_cypress=False, include_screenshots=False, code_file_content=None, force=False):
+    """
+    Generate test script and fixture for a case, reusing the last generation of
+    the same case: unchanged steps return the stored result, a few changed steps
+    are applied to the stored script as a patch. The result has a "mode" key
+    ("cached", "patched" or "full"), the input "fingerprint", the "model"(s)
+    that answered and the "duration" in seconds. force=True always generates from scratch.
+    """
+    started = time.time()
+    polarion = isinstance(feature_description, list)
+
+    def generate_full():
+        if polarion:
+            return generate_test_script_with_polarion_fixture(ai_client, feature_description, test_case_title, force_cypress, include_screenshots, code_file_content)
+        return generate_test_script_with_fixture(ai_client, feature_description, force_cypress, include_screenshots, code_file_content)
+
+    # The Polarion fixture is built locally, so it is rebuilt after a patch; a text fixture is kept.
+    generate_fixture = (lambda: generate_fixture_from_polarion_data(ai_client, feature_description, test_case_title)) if polarion else None
+    # Clients that can tell which model answered (the router's fast tier for patches and
+    # fixtures, a hedged fallback) report it; others are assumed to be their configured model.
+    tracker = getattr(ai_client, "track_models", None)
+    with tracker() if tracker else nullcontext(None) as models:
+        result = generate_or_update(
+            ai_client, case_key, feature_description, generate_full, generate_fixture,
+            code_file_content=code_file_content,
+            options={"force_cypress": force_cypress, "include_screenshots": include_screenshots},
+            force=force,
+        )
+    if models is None:
+        result["model"] = getattr(ai_client, "model", None)
     else:
-        test_filename = f"test_script_{timestamp}.js"
-        fixture_filename = f"fixture_{timestamp}.json"
-    
-    test_file_path = os.path.join(output_dir, test_filename)
-    with open(test_file_path, 'w', encoding='utf-8') as f:
-        f.write(test_script)
-    
-    fixture_file_path = os.path.join(output_dir, fixture_filename)
-    with open(fixture_file_path, 'w', encoding='utf-8') as f:
-        f.write(fixture_content)
-    
+        # Several models when the script and the fixture came from different tiers; none when cached
+        result["model"] = ", ".join(dict.fromkeys(models)) or None
+    result["duration"] = round(time.time() - started, 3)
+    return result
+
+def generation_metadata(result):
+    """Artifact metadata of a generate_test_script_incremental() result."""
+    return {"model": result.get("model"), "prompt_hash": result.get("fingerprint"),
+            "mode": result.get("mode"), "duration": result.get("duration")}
+
+def write_test_files_to_output(test_script, fixture_content, test_name=None, case_key=None, metadata=None):
+    """
+    Save a generated script and fixture in the artifact store under the case
+    (case_key, else test_name). Identical content is stored once and an
+    unchanged regeneration returns the existing version ("reused": True).
+    metadata (model, prompt hash, mode, duration) is kept with the version.
+    """
+    case = case_key or (re.sub(r'[^\w\-_]', '_', test_name)[:50] if test_name else "unnamed")
+    version = ArtifactStore().save(case, test_script, fixture_content, name=test_name, metadata=metadata)
     return {
-        "test_file_path": test_file_path,
-        "fixture_file_path": fixture_file_path,
-        "test_filename": test_filename,
-        "fixture_filename": fixture_filename
+        "test_file_path": version["test_path"],
+        "fixture_file_path": version["fixture_path"],
+        "test_filename": os.path.basename(version["test_path"]),
+        "fixture_filename": os.path.basename(version["fixture_path"]),
+        "case": case,
+        "version": version["version"],
+        "reused": version["reused"],
     }
 
 def analyze_failed_case(ai_client, component, failed_cases, guidelines_dict):
-       guidelines_dict = guidelines_dict or {}
-       guideline = guidelines_dict.get(component, "")
-       prompt = _build_prompt(failed_cases, guideline)
-       return ai_client.chat([{"role": "user", "content": prompt}])
+       guideline = find_guideline(guidelines_dict, component)
+       with tracing.span("prompt.build", task="analyze_failed_case", cases=len(failed_cases)) as span:
+           prompt = _build_prompt(compact_cases(failed_cases, component), guideline)
+           span.set("chars", len(prompt))
+       return ai_client.chat([{"role": "user", "content": prompt}], task="analyze_failed_case",
+                             validate=lambda response: is_confident_analysis(response, failed_cases))
+
+FAILURE_TYPES = ("automation bug", "system issue", "product bug")
+
+def is_confident_analysis(response, failed_cases) -> bool:
+    """True when the analysis table has a row per case and every row names one of the known failure types."""
+    if not isinstance(response, str):
+        return False
+    rows = []
+    for line in response.splitlines():
+        cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+        if len(cells) >= 4 and line.strip().startswith("|") and cells[0] != "Case ID" and not set(cells[0]) <= set("-: "):
+            rows.append(cells)
+    if len(rows) < len({case.get("ID") for case in failed_cases}):
+        return False
+    return all(any(kind in cells[2].lower() for kind in FAILURE_TYPES) for cells in rows)
+
+def is_json_block(response) -> bool:
+    """True when the response holds a JSON object, fenced or bare (// comments allowed)."""
+    if not isinstance(response, str):
+        return False
+    match = re.search(r"```(?:json)?\s*\n(.*?)```", response, re.DOTALL)
+    text = re.sub(r"^\s*//.*$", "", match.group(1) if match else response, flags=re.MULTILINE)
+    try:
+        return isinstance(json.loads(text), dict)
+    except ValueError:
+        return False
 
 def _build_prompt(cases: List[Dict], rules_md: str) -> Dict:
         
@@ -471,6 +591,7 @@ def _build_prompt(cases: List[Dict], rules_md: str) -> Dict:
             f"- Case ID: {case['ID']}\n"
             f"- Case Title: {case['Title']}\n"
             f"- Assert Reason: {case['Error Message']}\n"
+            + (f"- Stacktrace:\n{indent(case['Stacktrace Message'], '      ')}\n" if case.get('Stacktrace Message') else "")
             for idx, case in enumerate(cases)
         )
     return f"""